@@ -0,0 +1,94 @@
+"""Compares time and peak memory of exact density matrix simulation against
+sampled trajectories on random noisy circuits.
+
+Usage::
+
+    python -m benchmarks.density_matrix_vs_trajectories --trajectories 1000
+"""
+
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+from qhal.hal import command_creator, HALMetadata
+from qhal.quantum_simulators import (DensityMatrixQuantumSimulator,
+                                     TrajectoryQuantumSimulator)
+
+
+def noisy_metadata(n_qubits: int, error_rate: float) -> HALMetadata:
+    """Uniform error rates for the gates used by ``random_circuit``."""
+    return HALMetadata(
+        num_qubits=n_qubits,
+        native_gates={
+            "RX": (100, np.full(n_qubits, error_rate)),
+            "RZ": (100, np.full(n_qubits, error_rate)),
+            "CNOT": (1000, np.full((n_qubits, n_qubits), 10 * error_rate))
+        },
+        connectivity=np.ones((n_qubits, n_qubits))
+    )
+
+
+def random_circuit(n_qubits: int, depth: int, seed: int = 0) -> list:
+    """Layers of random RX/RZ rotations followed by a CNOT ladder."""
+    random_state = np.random.RandomState(seed)
+    commands = [
+        command_creator("START_SESSION"),
+        command_creator("STATE_PREPARATION_ALL"),
+    ]
+    for _ in range(depth):
+        for qubit in range(n_qubits):
+            for gate in ("RX", "RZ"):
+                commands.append(command_creator(
+                    gate, int(random_state.randint(2 ** 16)), qubit
+                ))
+        for qubit in range(n_qubits - 1):
+            commands.append(command_creator("CNOT", 0, qubit, 0, qubit + 1))
+    for qubit in range(n_qubits):
+        commands.append(command_creator("QUBIT_MEASURE", 0, qubit))
+    commands.append(command_creator("END_SESSION"))
+    return commands
+
+
+def run(simulator, commands: list) -> dict:
+    tracemalloc.start()
+    start = time.perf_counter()
+    for command in commands:
+        simulator.accept_command(command)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"time_s": elapsed, "peak_memory_mb": peak / 2 ** 20}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--min-qubits", type=int, default=2)
+    parser.add_argument("--max-qubits", type=int, default=10)
+    parser.add_argument("--depth", type=int, default=10)
+    parser.add_argument("--trajectories", type=int, default=1000)
+    parser.add_argument("--error-rate", type=float, default=1e-3)
+    args = parser.parse_args()
+
+    print(f"{'qubits':>6} | {'backend':>14} | {'time (s)':>10} | "
+          f"{'peak memory (MB)':>16}")
+    for n_qubits in range(args.min_qubits, args.max_qubits + 1):
+        metadata = noisy_metadata(n_qubits, args.error_rate)
+        commands = random_circuit(n_qubits, args.depth)
+        simulators = {
+            "density matrix": DensityMatrixQuantumSimulator(
+                n_qubits, seed=0, hal_metadata=metadata
+            ),
+            "trajectories": TrajectoryQuantumSimulator(
+                n_qubits, args.trajectories, seed=0, hal_metadata=metadata
+            ),
+        }
+        for name, simulator in simulators.items():
+            result = run(simulator, commands)
+            print(f"{n_qubits:>6} | {name:>14} | {result['time_s']:>10.4f} | "
+                  f"{result['peak_memory_mb']:>16.2f}")
+
+
+if __name__ == "__main__":
+    main()
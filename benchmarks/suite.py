@@ -0,0 +1,403 @@
+"""Benchmark suite for HAL command throughput and simulator scaling.
+
+Runs reproducible (seeded) workloads and reports throughput and peak
+memory. Peak memory is traced with ``tracemalloc``, which only sees
+Python and NumPy allocations: it is not reported for the ProjectQ
+workloads, whose statevector lives in C++.
+
+- ``encode`` / ``decode``: ``command_creator`` and ``command_unpacker`` over
+  a stream of random commands, in commands/sec.
+- ``metadata``: streaming every metadata item of 16 to 1024 qubit devices
+  through ``HardwareAbstractionLayer``, in words/sec.
+- ``circuit``: random circuits over 2 to 24 qubits through
+  ``ProjectqQuantumSimulator``, in commands/sec and shots/sec.
+- ``layers``: the same circuits over 20 to 24 qubits scheduled into layers
+  and run through ``TrajectoryQuantumSimulator.accept_layer``, in
+  commands/sec, with the speedup over ``accept_commands``.
+- ``sweep``: the same circuits over 8 to 18 qubits swept over 32 random
+  parameter points with ``sweep_program``, in points/sec, with the speedup
+  over running the points one by one through ``ProjectqQuantumSimulator``.
+
+Usage::
+
+    python -m benchmarks.suite run --output results.json
+    python -m benchmarks.suite compare baseline.json results.json
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from qhal.compiler import schedule_program
+from qhal.hal import (command_creator, command_unpacker, HALMetadata,
+                      HardwareAbstractionLayer, ProgramTemplate)
+from qhal.hal._commands import _OPCODES
+from qhal.quantum_simulators import (ProjectqQuantumSimulator,
+                                     TrajectoryQuantumSimulator,
+                                     sweep_program)
+
+#: metrics where a lower value is better, every other metric is a throughput
+LOWER_IS_BETTER = ("peak_memory_mb", "time_s", "shots_time_s")
+
+_FINAL_FLAG = 1 << 60
+
+_SINGLE_GATES = ["H", "X", "Y", "Z", "S", "T", "INVS", "INVT", "SX", "SQRT_X"]
+_PARAM_GATES = ["RX", "RY", "RZ"]
+_DUAL_GATES = ["CNOT", "SWAP"]
+
+
+def measure(workload: Callable[[], int], unit: str,
+            memory: bool = True) -> dict:
+    """Times ``workload``, which returns the number of items it processed,
+    then runs it again under ``tracemalloc`` for its peak memory. Memory
+    must not be traced for native backends such as ProjectQ, whose
+    allocations ``tracemalloc`` cannot see."""
+    start = time.perf_counter()
+    n_items = workload()
+    elapsed = time.perf_counter() - start
+    result = {"time_s": elapsed, f"{unit}_per_s": n_items / elapsed}
+    if memory:
+        tracemalloc.start()
+        workload()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result["peak_memory_mb"] = peak / 2 ** 20
+    return result
+
+
+def random_command_args(n_words: int, seed: int = 0) -> List[tuple]:
+    """Random ``command_creator`` arguments over every opcode."""
+    random_state = np.random.RandomState(seed)
+    opcodes = [opcode.name for opcode in _OPCODES]
+    names = random_state.choice(opcodes, n_words)
+    args = random_state.randint(0, 2 ** 16, (n_words, 2))
+    qubits = random_state.randint(0, 2 ** 10, (n_words, 2))
+    return [
+        (str(name), int(a[0]), int(q[0]), int(a[1]), int(q[1]))
+        for name, a, q in zip(names, args, qubits)
+    ]
+
+
+def random_circuit(n_qubits: int, depth: int, seed: int = 0) -> List[int]:
+    """Layers of random single qubit gates followed by random dual qubit
+    gates on a random pairing of the qubits."""
+    random_state = np.random.RandomState(seed)
+    commands = []
+    for _ in range(depth):
+        for qubit in range(n_qubits):
+            if random_state.rand() < 0.5:
+                gate = random_state.choice(_SINGLE_GATES)
+                commands.append(command_creator(str(gate), 0, qubit))
+            else:
+                gate = random_state.choice(_PARAM_GATES)
+                angle = int(random_state.randint(2 ** 16))
+                commands.append(command_creator(str(gate), angle, qubit))
+        pairs = random_state.permutation(n_qubits)
+        for qubit_0, qubit_1 in zip(pairs[::2], pairs[1::2]):
+            gate = random_state.choice(_DUAL_GATES)
+            commands.append(command_creator(
+                str(gate), 0, int(qubit_0), 0, int(qubit_1)
+            ))
+    return commands
+
+
+def device_metadata(n_qubits: int, seed: int = 0) -> HALMetadata:
+    """Metadata of a device with nearest-neighbour connectivity on a line
+    and random error rates."""
+    random_state = np.random.RandomState(seed)
+    connectivity = np.eye(n_qubits, dtype=int)
+    connectivity += np.eye(n_qubits, k=1, dtype=int)
+    connectivity += np.eye(n_qubits, k=-1, dtype=int)
+    cnot_errors = np.round(
+        (connectivity - np.eye(n_qubits)) *
+        random_state.uniform(0.01, 0.05, (n_qubits, n_qubits)), 3
+    )
+    return HALMetadata(
+        num_qubits=n_qubits,
+        max_depth=1000,
+        native_gates={
+            "RX": (100, np.round(random_state.uniform(1e-3, 1e-2, n_qubits), 4)),
+            "RZ": (10, np.round(random_state.uniform(1e-3, 1e-2, n_qubits), 4)),
+            "CNOT": (1000, cnot_errors),
+        },
+        connectivity=connectivity
+    )
+
+
+def stream_metadata(hal: HardwareAbstractionLayer, index: int,
+                    arg1: int = 0) -> int:
+    """Requests a metadata item until its final chunk, returns the number
+    of words received."""
+    n_words = 0
+    request = command_creator("REQUEST_METADATA", index, 0, arg1, 0)
+    while True:
+        n_words += 1
+        if hal.accept_command(request) & _FINAL_FLAG:
+            return n_words
+
+
+def bench_encode(n_words: int) -> Dict[str, dict]:
+    command_args = random_command_args(n_words)
+
+    def workload():
+        for args in command_args:
+            command_creator(*args)
+        return n_words
+
+    return {f"encode[{n_words}]": measure(workload, "commands")}
+
+
+def bench_decode(n_words: int) -> Dict[str, dict]:
+    commands = [command_creator(*args) for args in random_command_args(n_words)]
+
+    def workload():
+        for command in commands:
+            command_unpacker(command)
+        return n_words
+
+    return {f"decode[{n_words}]": measure(workload, "commands")}
+
+
+def bench_metadata(device_sizes: List[int]) -> Dict[str, dict]:
+    results = {}
+    for n_qubits in device_sizes:
+        metadata = device_metadata(n_qubits)
+
+        def workload():
+            hal = HardwareAbstractionLayer(ProjectqQuantumSimulator(), metadata)
+            n_words = 0
+            for index in (1, 2, 3, 4):
+                n_words += stream_metadata(hal, index)
+            for gate_index in range(len(metadata.native_gates)):
+                n_words += stream_metadata(hal, 5, gate_index << 13)
+            return n_words
+
+        results[f"metadata[{n_qubits}q]"] = measure(workload, "words")
+    return results
+
+
+def bench_circuit(qubit_counts: List[int], depth: int,
+                  shots: int) -> Dict[str, dict]:
+    results = {}
+    for n_qubits in qubit_counts:
+        circuit = random_circuit(n_qubits, depth)
+        measurements = [
+            command_creator("QUBIT_MEASURE", 0, qubit)
+            for qubit in range(n_qubits)
+        ]
+
+        def run_shot(with_measurements: bool):
+            simulator = ProjectqQuantumSimulator(
+                register_size=n_qubits, seed=0
+            )
+            simulator.accept_command(command_creator("START_SESSION"))
+            simulator.accept_command(command_creator("STATE_PREPARATION_ALL"))
+            for command in circuit:
+                simulator.accept_command(command)
+            if with_measurements:
+                for command in measurements:
+                    simulator.accept_command(command)
+            simulator.accept_command(command_creator("END_SESSION"))
+
+        def gates_workload():
+            run_shot(False)
+            return len(circuit)
+
+        def shots_workload():
+            for _ in range(shots):
+                run_shot(True)
+            return shots
+
+        shots_result = measure(shots_workload, "shots", memory=False)
+        results[f"circuit[{n_qubits}q]"] = {
+            **measure(gates_workload, "commands", memory=False),
+            "shots_per_s": shots_result["shots_per_s"],
+            "shots_time_s": shots_result["time_s"],
+        }
+    return results
+
+
+def bench_layers(qubit_counts: List[int], depth: int) -> Dict[str, dict]:
+    results = {}
+    for n_qubits in qubit_counts:
+        schedule = schedule_program(random_circuit(n_qubits, depth))
+        start = [command_creator("START_SESSION"),
+                 command_creator("STATE_PREPARATION_ALL")]
+        layers = [schedule.layer(layer) for layer in range(schedule.n_layers)]
+
+        def run_layers(by_layer: bool):
+            simulator = TrajectoryQuantumSimulator(
+                register_size=n_qubits, seed=0
+            )
+            simulator.accept_commands(start)
+            for layer in layers:
+                if by_layer:
+                    simulator.accept_layer(layer)
+                else:
+                    simulator.accept_commands(layer)
+            return len(schedule.commands)
+
+        by_command = measure(lambda: run_layers(False), "commands",
+                             memory=False)
+        by_layer = measure(lambda: run_layers(True), "commands")
+        results[f"layers[{n_qubits}q]"] = {
+            **by_layer,
+            "speedup": by_command["time_s"] / by_layer["time_s"]
+        }
+    return results
+
+
+def bench_sweep(qubit_counts: List[int], depth: int,
+                n_points: int = 32) -> Dict[str, dict]:
+    results = {}
+    for n_qubits in qubit_counts:
+        template = ProgramTemplate(
+            [command_creator("START_SESSION"),
+             command_creator("STATE_PREPARATION_ALL")] +
+            random_circuit(n_qubits, depth)
+        )
+        values = np.random.RandomState(0).randint(
+            2 ** 16, size=(n_points, template.n_parameters)
+        )
+
+        def run_points():
+            for point in values:
+                simulator = ProjectqQuantumSimulator(
+                    register_size=n_qubits, seed=0
+                )
+                simulator.accept_commands(template.bind(point, binary=True))
+                simulator.accept_command(command_creator("QUBIT_MEASURE_ALL"))
+                simulator.cleanup()
+            return n_points
+
+        def run_sweep():
+            sweep_program(template, values, n_qubits, binary=True)
+            return n_points
+
+        by_point = measure(run_points, "points", memory=False)
+        swept = measure(run_sweep, "points")
+        results[f"sweep[{n_qubits}q]"] = {
+            **swept,
+            "speedup": by_point["time_s"] / swept["time_s"]
+        }
+    return results
+
+
+def run(words: int, device_sizes: List[int], qubit_counts: List[int],
+        depth: int, shots: int, layer_qubit_counts: List[int] = (),
+        sweep_qubit_counts: List[int] = ()) -> dict:
+    """Runs every benchmark and returns the results with the environment
+    they were obtained in."""
+    results = {}
+    results.update(bench_encode(words))
+    results.update(bench_decode(words))
+    results.update(bench_metadata(device_sizes))
+    results.update(bench_circuit(qubit_counts, depth, shots))
+    results.update(bench_layers(layer_qubit_counts, depth))
+    results.update(bench_sweep(sweep_qubit_counts, depth))
+    return {
+        "environment": {
+            "date": datetime.now().isoformat(),
+            "python": sys.version,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+        },
+        "results": results
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> List[str]:
+    """Returns a description of every metric of ``current`` that is worse
+    than in ``baseline`` by more than ``threshold`` (relative)."""
+    regressions = []
+    for name, metrics in current["results"].items():
+        if name not in baseline["results"]:
+            continue
+        for metric, value in metrics.items():
+            reference = baseline["results"][name].get(metric)
+            # raw times depend on the workload sizes, throughputs do not
+            if not reference or metric.endswith("time_s"):
+                continue
+            change = (value - reference) / reference
+            if metric in LOWER_IS_BETTER:
+                change = -change
+            if change < -threshold:
+                regressions.append(
+                    f"{name} {metric}: {reference:.4g} -> {value:.4g} "
+                    f"({100 * change:+.1f}%)"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[0]
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="run the benchmarks")
+    run_parser.add_argument("--output", "-o", default="benchmark_results.json")
+    run_parser.add_argument("--words", type=int, default=10 ** 6)
+    run_parser.add_argument(
+        "--device-sizes", type=int, nargs="+", default=[16, 64, 256, 1024]
+    )
+    run_parser.add_argument(
+        "--qubits", type=int, nargs="+", default=[2, 4, 8, 12, 16, 20, 24]
+    )
+    run_parser.add_argument(
+        "--layer-qubits", type=int, nargs="+", default=[20, 22, 24]
+    )
+    run_parser.add_argument(
+        "--sweep-qubits", type=int, nargs="+", default=[8, 12, 16, 18]
+    )
+    run_parser.add_argument("--depth", type=int, default=10)
+    run_parser.add_argument("--shots", type=int, default=10)
+
+    compare_parser = subparsers.add_parser(
+        "compare", help="flag regressions between two runs"
+    )
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument(
+        "--threshold", type=float, default=0.1,
+        help="relative change flagged as a regression (default 0.1)"
+    )
+
+    args = parser.parse_args()
+
+    if args.command == "run":
+        output = run(
+            args.words, args.device_sizes, args.qubits, args.depth,
+            args.shots, args.layer_qubits, args.sweep_qubits
+        )
+        for name, metrics in output["results"].items():
+            summary = ", ".join(
+                f"{metric}={value:.4g}" for metric, value in metrics.items()
+            )
+            print(f"{name}: {summary}")
+        with open(args.output, "w") as f:
+            json.dump(output, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+    else:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+        regressions = compare(baseline, current, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
+import importlib
+
 from .__about__ import (
     __license__,
     __copyright__,
@@ -8,9 +10,31 @@ from .__about__ import (
 )
 
 from .hal import (HardwareAbstractionLayer,
+                  HALProgram,
+                  ProgramTemplate,
                   string_to_opcode,
                   command_creator,
                   Masks,
                   Shifts)
-from .quantum_simulators import (IQuantumSimulator,
-                                 ProjectqQuantumSimulator)
+
+# the simulators import ProjectQ, which is slow, so they are only loaded on
+# first use: processes that only encode commands do not pay for it
+_LAZY_SUBMODULES = ("compiler", "quantum_simulators")
+_LAZY_SIMULATORS = ("IQuantumSimulator",
+                    "ProjectqQuantumSimulator",
+                    "TrajectoryQuantumSimulator",
+                    "DensityMatrixQuantumSimulator")
+
+
+def __getattr__(name: str):
+    if name in _LAZY_SUBMODULES:
+        return importlib.import_module(f".{name}", __name__)
+    if name in _LAZY_SIMULATORS:
+        return getattr(importlib.import_module(".quantum_simulators",
+                                               __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_SUBMODULES) |
+                  set(_LAZY_SIMULATORS))
@@ -0,0 +1,8 @@
+from ._estimation import ProgramEstimate, estimate_program
+from ._paging import MAX_QUBIT_INDEX, page_program, unpage_program
+from ._peephole import OptimizedProgram, optimize_program
+from ._routing import (DistanceTable, RoutedProgram, distance_table,
+                       route_program)
+from ._scheduling import Schedule, schedule_program
+from ._transpiler import transpile_program
+from ._validation import Violation, check_program, validate_program
@@ -0,0 +1,157 @@
+from typing import Dict, NamedTuple, Sequence, Tuple
+
+import numpy as np
+from numpy import uint64
+
+from ..hal import _opcodes as ops
+from ..hal._commands import command_array_unpacker, resolve_qubit_indexes
+
+
+class ProgramEstimate(NamedTuple):
+    """Static estimate of the execution of a program on a device.
+
+    Durations are in the units of ``HALMetadata.native_gates``.
+    """
+    #: number of gate layers on the critical path
+    depth: int
+    #: estimated runtime, i.e. duration of the critical path
+    duration: float
+    #: ``(num_qubits,)`` time each qubit spends in gates
+    busy_time: np.ndarray
+    #: number of commands of each gate
+    gate_counts: Dict[str, int]
+    #: gates of the program missing from the native gates, counted as
+    #: taking no time
+    non_native_gates: Tuple[str, ...]
+    #: maximum depth of the device, 0 if unlimited
+    max_depth: int
+
+    @property
+    def exceeds_max_depth(self) -> bool:
+        return 0 < self.max_depth < self.depth
+
+
+def _prefix_at(
+    qubits: np.ndarray,
+    positions: np.ndarray,
+    values: np.ndarray,
+    query_qubits: np.ndarray,
+    query_positions: np.ndarray
+) -> np.ndarray:
+    """Returns, for every query, the sum of ``values`` of the same qubit at
+    positions before the query position."""
+    n_positions = int(max(positions.max(initial=0),
+                          query_positions.max(initial=0))) + 1
+    keys = qubits * n_positions + positions
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+    sums = np.concatenate(([0], np.cumsum(values[order])))
+    qubit_starts = np.searchsorted(keys, query_qubits * n_positions)
+    query_ends = np.searchsorted(keys, query_qubits * n_positions +
+                                 query_positions)
+    return sums[query_ends] - sums[qubit_starts]
+
+
+def estimate_program(
+    commands: np.ndarray,
+    hal_metadata,
+    offsets: Sequence[int] = (0, 0)
+) -> ProgramEstimate:
+    """Estimates the critical-path depth, per-qubit busy time and total
+    runtime of a program from the gate durations of ``hal_metadata``.
+
+    Every gate starts as soon as its qubits are free, so the runtime is the
+    duration of the critical path. Runs in linear time: the single qubit
+    gates are accumulated with vectorised prefix sums and only the two
+    qubit gates, which synchronise their qubits, are visited one by one.
+
+    Parameters
+    ----------
+    commands : np.ndarray
+        Array of 64-bit HAL commands.
+    hal_metadata : HALMetadata
+        Metadata of the device, with the durations of its native gates and
+        its maximum depth.
+    offsets : Sequence[int], optional
+        Base indexes of qubit 0 and 1 before the first command.
+
+    Returns
+    -------
+    ProgramEstimate
+        The estimate, see ``ProgramEstimate``.
+    """
+    commands = np.asarray(commands, dtype=uint64)
+    opcodes = command_array_unpacker(commands)[0]
+    qubits_0, qubits_1 = resolve_qubit_indexes(commands, offsets)
+
+    durations = np.zeros(1 << 12)
+    for gate, (duration, _) in hal_metadata.native_gates.items():
+        durations[ops.code(gate)] = duration
+
+    single = np.flatnonzero(np.isin(opcodes, ops.SINGLE_GATE_CODES))
+    dual = np.flatnonzero(np.isin(opcodes, ops.DUAL_GATE_CODES))
+    gates = np.concatenate((single, dual))
+    num_qubits = hal_metadata.num_qubits or int(max(
+        qubits_0[gates].max(initial=-1), qubits_1[dual].max(initial=-1)
+    )) + 1
+    if len(gates) and max(qubits_0[gates].max(), qubits_1[dual].max(
+            initial=0)) >= num_qubits:
+        raise ValueError(
+            f"Qubit index greater than number of qubits ({num_qubits})!"
+        )
+
+    # (layers, time) added by the single qubit gates of each qubit before
+    # every two qubit gate, and before the end of the program
+    single_durations = durations[opcodes[single]]
+    query_qubits = np.concatenate(
+        (qubits_0[dual], qubits_1[dual], np.arange(num_qubits))
+    )
+    query_positions = np.concatenate(
+        (dual, dual, np.full(num_qubits, len(opcodes)))
+    )
+    layers = _prefix_at(qubits_0[single], single, np.ones(len(single)),
+                        query_qubits, query_positions)
+    times = _prefix_at(qubits_0[single], single, single_durations,
+                       query_qubits, query_positions)
+
+    # depth and time of each qubit, minus its single qubit gates so far
+    # (lists are faster than arrays to index element by element)
+    depth = [0.0] * num_qubits
+    time = [0.0] * num_qubits
+    n_dual = len(dual)
+    for q_0, q_1, layers_0, layers_1, time_0, time_1, duration in zip(
+        qubits_0[dual].tolist(), qubits_1[dual].tolist(),
+        layers[:n_dual].tolist(), layers[n_dual:2 * n_dual].tolist(),
+        times[:n_dual].tolist(), times[n_dual:2 * n_dual].tolist(),
+        durations[opcodes[dual]].tolist()
+    ):
+        gate_depth = max(depth[q_0] + layers_0, depth[q_1] + layers_1) + 1
+        depth[q_0] = gate_depth - layers_0
+        depth[q_1] = gate_depth - layers_1
+        gate_time = max(time[q_0] + time_0, time[q_1] + time_1) + duration
+        time[q_0] = gate_time - time_0
+        time[q_1] = gate_time - time_1
+    depth = np.array(depth) + layers[2 * n_dual:]
+    time = np.array(time) + times[2 * n_dual:]
+
+    gate_durations = durations[opcodes[gates]]
+    busy_time = np.bincount(
+        np.concatenate((qubits_0[gates], qubits_1[dual])),
+        np.concatenate((gate_durations, gate_durations[len(single):])),
+        minlength=num_qubits
+    )
+
+    codes, counts = np.unique(opcodes[gates], return_counts=True)
+    native = set(ops.code(gate) for gate in hal_metadata.native_gates)
+    return ProgramEstimate(
+        depth=int(depth.max(initial=0)),
+        duration=float(time.max(initial=0)),
+        busy_time=busy_time,
+        gate_counts={
+            ops.NAMES[code]: int(count) for code, count in zip(codes, counts)
+        },
+        non_native_gates=tuple(
+            ops.NAMES[code] for code in codes if code not in native
+        ),
+        max_depth=hal_metadata.max_depth
+    )
@@ -0,0 +1,254 @@
+from typing import List, Sequence, Tuple
+
+import numpy as np
+from numpy import uint64
+
+from ..hal import _opcodes as ops
+from ..hal._commands import (command_array_unpacker, resolve_qubit_indexes,
+                             Masks, Shifts)
+
+#: number of qubits addressed by a 10-bit relative index
+PAGE_SIZE = 1 << 10
+#: largest absolute index, the offset of a page being 10 bits as well
+MAX_QUBIT_INDEX = 2 * (PAGE_SIZE - 1)
+
+
+def _window_run(
+    indexes: np.ndarray,
+    values: List[int],
+    start: int
+) -> Tuple[int, int]:
+    """Returns the end of the longest run of indexes from ``start`` that fit
+    in a single page, and the offset of that page.
+
+    Short runs are scanned element by element, longer ones with vectorised
+    running extrema over chunks of doubling size.
+    """
+    # the offset must fit in 10 bits too
+    highest = lowest = values[start]
+    for end in range(start + 1, min(start + 16, len(values))):
+        value = values[end]
+        if max(highest, value) - min(lowest, value, PAGE_SIZE - 1) >= \
+                PAGE_SIZE:
+            return end, min(lowest, PAGE_SIZE - 1)
+        highest = max(highest, value)
+        lowest = min(lowest, value)
+    if start + 16 >= len(values):
+        return len(values), min(lowest, PAGE_SIZE - 1)
+    size = 32
+    while True:
+        chunk = indexes[start:start + size]
+        highest = np.maximum.accumulate(chunk)
+        lowest = np.minimum.accumulate(chunk)
+        outside = highest - np.minimum(lowest, PAGE_SIZE - 1) >= PAGE_SIZE
+        if outside.any():
+            end = int(np.argmax(outside))
+            return start + end, int(min(lowest[end - 1], PAGE_SIZE - 1))
+        if start + size >= len(indexes):
+            return len(indexes), int(min(lowest[-1], PAGE_SIZE - 1))
+        size *= 2
+
+
+def _page_offsets(
+    indexes: np.ndarray,
+    offset: int = None
+) -> Tuple[List[int], List[int]]:
+    """Splits a sequence of absolute indexes into the fewest runs that each
+    fit in a page, greedily extending every run as far as possible.
+
+    Parameters
+    ----------
+    indexes : np.ndarray
+        Absolute indexes read through an offset register.
+    offset : int, optional
+        Offset before the first index, None if it is unknown, in which case
+        the first run always needs a new page.
+
+    Returns
+    -------
+    starts, offsets : List[int]
+        Start of each run that needs a new page, and the page offset.
+    """
+    if offset is None:
+        start = 0
+    else:
+        outside = (indexes < offset) | (indexes >= offset + PAGE_SIZE)
+        start = int(np.argmax(outside)) if outside.any() else len(indexes)
+    starts, offsets = [], []
+    values = indexes.tolist()
+    while start < len(indexes):
+        end, offset = _window_run(indexes, values, start)
+        starts.append(start)
+        offsets.append(offset)
+        start = end
+    return starts, offsets
+
+
+def _group_by_page(
+    opcodes: np.ndarray,
+    qubits_0: np.ndarray
+) -> np.ndarray:
+    """Returns an order of the commands where the single qubit gates
+    between two other commands are grouped by page.
+
+    Such gates act on one qubit each, so gates on different qubits
+    commute, and sorting them stably by page keeps the order of the gates
+    of each qubit. Measurements, preparations and control flow commands
+    are not moved: a measurement may release the register, or be read by
+    the following IF or WHILE. Every other block is sorted in the opposite
+    direction, so that it starts on the page the previous one ended on; the
+    offsets are set again after control flow commands anyway, see
+    ``page_program``.
+    """
+    single = np.isin(opcodes, ops.SINGLE_GATE_CODES)
+    blocks = np.cumsum(~single)
+    pages = qubits_0 // PAGE_SIZE
+    keys = np.where(blocks % 2 == 0, pages, -pages)
+    # the command starting a block stays in front of it
+    keys = np.where(single, keys, np.iinfo(np.int64).min)
+    return np.lexsort((np.arange(len(opcodes)), keys, blocks))
+
+
+def page_program(
+    commands: np.ndarray,
+    qubits_0: np.ndarray,
+    qubits_1: np.ndarray = None,
+    offsets: Sequence[int] = (0, 0),
+    reorder: bool = True
+) -> np.ndarray:
+    """Encodes a program over absolute qubit indexes with relative indexes
+    and the fewest PAGE_SET_QUBIT commands.
+
+    The indexes read through each offset register are split greedily into
+    the longest runs that fit in a page of 1024 qubits, which minimises the
+    number of PAGE_SET_QUBIT commands for a given order of the commands.
+    A control flow command may jump back or skip commands, so if an offset
+    changes in the program, it is unknown after a control flow command: the
+    first command after it that reads the offset is preceded by a
+    PAGE_SET_QUBIT command again. With ``reorder``, the single qubit gates between two other commands,
+    which commute when they act on different qubits, are first grouped by
+    page.
+
+    Parameters
+    ----------
+    commands : np.ndarray
+        Array of 64-bit HAL commands. Their qubit indexes are replaced, and
+        PAGE_SET_QUBIT commands are dropped.
+    qubits_0 : np.ndarray
+        Absolute index of qubit 0 of each command.
+    qubits_1 : np.ndarray, optional
+        Absolute index of qubit 1 of each command, only read for two qubit
+        gates.
+    offsets : Sequence[int], optional
+        Offsets of qubit 0 and 1 before the first command.
+    reorder : bool, optional
+        Whether commuting commands may be reordered, True by default.
+
+    Returns
+    -------
+    np.ndarray
+        Array of 64-bit HAL commands.
+
+    Raises
+    ------
+    ValueError
+        If an index is greater than ``MAX_QUBIT_INDEX``.
+    """
+    commands = np.asarray(commands, dtype=uint64)
+    opcodes = command_array_unpacker(commands)[0]
+    qubits_0 = np.asarray(qubits_0, dtype=np.int64)
+    qubits_1 = np.zeros_like(qubits_0) if qubits_1 is None else \
+        np.asarray(qubits_1, dtype=np.int64)
+
+    kept = ~np.isin(opcodes, [ops.PAGE_SET_QUBIT_0, ops.PAGE_SET_QUBIT_1])
+    commands, opcodes = commands[kept], opcodes[kept]
+    qubits_0, qubits_1 = qubits_0[kept], qubits_1[kept]
+    if reorder:
+        order = _group_by_page(opcodes, qubits_0)
+        commands, opcodes = commands[order], opcodes[order]
+        qubits_0, qubits_1 = qubits_0[order], qubits_1[order]
+
+    dual = np.isin(opcodes, ops.DUAL_GATE_CODES)
+    uses_0 = dual | np.isin(opcodes, ops.SINGLE_GATE_CODES) | \
+        np.isin(opcodes, [ops.STATE_PREPARATION, ops.QUBIT_MEASURE])
+    control = np.flatnonzero(np.isin(opcodes, ops.CONTROL_FLOW_CODES))
+    paged = commands.copy()
+    pages = []  # (command index, register, offset)
+    for register, (uses, qubits) in enumerate(((uses_0, qubits_0),
+                                               (dual, qubits_1))):
+        words = np.flatnonzero(uses)
+        indexes = qubits[words]
+        if np.any(indexes > MAX_QUBIT_INDEX) or np.any(indexes < 0):
+            raise ValueError(
+                f"Qubit index greater than {MAX_QUBIT_INDEX} cannot be paged!"
+            )
+        starts, page_offsets = _page_offsets(indexes, offsets[register])
+        if starts and len(control):
+            # the offset changes, so the uses between two control flow
+            # commands are paged independently, from the known offset before
+            # the first one
+            sections = np.searchsorted(control, words)
+            bounds = np.flatnonzero(np.diff(sections, prepend=-1)).tolist()
+            starts, page_offsets = [], []
+            for start, end in zip(bounds, bounds[1:] + [len(words)]):
+                section_starts, section_offsets = _page_offsets(
+                    indexes[start:end],
+                    offsets[register] if sections[start] == 0 else None
+                )
+                starts.extend(start + section for section in section_starts)
+                page_offsets.extend(section_offsets)
+
+        # offset of each command: the offset of its run
+        run_offsets = np.full(len(words), offsets[register], dtype=np.int64)
+        if starts:
+            run = np.cumsum(np.isin(np.arange(len(words)), starts)) - 1
+            run_offsets = np.where(
+                run >= 0, np.array(page_offsets)[np.maximum(run, 0)],
+                run_offsets
+            )
+        mask = Masks.QUBIT0_MASK if register == 0 else Masks.QUBIT1_MASK
+        shift = 0 if register == 0 else Shifts.IDX1.value
+        paged[words] = (paged[words] & ~uint64(mask.value)) | \
+            ((indexes - run_offsets).astype(uint64) << uint64(shift))
+        pages.extend(
+            (int(words[start]), register, offset)
+            for start, offset in zip(starts, page_offsets)
+        )
+
+    if not pages:
+        return paged
+    pages.sort()
+    positions, registers, page_offsets = np.array(pages, dtype=np.int64).T
+    page_ops = np.where(registers == 0, ops.PAGE_SET_QUBIT_0,
+                        ops.PAGE_SET_QUBIT_1)
+    page_commands = (page_ops.astype(uint64) << uint64(Shifts.OPCODE.value)) | \
+        page_offsets.astype(uint64)
+    return np.insert(paged, positions, page_commands)
+
+
+def unpage_program(
+    commands: np.ndarray,
+    offsets: Sequence[int] = (0, 0)
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Decodes a paged program into absolute qubit indexes, the inverse of
+    ``page_program``.
+
+    Parameters
+    ----------
+    commands : np.ndarray
+        Array of 64-bit HAL commands.
+    offsets : Sequence[int], optional
+        Offsets of qubit 0 and 1 before the first command.
+
+    Returns
+    -------
+    commands : np.ndarray
+        The commands, without the PAGE_SET_QUBIT commands.
+    qubits_0, qubits_1 : np.ndarray
+        Absolute index of qubit 0 and qubit 1 of each command.
+    """
+    commands = np.asarray(commands, dtype=uint64)
+    opcodes = command_array_unpacker(commands)[0]
+    qubits_0, qubits_1 = resolve_qubit_indexes(commands, offsets)
+    kept = ~np.isin(opcodes, [ops.PAGE_SET_QUBIT_0, ops.PAGE_SET_QUBIT_1])
+    return commands[kept], qubits_0[kept], qubits_1[kept]
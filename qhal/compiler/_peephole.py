@@ -0,0 +1,186 @@
+from typing import NamedTuple, Sequence
+
+import numpy as np
+from numpy import uint64
+
+from ..hal import _opcodes as ops
+from ..hal._commands import (command_array_unpacker, resolve_qubit_indexes,
+                             Masks, Shifts)
+
+# kinds of commands for the peephole pass
+_IGNORED = 0  # does not act on the qubits
+_BARRIER = 1  # acts on every qubit
+_QUBIT_BARRIER = 2  # acts on its qubit, without simplification
+_INVERTIBLE = 3  # single qubit gate with a known inverse
+_ROTATION = 4  # single qubit rotation, merged with the same rotation
+_GATE = 5  # other single qubit gate
+_DUAL_BARRIER = 6  # acts on its two qubits, without simplification
+_DUAL_INVOLUTION = 7  # two qubit gate equal to its own inverse
+
+_KINDS = np.full(1 << 12, _IGNORED, dtype=np.int64)
+_KINDS[ops.SINGLE_GATE_CODES] = _GATE
+_KINDS[ops.DUAL_GATE_CODES] = _DUAL_BARRIER
+_KINDS[[ops.STATE_PREPARATION, ops.QUBIT_MEASURE]] = _QUBIT_BARRIER
+_KINDS[[ops.START_SESSION, ops.END_SESSION, ops.STATE_PREPARATION_ALL,
+        ops.QUBIT_MEASURE_ALL, *ops.CONTROL_FLOW_CODES]] = _BARRIER
+_KINDS[[ops.code(gate) for gate in ("RX", "RY", "RZ", "PHASE", "R")]] = \
+    _ROTATION
+_KINDS[[ops.code(gate) for gate in ("CNOT", "SWAP")]] = _DUAL_INVOLUTION
+
+# single qubit gates that cancel each other, up to a global phase
+_INVERSES = {}
+for _gate, _inverse in [("X", "X"), ("Y", "Y"), ("Z", "Z"), ("H", "H"),
+                        ("SX", "SX"), ("SY", "SY"), ("T", "INVT"),
+                        ("S", "INVS")]:
+    _INVERSES[ops.code(_gate)] = ops.code(_inverse)
+    _INVERSES[ops.code(_inverse)] = ops.code(_gate)
+for _pauli in "XYZ":
+    _INVERSES[ops.code("PAULI_" + _pauli)] = ops.code(_pauli)
+_KINDS[list(_INVERSES)] = _INVERTIBLE
+# Paulis cancel whichever of their two opcodes they use
+_CANONICAL = {ops.code("PAULI_" + _pauli): ops.code(_pauli)
+              for _pauli in "XYZ"}
+
+
+class OptimizedProgram(NamedTuple):
+    """Program simplified by ``optimize_program``."""
+    #: optimised commands
+    commands: np.ndarray
+    #: number of commands removed
+    n_removed: int
+
+    @property
+    def reduction(self) -> float:
+        """Fraction of the commands removed."""
+        n_original = len(self.commands) + self.n_removed
+        return self.n_removed / n_original if n_original else 0.0
+
+
+def _redundant_pages(
+    opcodes: np.ndarray,
+    values: np.ndarray,
+    offsets: Sequence[int]
+) -> np.ndarray:
+    """Returns the PAGE_SET_QUBIT commands that can be removed: the ones
+    set again before any command reads their offset, and the ones setting
+    the offset it already has.
+
+    A control flow command may jump back or skip commands, so it counts as
+    reading both offsets, and the offsets are unknown after it.
+    """
+    control = np.isin(opcodes, ops.CONTROL_FLOW_CODES)
+    uses_0 = np.isin(opcodes, ops.SINGLE_GATE_CODES) | \
+        np.isin(opcodes, ops.DUAL_GATE_CODES) | \
+        np.isin(opcodes, [ops.STATE_PREPARATION, ops.QUBIT_MEASURE]) | control
+    uses_1 = np.isin(opcodes, ops.DUAL_GATE_CODES) | control
+    latest_control = ops.latest(control)
+    redundant = np.zeros(len(opcodes), dtype=bool)
+    for page, uses, offset in ((ops.PAGE_SET_QUBIT_0, uses_0, offsets[0]),
+                               (ops.PAGE_SET_QUBIT_1, uses_1, offsets[1])):
+        is_page = opcodes == page
+
+        # index of the next page and of the next use after each command
+        def following(mask):
+            reverse = ops.latest(mask[::-1])[::-1]
+            return np.where(reverse >= 0, len(mask) - 1 - reverse, len(mask))
+
+        superseded = is_page & (following(is_page) < following(uses))
+        pages = np.flatnonzero(is_page & ~superseded)
+        previous = np.concatenate(([offset], values[pages][:-1]))
+        known = latest_control[pages] <= np.concatenate(([-1], pages[:-1]))
+        redundant[superseded] = True
+        redundant[pages[known & (values[pages] == previous)]] = True
+    return redundant
+
+
+def optimize_program(
+    commands: np.ndarray,
+    offsets: Sequence[int] = (0, 0)
+) -> OptimizedProgram:
+    """Removes or merges the wasteful commands of a program.
+
+    On each qubit, adjacent gates that cancel (X.X, H.H, T.INVT, S.INVS,
+    ...) are removed, repeatedly, and adjacent rotations of the same axis
+    are merged by adding their 16-bit angles modulo 2**16. Two identical
+    CNOT or SWAP commands with no command in between on their qubits
+    cancel as well. Gates are equal to their simplifications up to a global
+    phase. Finally, PAGE_SET_QUBIT commands that do not change the offset
+    seen by any command are removed.
+
+    Every qubit keeps a stack of its last gates, so the pass is linear in
+    the number of commands.
+
+    Parameters
+    ----------
+    commands : np.ndarray
+        Array of 64-bit HAL commands.
+    offsets : Sequence[int], optional
+        Base indexes of qubit 0 and 1 before the first command.
+
+    Returns
+    -------
+    OptimizedProgram
+        The optimised commands and the number of commands removed.
+    """
+    commands = np.asarray(commands, dtype=uint64)
+    opcodes, args_0, _, values, _ = command_array_unpacker(commands)
+    qubits_0, qubits_1 = resolve_qubit_indexes(commands, offsets)
+
+    kinds = _KINDS[opcodes]
+    words = np.flatnonzero(kinds != _IGNORED)
+    removed = np.zeros(len(commands), dtype=bool)
+    angles = args_0.copy()
+    stacks = {}
+    for word, kind, code, qubit_0, qubit_1, angle in zip(
+        words.tolist(), kinds[words].tolist(), opcodes[words].tolist(),
+        qubits_0[words].tolist(), qubits_1[words].tolist(),
+        args_0[words].tolist()
+    ):
+        if kind == _BARRIER:
+            stacks = {}
+        elif kind == _QUBIT_BARRIER:
+            stacks[qubit_0] = []
+        elif kind == _DUAL_BARRIER:
+            stacks[qubit_0] = []
+            stacks[qubit_1] = []
+        elif kind == _DUAL_INVOLUTION:
+            stack_0 = stacks.setdefault(qubit_0, [])
+            stack_1 = stacks.setdefault(qubit_1, [])
+            key = (code, qubit_0, qubit_1)
+            if stack_0 and stack_1 and stack_0[-1] is stack_1[-1] and \
+                    stack_0[-1][1] == key:
+                removed[stack_0.pop()[0]] = True
+                stack_1.pop()
+                removed[word] = True
+            else:
+                entry = (word, key)
+                stack_0.append(entry)
+                stack_1.append(entry)
+        else:
+            stack = stacks.setdefault(qubit_0, [])
+            code = _CANONICAL.get(code, code)
+            if kind == _INVERTIBLE and stack and \
+                    stack[-1][1] == _INVERSES[code]:
+                removed[stack.pop()[0]] = True
+                removed[word] = True
+            elif kind == _ROTATION and stack and stack[-1][1] == code:
+                top = stack[-1][0]
+                angles[top] = (angles[top] + angle) % (1 << 16)
+                removed[word] = True
+                if angles[top] == 0:
+                    removed[top] = True
+                    stack.pop()
+            elif kind == _ROTATION and angle == 0:
+                removed[word] = True
+            else:
+                stack.append((word, code))
+
+    merged = angles != args_0
+    commands = commands.copy()
+    commands[merged] = (commands[merged] & ~uint64(Masks.ARG0_MASK.value)) | \
+        (angles[merged].astype(uint64) << uint64(Shifts.ARG0.value))
+    kept = ~removed
+    commands, opcodes, values = commands[kept], opcodes[kept], values[kept]
+    commands = commands[~_redundant_pages(opcodes, values, offsets)]
+
+    return OptimizedProgram(commands, int(len(removed) - len(commands)))
@@ -0,0 +1,273 @@
+from typing import NamedTuple, Sequence, Tuple
+from weakref import WeakKeyDictionary
+
+import numpy as np
+from numpy import uint64
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import shortest_path
+
+from ._paging import page_program
+from ..hal import _opcodes as ops
+from ..hal._commands import (command_array_unpacker, command_creator,
+                             resolve_qubit_indexes)
+
+#: cost of a SWAP on an error free coupling, so that the shortest paths
+#: also have the fewest SWAPs
+_HOP_WEIGHT = 1e-6
+
+#: distance table of each device, dropped with its metadata
+_DISTANCE_TABLES = WeakKeyDictionary()
+
+
+class DistanceTable(NamedTuple):
+    """All-pairs shortest paths over the coupling graph of a device."""
+    #: ``(num_qubits, num_qubits)`` error-weighted distances, inf if two
+    #: qubits are not connected
+    distances: np.ndarray
+    #: ``(num_qubits, num_qubits)`` predecessor of qubit ``j`` on the
+    #: shortest path from qubit ``i``, -9999 if there is none
+    predecessors: np.ndarray
+    #: coupled qubits of each qubit
+    neighbours: Tuple[frozenset, ...]
+
+
+def _coupling_errors(hal_metadata) -> np.ndarray:
+    """Error rates of the two qubit gate used to SWAP, zero if unknown."""
+    num_qubits = hal_metadata.num_qubits
+    for gate in ("SWAP", "CNOT", *hal_metadata.native_gates):
+        if gate in hal_metadata.native_gates and \
+                ops.code(gate) in ops.DUAL_GATE_CODES:
+            errors = np.asarray(
+                hal_metadata.native_gates[gate][1], dtype=float
+            )
+            if errors.ndim == 2:
+                padded = np.zeros((num_qubits, num_qubits))
+                padded[:errors.shape[0], :errors.shape[1]] = errors
+                return np.maximum(padded, padded.T)
+    return np.zeros((num_qubits, num_qubits))
+
+
+def _distance_table(hal_metadata) -> DistanceTable:
+    connectivity = np.asarray(hal_metadata.connectivity) != 0
+    coupled = (connectivity | connectivity.T) & \
+        ~np.eye(hal_metadata.num_qubits, dtype=bool)
+    weights = -np.log1p(-_coupling_errors(hal_metadata)) + _HOP_WEIGHT
+    graph = csr_matrix(np.where(coupled, weights, 0))
+    distances, predecessors = shortest_path(
+        graph, method="D", directed=False, return_predecessors=True
+    )
+    neighbours = tuple(
+        frozenset(np.flatnonzero(row).tolist()) for row in coupled
+    )
+    return DistanceTable(distances, predecessors, neighbours)
+
+
+def distance_table(hal_metadata) -> DistanceTable:
+    """Returns the error-weighted all-pairs shortest paths between the
+    qubits of a device.
+
+    The weight of a coupling is ``-log(1 - error)`` of the SWAP (or else
+    CNOT) gate on it, so that the shortest path is the most reliable chain
+    of SWAPs. Tables are cached per device, i.e. per ``hal_metadata``
+    instance, which is assumed not to change once routed on.
+
+    Parameters
+    ----------
+    hal_metadata : HALMetadata
+        Metadata of the device. Its connectivity is read as undirected.
+
+    Returns
+    -------
+    DistanceTable
+        Distances and shortest path predecessors.
+    """
+    table = _DISTANCE_TABLES.get(hal_metadata)
+    if table is None:
+        table = _DISTANCE_TABLES[hal_metadata] = _distance_table(hal_metadata)
+    return table
+
+
+class RoutedProgram(NamedTuple):
+    """Program rewritten so that every two qubit gate acts on coupled
+    qubits."""
+    #: commands acting on physical qubits, re-paged with PAGE_SET_QUBIT
+    #: commands where needed
+    commands: np.ndarray
+    #: physical qubit of each logical qubit at the start of the program
+    initial_layout: np.ndarray
+    #: physical qubit of each logical qubit at the end of the program,
+    #: measurement results refer to the physical qubits
+    final_layout: np.ndarray
+    #: number of inserted SWAP commands
+    n_swaps: int
+
+
+def route_program(
+    commands: np.ndarray,
+    hal_metadata,
+    initial_layout: Sequence[int] = None,
+    offsets: Sequence[int] = (0, 0)
+) -> RoutedProgram:
+    """Inserts SWAP commands in a program so that every two qubit gate acts
+    on qubits coupled in ``hal_metadata.connectivity``.
+
+    Before a gate on uncoupled qubits, its qubit 0 is swapped along the
+    error-weighted shortest path (see ``distance_table``) until it is next
+    to its qubit 1. A block of FOR_START, IF or WHILE may run several times
+    or not at all, so the SWAPs inserted in it are undone, in reverse
+    order, before its FOR_END: every block ends with the layout it started
+    with. Only the two qubit gates and the control flow commands are
+    visited one by one: the other commands are remapped to the current
+    layout with a vectorised lookup. The PAGE_SET_QUBIT commands are dropped and the program is
+    re-paged over the physical qubit indexes, see ``page_program``,
+    without reordering its commands.
+
+    Parameters
+    ----------
+    commands : np.ndarray
+        Array of 64-bit HAL commands acting on logical qubits.
+    hal_metadata : HALMetadata
+        Metadata of the device.
+    initial_layout : Sequence[int], optional
+        Physical qubit of each logical qubit, by default the identity.
+    offsets : Sequence[int], optional
+        Base indexes of qubit 0 and 1 before the first command.
+
+    Returns
+    -------
+    RoutedProgram
+        The routed program and its layouts.
+
+    Raises
+    ------
+    ValueError
+        If a qubit index is out of range, two qubits of a gate are not
+        connected, or a physical qubit index cannot be paged.
+    """
+    num_qubits = hal_metadata.num_qubits
+    table = distance_table(hal_metadata)
+    if initial_layout is None:
+        initial_layout = np.arange(num_qubits)
+    initial_layout = np.asarray(initial_layout, dtype=np.int64)
+    if sorted(initial_layout.tolist()) != list(range(num_qubits)):
+        raise ValueError("Initial layout is not a permutation of the qubits!")
+
+    commands = np.asarray(commands, dtype=uint64)
+    opcodes = command_array_unpacker(commands)[0]
+    qubits_0, qubits_1 = resolve_qubit_indexes(commands, offsets)
+    kept = ~np.isin(opcodes, [ops.PAGE_SET_QUBIT_0, ops.PAGE_SET_QUBIT_1])
+    commands, opcodes = commands[kept], opcodes[kept]
+    qubits_0, qubits_1 = qubits_0[kept], qubits_1[kept]
+
+    single = np.isin(opcodes, ops.SINGLE_GATE_CODES) | \
+        np.isin(opcodes, [ops.STATE_PREPARATION, ops.QUBIT_MEASURE])
+    dual_words = np.flatnonzero(np.isin(opcodes, ops.DUAL_GATE_CODES))
+    if (single & (qubits_0 >= num_qubits)).any() or np.any(
+            qubits_0[dual_words] >= num_qubits) or np.any(
+            qubits_1[dual_words] >= num_qubits):
+        raise ValueError(
+            f"Qubit index greater than number of qubits ({num_qubits})!"
+        )
+
+    # route the two qubit gates, recording every change of layout
+    position = initial_layout.tolist()  # logical -> physical
+    occupant = np.argsort(initial_layout).tolist()  # physical -> logical
+    neighbours = table.neighbours
+    predecessors = table.predecessors
+    dual_physical = []
+    swaps = []  # (word index, physical qubit 0, physical qubit 1)
+    moves = []  # (word index, logical qubit, new physical qubit)
+    blocks = []  # SWAPs inserted in each open block
+
+    def swap(word: int, physical_0: int, physical_1: int,
+             undo: bool = False):
+        """Inserts a SWAP before ``word``, to be undone at the end of the
+        innermost open block unless it ``undo``es one."""
+        logical_0, logical_1 = occupant[physical_0], occupant[physical_1]
+        swaps.append((word, physical_0, physical_1))
+        moves.append((word, logical_0, physical_1))
+        moves.append((word, logical_1, physical_0))
+        position[logical_0], position[logical_1] = physical_1, physical_0
+        occupant[physical_0], occupant[physical_1] = logical_1, logical_0
+        if blocks and not undo:
+            blocks[-1].append((physical_0, physical_1))
+
+    visited = np.flatnonzero(
+        np.isin(opcodes, ops.DUAL_GATE_CODES) |
+        np.isin(opcodes, ops.CONTROL_FLOW_CODES)
+    )
+    for word, code, logical_0, logical_1 in zip(
+        visited.tolist(),
+        opcodes[visited].tolist(),
+        qubits_0[visited].tolist(),
+        qubits_1[visited].tolist()
+    ):
+        if code == ops.FOR_END:
+            for pair in reversed(blocks.pop() if blocks else []):
+                swap(word, *pair, undo=True)
+            continue
+        if code in ops.CONTROL_FLOW_CODES:
+            blocks.append([])
+            continue
+        physical_0 = position[logical_0]
+        physical_1 = position[logical_1]
+        if physical_1 not in neighbours[physical_0]:
+            if np.isinf(table.distances[physical_0, physical_1]):
+                raise ValueError(
+                    f"Qubits {physical_0} and {physical_1} are not "
+                    "connected!"
+                )
+            path = []
+            node = int(predecessors[physical_1, physical_0])
+            while node != physical_1:
+                path.append(node)
+                node = int(predecessors[physical_1, node])
+            for node in path:
+                swap(word, physical_0, node)
+                physical_0 = node
+        dual_physical.append((physical_0, physical_1))
+
+    # physical qubit of the single qubit commands: latest move of their
+    # logical qubit, or its initial position
+    single_words = np.flatnonzero(single)
+    physical = initial_layout[qubits_0[single_words]]
+    if moves:
+        move_words, move_qubits, move_physical = \
+            np.array(moves, dtype=np.int64).T
+        n_words = len(opcodes) + 1
+        keys = move_qubits * n_words + move_words
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+        queries = qubits_0[single_words] * n_words + single_words
+        latest = np.searchsorted(keys, queries, side="right") - 1
+        moved = (latest >= 0) & \
+            (keys[np.maximum(latest, 0)] // n_words == qubits_0[single_words])
+        physical = np.where(
+            moved, move_physical[order][np.maximum(latest, 0)], physical
+        )
+
+    physical_0 = qubits_0.copy()
+    physical_1 = qubits_1.copy()
+    physical_0[single_words] = physical
+    if dual_physical:
+        dual_physical = np.array(dual_physical, dtype=np.int64)
+        physical_0[dual_words] = dual_physical[:, 0]
+        physical_1[dual_words] = dual_physical[:, 1]
+
+    # insert the SWAP commands before the gates they route
+    if swaps:
+        swap_words, swap_0, swap_1 = np.array(swaps, dtype=np.int64).T
+        commands = np.insert(
+            commands, swap_words, uint64(command_creator("SWAP", 0, 0, 0, 0))
+        )
+        physical_0 = np.insert(physical_0, swap_words, swap_0)
+        physical_1 = np.insert(physical_1, swap_words, swap_1)
+
+    return RoutedProgram(
+        commands=page_program(
+            commands, physical_0, physical_1, offsets, reorder=False
+        ),
+        initial_layout=initial_layout,
+        final_layout=np.array(position),
+        n_swaps=len(swaps)
+    )
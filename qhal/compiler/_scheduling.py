@@ -0,0 +1,179 @@
+from typing import NamedTuple, Sequence
+
+import numpy as np
+from numpy import uint64
+
+from ._paging import page_program
+from ..hal import _opcodes as ops
+from ..hal._commands import command_array_unpacker, resolve_qubit_indexes
+
+# role of a command on each of its qubits: commands with the same Z or X
+# role on a qubit commute on it
+_NONE = -1  # does not act on the qubit
+_OTHER = 0
+_Z = 1  # diagonal
+_X = 2  # diagonal in the X basis
+
+_ROLES_0 = np.full(1 << 12, _NONE, dtype=np.int64)
+_ROLES_1 = np.full(1 << 12, _NONE, dtype=np.int64)
+_ROLES_0[ops.SINGLE_GATE_CODES] = _OTHER
+_ROLES_0[ops.DUAL_GATE_CODES] = _OTHER
+_ROLES_1[ops.DUAL_GATE_CODES] = _OTHER
+_ROLES_0[[ops.STATE_PREPARATION, ops.QUBIT_MEASURE]] = _OTHER
+_ROLES_0[[ops.code(gate) for gate in ("Z", "PAULI_Z", "S", "INVS", "T",
+                                      "INVT", "RZ", "PHASE", "R")]] = _Z
+_ROLES_0[[ops.code(gate) for gate in ("X", "PAULI_X", "RX", "SQRT_X")]] = _X
+# CNOT is controlled by qubit 1
+_ROLES_0[ops.code("CNOT")], _ROLES_1[ops.code("CNOT")] = _X, _Z
+_ROLES_0[ops.code("RZZ")], _ROLES_1[ops.code("RZZ")] = _Z, _Z
+_ROLES_0[ops.code("RXX")], _ROLES_1[ops.code("RXX")] = _X, _X
+
+_IS_BARRIER = np.zeros(1 << 12, dtype=bool)
+_IS_BARRIER[[ops.START_SESSION, ops.END_SESSION, ops.STATE_PREPARATION_ALL,
+             ops.QUBIT_MEASURE_ALL, ops.REQUEST_METADATA,
+             *ops.CONTROL_FLOW_CODES]] = True
+
+
+class Schedule(NamedTuple):
+    """Program grouped into layers of commuting commands."""
+    #: commands, sorted by layer if reordered
+    commands: np.ndarray
+    #: layer of each command, -1 for the PAGE_SET_QUBIT commands of a
+    #: program that is not reordered
+    layers: np.ndarray
+    #: number of layers
+    n_layers: int
+    #: ``(n_layers + 1,)`` start of each layer in ``commands`` and end of
+    #: the last one, None if the program is not reordered
+    boundaries: np.ndarray = None
+
+    def layer(self, index: int) -> np.ndarray:
+        """Returns the commands of a layer of a reordered program."""
+        if self.boundaries is None:
+            raise ValueError("Program is not reordered by layer!")
+        return self.commands[self.boundaries[index]:
+                             self.boundaries[index + 1]]
+
+
+def _asap_layers(
+    opcodes: np.ndarray,
+    qubits_0: np.ndarray,
+    qubits_1: np.ndarray
+) -> np.ndarray:
+    """Returns the earliest layer of every command.
+
+    Each qubit keeps the run of its latest commands with the same Z or X
+    role: a command with that role only waits for the commands before the
+    run, any other command waits for the whole run. Commands that act on
+    every qubit get a layer of their own.
+    """
+    roles_0 = _ROLES_0[opcodes]
+    roles_1 = _ROLES_1[opcodes]
+    barriers = _IS_BARRIER[opcodes]
+    layers = np.empty(len(opcodes), dtype=np.int64)
+
+    floor = top = -1
+    runs = {}  # qubit -> [role, layer before the run, last layer of the run]
+    for word, (role_0, role_1, barrier, qubit_0, qubit_1) in enumerate(zip(
+        roles_0.tolist(), roles_1.tolist(), barriers.tolist(),
+        qubits_0.tolist(), qubits_1.tolist()
+    )):
+        if barrier:
+            top = floor = top + 1
+            layers[word] = floor
+            runs = {}
+            continue
+        acts = [(qubit, role) for qubit, role in ((qubit_0, role_0),
+                                                  (qubit_1, role_1))
+                if role != _NONE]
+        layer = floor + 1
+        for qubit, role in acts:
+            run = runs.get(qubit)
+            if run is not None:
+                layer = max(layer, (run[1] if role != _OTHER and
+                                    run[0] == role else run[2]) + 1)
+        for qubit, role in acts:
+            run = runs.get(qubit)
+            if run is not None and role != _OTHER and run[0] == role:
+                run[2] = max(run[2], layer)
+            else:
+                runs[qubit] = [role, floor if run is None else run[2], layer]
+        layers[word] = layer
+        top = max(top, layer)
+    return layers
+
+
+def schedule_program(
+    commands: np.ndarray,
+    alap: bool = False,
+    reorder: bool = True,
+    offsets: Sequence[int] = (0, 0)
+) -> Schedule:
+    """Groups the commands of a program into layers, so that the commands
+    of a layer commute and can be applied at the same time.
+
+    Commands on different qubits commute, and so do the gates diagonal in
+    the same basis on a qubit: Z, S, T, RZ, PHASE, R and the control of a
+    CNOT or an RZZ in the Z basis, X, RX, SQRT_X and the target of a CNOT or
+    an RXX in the X basis. Session, register and control flow commands are
+    layers of their own. The dependencies are tracked per qubit in a single
+    pass, so scheduling is linear in the number of commands.
+
+    A layer can contain several commuting gates on a qubit, so backends
+    applying a layer at once must multiply the gates of each qubit.
+
+    Parameters
+    ----------
+    commands : np.ndarray
+        Array of 64-bit HAL commands.
+    alap : bool, optional
+        Whether to schedule every command as late as possible rather than
+        as soon as possible, False by default.
+    reorder : bool, optional
+        Whether to sort the commands by layer, True by default. The
+        PAGE_SET_QUBIT commands are then re-encoded with ``page_program``.
+    offsets : Sequence[int], optional
+        Offsets of qubit 0 and 1 before the first command.
+
+    Returns
+    -------
+    Schedule
+        The commands and their layers.
+    """
+    commands = np.asarray(commands, dtype=uint64)
+    opcodes = command_array_unpacker(commands)[0]
+    qubits_0, qubits_1 = resolve_qubit_indexes(commands, offsets)
+    pages = np.isin(opcodes, [ops.PAGE_SET_QUBIT_0, ops.PAGE_SET_QUBIT_1])
+    kept = np.flatnonzero(~pages)
+
+    if alap:
+        reverse = kept[::-1]
+        layers = _asap_layers(
+            opcodes[reverse], qubits_0[reverse], qubits_1[reverse]
+        )[::-1]
+        layers = layers.max(initial=-1) - layers
+    else:
+        layers = _asap_layers(opcodes[kept], qubits_0[kept], qubits_1[kept])
+    n_layers = int(layers.max(initial=-1)) + 1
+
+    if not reorder:
+        all_layers = np.full(len(commands), -1, dtype=np.int64)
+        all_layers[kept] = layers
+        return Schedule(commands, all_layers, n_layers)
+
+    order = kept[np.argsort(layers, kind="stable")]
+    layers = np.sort(layers, kind="stable")
+    paged = page_program(commands[order], qubits_0[order], qubits_1[order],
+                         offsets=offsets, reorder=False)
+    # PAGE_SET_QUBIT commands are in the layer of the command following them
+    paged_opcodes = command_array_unpacker(paged)[0]
+    kept = ~np.isin(paged_opcodes,
+                    [ops.PAGE_SET_QUBIT_0, ops.PAGE_SET_QUBIT_1])
+    following = np.cumsum(kept[::-1])[::-1]
+    paged_layers = layers[len(layers) - following]
+    return Schedule(
+        commands=paged,
+        layers=paged_layers,
+        n_layers=n_layers,
+        boundaries=np.searchsorted(paged_layers, np.arange(n_layers + 1))
+    )
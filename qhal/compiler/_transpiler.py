@@ -0,0 +1,370 @@
+from functools import lru_cache
+from typing import FrozenSet, List, Sequence, Tuple
+
+import numpy as np
+from numpy import uint64
+
+from ._paging import page_program
+from ..hal import _opcodes as ops
+from ..hal._commands import (_OPCODES_BY_CODE, command_array_unpacker,
+                             resolve_qubit_indexes, Masks, Shifts)
+from ..hal._utils import angle_binary_representation
+from ..quantum_simulators._numpy_gates import (CONSTANT_GATE_MATRICES,
+                                               gate_matrix)
+
+_H = CONSTANT_GATE_MATRICES["H"]
+_S = CONSTANT_GATE_MATRICES["S"]
+_INVS = CONSTANT_GATE_MATRICES["INVS"]
+_X = CONSTANT_GATE_MATRICES["X"]
+_Z = CONSTANT_GATE_MATRICES["Z"]
+_QUARTER = 1 << 14  # pi / 2 in 16-bit angle units
+
+# Decompositions of every gate over a small intermediate gate set, in order
+# of application. Items are ("U", slot, matrix) for constant single qubit
+# gates, ("RZ", slot, m, c), ("RZZ", m, c) for rotations of angle
+# m * arg + c (16-bit units), ("CNOT", control slot, target slot) and
+# ("SWAP",). Slot 0 is qubit 0 of the command and slot 1 its qubit 1.
+_INTERMEDIATE = {
+    "RZ": [("RZ", 0, 1, 0)],
+    "PHASE": [("RZ", 0, 1, 0)],
+    "R": [("RZ", 0, 1, 0)],
+    "RX": [("U", 0, _H), ("RZ", 0, 1, 0), ("U", 0, _H)],
+    "RY": [("U", 0, _H @ _INVS), ("RZ", 0, 1, 0), ("U", 0, _S @ _H)],
+    "PIXY": [("U", 0, _X), ("RZ", 0, 2, 0)],
+    "PIYZ": [("U", 0, _H @ _Z), ("RZ", 0, -2, 0), ("U", 0, _H)],
+    "PIZX": [("U", 0, _H @ _INVS @ _Z), ("RZ", 0, 2, 0), ("U", 0, _S @ _H)],
+    "CNOT": [("CNOT", 1, 0)],
+    "SWAP": [("SWAP",)],
+    "RZZ": [("RZZ", 1, 0)],
+    "RXX": [("U", 0, _H), ("U", 1, _H), ("RZZ", 1, 0),
+            ("U", 0, _H), ("U", 1, _H)],
+    "PSWAP": [("RZZ", 1, 0), ("SWAP",)],
+}
+
+# template step kinds
+_COPY = 0  # the command itself, with absolute qubit indexes
+_SINGLE = 1  # single qubit gate on the qubit of a slot
+_DUAL = 2  # two qubit gate, on (qubit 0, qubit 1) or swapped
+
+
+def _equal_up_to_phase(a: np.ndarray, b: np.ndarray) -> bool:
+    overlap = np.vdot(b, a)
+    return abs(abs(overlap) - len(a)) < 1e-9
+
+
+def _zyz_angles(matrix: np.ndarray) -> Tuple[float, float, float]:
+    """Angles ``(beta, gamma, delta)`` such that the matrix is
+    ``RZ(beta) RY(gamma) RZ(delta)`` up to a phase."""
+    special = matrix / np.sqrt(np.linalg.det(matrix))
+    a, b = special[1, 1], special[1, 0]
+    gamma = 2 * np.arctan2(abs(b), abs(a))
+    if abs(b) < 1e-9:
+        return 2 * np.angle(a), 0.0, 0.0
+    if abs(a) < 1e-9:
+        return 2 * np.angle(b), gamma, 0.0
+    return np.angle(a) + np.angle(b), gamma, np.angle(a) - np.angle(b)
+
+
+class _Lowering:
+    """Lowers intermediate decompositions to template steps over a native
+    gate set, merging the constant single qubit gates of each slot into
+    Euler rotations."""
+
+    def __init__(self, native: FrozenSet[str]):
+        self.native = native
+        self.z_gate = next(
+            (gate for gate in ("RZ", "PHASE", "R") if gate in native), None
+        )
+        self.constant_gates = [
+            gate for gate in native
+            if gate in CONSTANT_GATE_MATRICES and
+            ops.code(gate) in ops.SINGLE_GATE_CODES
+        ]
+
+    def lower(self, items: list) -> List[tuple]:
+        self.steps = []
+        self.pending = [np.eye(2), np.eye(2)]
+        for item in items:
+            getattr(self, "_" + item[0].lower())(*item[1:])
+        self._flush(0)
+        self._flush(1)
+        return self.steps
+
+    def _emit(self, gate: str, kind: int, target: int, m: int = 0,
+              c: int = 0):
+        self.steps.append((ops.code(gate), kind, target, m, c % (1 << 16)))
+
+    def _u(self, slot: int, matrix: np.ndarray):
+        self.pending[slot] = matrix @ self.pending[slot]
+
+    def _rotation(self, gate: str, slot: int, angle: float):
+        self._emit(gate, _SINGLE, slot, 0, angle_binary_representation(angle))
+
+    def _flush(self, slot: int):
+        """Emits the pending constant gates of a slot."""
+        matrix = self.pending[slot]
+        self.pending[slot] = np.eye(2)
+        if _equal_up_to_phase(matrix, np.eye(2)):
+            return
+        for gate in self.constant_gates:
+            if _equal_up_to_phase(matrix, CONSTANT_GATE_MATRICES[gate]):
+                self._emit(gate, _SINGLE, slot)
+                return
+
+        native, z = self.native, self.z_gate
+        beta, gamma, delta = _zyz_angles(matrix)
+        if z and abs(gamma) < 1e-9:
+            rotations = [(z, beta + delta)]
+        elif z and "RY" in native:
+            rotations = [(z, delta), ("RY", gamma), (z, beta)]
+        elif z and "RX" in native:
+            rotations = [(z, delta - np.pi / 2), ("RX", gamma),
+                         (z, beta + np.pi / 2)]
+        elif "RX" in native and "RY" in native:
+            beta, gamma, delta = _zyz_angles(_H @ matrix @ _H)
+            rotations = [("RX", delta), ("RY", -gamma), ("RX", beta)]
+        elif z and "H" in native:
+            # RY = S H RZ H S^dagger, the S gates merging into the Z
+            # rotations
+            rotations = [(z, delta - np.pi / 2), ("H", None), (z, gamma),
+                         ("H", None), (z, beta + np.pi / 2)]
+        elif z and "SQRT_X" in native:
+            rotations = [(z, delta), ("SQRT_X", None), (z, gamma + np.pi),
+                         ("SQRT_X", None), (z, beta + np.pi)]
+        else:
+            raise ValueError("No native decomposition!")
+        for gate, angle in rotations:
+            if angle is None:
+                self._emit(gate, _SINGLE, slot)
+            elif angle_binary_representation(angle) % (1 << 16):
+                self._rotation(gate, slot, angle)
+
+    def _rz(self, slot: int, m: int, c: int):
+        if self.z_gate:
+            self._flush(slot)
+            self._emit(self.z_gate, _SINGLE, slot, m, c)
+        elif "RX" in self.native:
+            self._u(slot, _H)
+            self._flush(slot)
+            self._emit("RX", _SINGLE, slot, m, c)
+            self._u(slot, _H)
+        elif "RY" in self.native:
+            self._u(slot, _S @ _H)
+            self._flush(slot)
+            self._emit("RY", _SINGLE, slot, m, c)
+            self._u(slot, _H @ _INVS)
+        else:
+            raise ValueError("No native decomposition!")
+
+    def _cnot(self, control: int, target: int):
+        if "CNOT" in self.native:
+            self._flush(0)
+            self._flush(1)
+            # CNOT commands are controlled by their qubit 1
+            self._emit("CNOT", _DUAL, int(control == 0))
+        elif "RZZ" in self.native or "RXX" in self.native:
+            self._u(target, _H)
+            self._rzz(0, -_QUARTER)
+            self._u(control, gate_matrix("RZ", np.pi / 2))
+            self._u(target, _H @ gate_matrix("RZ", np.pi / 2))
+        else:
+            raise ValueError("No native decomposition!")
+
+    def _rzz(self, m: int, c: int):
+        if "RZZ" in self.native:
+            self._flush(0)
+            self._flush(1)
+            self._emit("RZZ", _DUAL, 0, m, c)
+        elif "RXX" in self.native:
+            self._u(0, _H)
+            self._u(1, _H)
+            self._flush(0)
+            self._flush(1)
+            self._emit("RXX", _DUAL, 0, m, c)
+            self._u(0, _H)
+            self._u(1, _H)
+        else:
+            self._cnot(1, 0)
+            self._rz(0, m, c)
+            self._cnot(1, 0)
+
+    def _swap(self):
+        if "SWAP" in self.native:
+            self._flush(0)
+            self._flush(1)
+            self._emit("SWAP", _DUAL, 0)
+        else:
+            self._cnot(1, 0)
+            self._cnot(0, 1)
+            self._cnot(1, 0)
+
+
+@lru_cache(maxsize=16)
+def _templates(native: FrozenSet[str]) -> Tuple[np.ndarray, ...]:
+    """Builds the template of every opcode for a native gate set.
+
+    Returns
+    -------
+    starts, lengths : np.ndarray
+        First step and number of steps of the template of each opcode code,
+        -1 for the gates that have no decomposition.
+    steps : np.ndarray
+        ``(n_steps, 5)`` array of (code, kind, target, m, c) steps.
+    """
+    starts = np.zeros(1 << 12, dtype=np.int64)
+    lengths = np.ones(1 << 12, dtype=np.int64)
+    steps = [(0, _COPY, 0, 0, 0)]
+    lengths[[ops.PAGE_SET_QUBIT_0, ops.PAGE_SET_QUBIT_1]] = 0
+
+    lowering = _Lowering(native)
+    gates = np.concatenate((ops.SINGLE_GATE_CODES, ops.DUAL_GATE_CODES))
+    for code in gates.tolist():
+        name = _OPCODES_BY_CODE[code].name
+        if name in native:
+            continue
+        items = _INTERMEDIATE.get(name) or [
+            ("U", 0, CONSTANT_GATE_MATRICES[name])
+        ]
+        try:
+            template = lowering.lower(items)
+        except ValueError:
+            lengths[code] = -1
+            continue
+        starts[code] = len(steps)
+        lengths[code] = len(template)
+        steps.extend(template)
+    return starts, lengths, np.array(steps, dtype=np.int64)
+
+
+def _merge_rotations(
+    commands: np.ndarray,
+    qubits: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Merges runs of the same single qubit rotation on the same qubit,
+    adding their 16-bit angles, and drops the rotations of angle zero.
+
+    Parameters
+    ----------
+    commands : np.ndarray
+        Array of 64-bit HAL commands, whose qubit index fields are ignored.
+    qubits : np.ndarray
+        Absolute index of qubit 0 of each command.
+
+    Returns
+    -------
+    commands : np.ndarray
+        The merged commands.
+    words : np.ndarray
+        Index of the first command of the run of each merged command.
+    """
+    rotation_codes = [
+        ops.code(gate) for gate in ("RX", "RY", "RZ", "PHASE", "R")
+    ]
+    opcodes = (commands >> uint64(Shifts.OPCODE.value)).astype(np.int64)
+    is_rotation = np.isin(opcodes, rotation_codes)
+    keys = commands & ~uint64(Masks.ARG0_MASK.value)
+    continues = np.zeros(len(commands), dtype=bool)
+    continues[1:] = is_rotation[1:] & is_rotation[:-1] & \
+        (keys[1:] == keys[:-1]) & (qubits[1:] == qubits[:-1])
+    run_starts = np.flatnonzero(~continues)
+
+    angles = ((commands & uint64(Masks.ARG0_MASK.value))
+              >> uint64(Shifts.ARG0.value)).astype(np.int64)
+    angles = np.add.reduceat(angles, run_starts) % (1 << 16) \
+        if len(commands) else angles
+    merged = keys[run_starts] | \
+        (angles.astype(uint64) << uint64(Shifts.ARG0.value))
+    kept = ~(is_rotation[run_starts] & (angles == 0))
+    return merged[kept], run_starts[kept]
+
+
+def transpile_program(
+    commands: np.ndarray,
+    hal_metadata,
+    offsets: Sequence[int] = (0, 0)
+) -> np.ndarray:
+    """Lowers the gates of a program that are not native to the device into
+    sequences of native gates, e.g. H into RZ and SQRT_X, or CNOT into RZZ
+    and single qubit gates.
+
+    Decomposition templates are built once per native gate set and applied
+    to the whole buffer at once: every command is expanded into the steps
+    of its template with array indexing, the angles of parametrised gates
+    being affine in the angle of the command. Adjacent rotations of the
+    same qubit are then merged. Gates are equal to their decompositions up
+    to a global phase.
+
+    The PAGE_SET_QUBIT commands are dropped and the lowered program is
+    re-paged, see ``page_program``, without reordering its commands.
+
+    Parameters
+    ----------
+    commands : np.ndarray
+        Array of 64-bit HAL commands.
+    hal_metadata : HALMetadata
+        Metadata of the device, whose ``native_gates`` are the target gate
+        set.
+    offsets : Sequence[int], optional
+        Base indexes of qubit 0 and 1 before the first command.
+
+    Returns
+    -------
+    np.ndarray
+        Array of 64-bit HAL commands with native gates only.
+
+    Raises
+    ------
+    ValueError
+        If a gate has no decomposition over the native gates, or a qubit
+        index cannot be paged.
+    """
+    starts, lengths, steps = _templates(frozenset(hal_metadata.native_gates))
+
+    commands = np.asarray(commands, dtype=uint64)
+    opcodes, args_0, args_1, _, _ = command_array_unpacker(commands)
+    qubits_0, qubits_1 = resolve_qubit_indexes(commands, offsets)
+
+    word_lengths = lengths[opcodes]
+    if (word_lengths < 0).any():
+        unsupported = sorted(set(ops.NAMES[opcodes[word_lengths < 0]]))
+        raise ValueError(
+            f"{', '.join(unsupported)} cannot be decomposed into the native "
+            f"gates {sorted(hal_metadata.native_gates)}!"
+        )
+
+    # expand every command into the steps of its template
+    words = np.repeat(np.arange(len(commands)), word_lengths)
+    first_rows = np.cumsum(word_lengths) - word_lengths
+    step_codes, kinds, targets, ms, cs = steps[
+        starts[opcodes][words] +
+        np.arange(len(words)) - np.repeat(first_rows, word_lengths)
+    ].T
+    # parametrised dual commands take their angle from ARG1
+    args = np.where(np.isin(opcodes, ops.DUAL_GATE_CODES), args_1, args_0)
+    angles = (ms * args[words] + cs) % (1 << 16)
+    opcodes, qubits_0, qubits_1 = opcodes[words], qubits_0[words], \
+        qubits_1[words]
+
+    copy = kinds == _COPY
+    swapped = (kinds == _DUAL) & (targets == 1)
+    slot_1 = (kinds == _SINGLE) & (targets == 1)
+    index_0 = np.where(swapped | slot_1, qubits_1, qubits_0)
+    index_1 = np.where(swapped, qubits_0, qubits_1)
+    dual = kinds == _DUAL
+    angle_shift = np.where(dual, Shifts.ARG1.value, Shifts.ARG0.value)
+    # qubit indexes are written by page_program
+    generated = (step_codes.astype(uint64) << uint64(Shifts.OPCODE.value)) | \
+        (angles.astype(uint64) << angle_shift.astype(uint64))
+    copied = commands[words]
+    has_qubits = np.isin(opcodes, ops.SINGLE_GATE_CODES) | \
+        np.isin(opcodes, ops.DUAL_GATE_CODES) | \
+        np.isin(opcodes, [ops.STATE_PREPARATION, ops.QUBIT_MEASURE])
+    copied = np.where(
+        has_qubits,
+        copied & ~uint64(Masks.QUBIT0_MASK.value | Masks.QUBIT1_MASK.value),
+        copied
+    )
+    merged, kept = _merge_rotations(np.where(copy, copied, generated), index_0)
+    return page_program(
+        merged, index_0[kept], index_1[kept], offsets, reorder=False
+    )
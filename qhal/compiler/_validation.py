@@ -0,0 +1,238 @@
+from typing import List, NamedTuple, Sequence
+
+import numpy as np
+from numpy import uint64
+
+from ..hal import _opcodes as ops
+from ..hal._commands import command_array_unpacker, resolve_qubit_indexes
+
+
+class Violation(NamedTuple):
+    """A command of a program that would fail when executed."""
+    index: int
+    message: str
+
+
+def _auto_releases(
+    opcodes: np.ndarray,
+    qubits: np.ndarray,
+    active: np.ndarray,
+    register_size: int
+) -> np.ndarray:
+    """Returns the QUBIT_MEASURE commands that release the register by
+    measuring its last prepared qubit.
+
+    Each release changes the state seen by every following command, so the
+    releases are found with one scalar scan over the commands that
+    allocate, release, prepare or measure qubits, the gates being skipped.
+    """
+    auto_release = np.zeros(len(opcodes), dtype=bool)
+    lifecycle = active & np.isin(opcodes, [
+        ops.STATE_PREPARATION_ALL, ops.STATE_PREPARATION, ops.QUBIT_MEASURE,
+        ops.QUBIT_MEASURE_ALL, ops.END_SESSION
+    ])
+    allocated = False
+    measured = np.zeros(register_size, dtype=bool)
+    n_measured = 0
+    for index, code, qubit in zip(
+        np.flatnonzero(lifecycle).tolist(), opcodes[lifecycle].tolist(),
+        qubits[lifecycle].tolist()
+    ):
+        if code == ops.STATE_PREPARATION and allocated:
+            if measured[qubit]:
+                measured[qubit] = False
+                n_measured -= 1
+        elif code in (ops.STATE_PREPARATION, ops.STATE_PREPARATION_ALL):
+            if not allocated:
+                allocated = True
+                measured[:] = False
+                n_measured = 0
+        elif code == ops.QUBIT_MEASURE:
+            if allocated and not measured[qubit]:
+                measured[qubit] = True
+                n_measured += 1
+                if n_measured == register_size:
+                    auto_release[index] = True
+                    allocated = False
+        else:
+            allocated = False
+    return auto_release
+
+
+def _lifecycle(
+    opcodes: np.ndarray,
+    qubits_0: np.ndarray,
+    qubits_1: np.ndarray,
+    active: np.ndarray,
+    auto_release: np.ndarray
+) -> dict:
+    """Evaluates the register and qubit state before every command, given
+    the commands where measuring the last prepared qubit releases the
+    register, in vectorised passes."""
+    def is_op(*codes):
+        return active & np.isin(opcodes, codes)
+
+    prepare = is_op(ops.STATE_PREPARATION)
+    measure = is_op(ops.QUBIT_MEASURE)
+    measure_all = is_op(ops.QUBIT_MEASURE_ALL)
+    allocate = is_op(ops.STATE_PREPARATION_ALL) | prepare
+    release = is_op(ops.END_SESSION) | measure_all | auto_release
+    allocated = ops.latest(allocate) > ops.latest(release)
+
+    # commands that set the state of every qubit: allocations reset them,
+    # QUBIT_MEASURE_ALL measures them
+    resets = allocate & ~allocated
+    register_setter = ops.latest(resets | measure_all)
+
+    # one event per qubit a command acts on, sorted by qubit then position
+    single = prepare | measure | is_op(*ops.SINGLE_GATE_CODES)
+    dual = is_op(*ops.DUAL_GATE_CODES)
+    event_words = np.concatenate(
+        (np.flatnonzero(single | dual), np.flatnonzero(dual))
+    )
+    event_qubits = np.concatenate(
+        (qubits_0[single | dual], qubits_1[dual])
+    )
+    order = np.lexsort((event_words, event_qubits))
+    event_words = event_words[order]
+    event_qubits = event_qubits[order]
+
+    # latest QUBIT_MEASURE or re-preparation of the same qubit before each
+    # event
+    own_setter_mask = measure[event_words] | \
+        (prepare[event_words] & allocated[event_words])
+    own_setter = ops.latest(own_setter_mask)
+    same_qubit = (own_setter >= 0) & \
+        (event_qubits[np.maximum(own_setter, 0)] == event_qubits)
+    own_words = np.where(same_qubit, event_words[own_setter], -1)
+
+    register_words = register_setter[event_words]
+    measured = np.where(
+        own_words > register_words,
+        measure[np.maximum(own_words, 0)],
+        (register_words >= 0) & measure_all[np.maximum(register_words, 0)]
+    )
+
+    return {
+        "allocated": allocated,
+        "event_words": event_words,
+        "measured": measured,
+    }
+
+
+def validate_program(
+    commands: np.ndarray,
+    register_size: int,
+    offsets: Sequence[int] = (0, 0)
+) -> List[Violation]:
+    """Statically checks a whole program and reports every command that
+    would fail in a simulator, instead of stopping at the first one.
+
+    Tracks the session, the PAGE_SET_QUBIT offsets and the lifecycle of
+    every qubit (allocated, prepared, measured) with vectorised passes over
+    the buffer, plus one linear scan of the register allocations and
+    measurements. A command that fails is assumed to have no effect on the
+    state seen by the following ones. Gates on a register that has not been
+    prepared are reported, although the simulators ignore them.
+
+    Parameters
+    ----------
+    commands : np.ndarray
+        Array of 64-bit HAL commands.
+    register_size : int
+        Size of the qubit register.
+    offsets : Sequence[int], optional
+        Base indexes of qubit 0 and 1 before the first command.
+
+    Returns
+    -------
+    List[Violation]
+        Violations sorted by command index, empty if the program is valid.
+    """
+    commands = np.asarray(commands, dtype=uint64)
+    opcodes = command_array_unpacker(commands)[0]
+    qubits_0, qubits_1 = resolve_qubit_indexes(commands, offsets)
+    violations = []
+
+    def report(indexes: np.ndarray, message: str):
+        violations.extend(
+            Violation(int(index), message.format(name=ops.NAMES[code]))
+            for index, code in zip(indexes, opcodes[indexes])
+        )
+
+    known = np.isin(opcodes, ops.KNOWN_CODES)
+    violations.extend(
+        Violation(int(index), f"Opcode {opcodes[index]} not found!")
+        for index in np.flatnonzero(~known)
+    )
+
+    # session
+    start = opcodes == ops.START_SESSION
+    end = known & ~start & (opcodes != ops.REQUEST_METADATA)
+    started = ops.latest(start) > ops.latest(opcodes == ops.END_SESSION)
+    report(np.flatnonzero(start & started),
+           "Simulator session already started!")
+    report(np.flatnonzero(end & ~started),
+           "{name} received outside of a session!")
+
+    # qubit indexes
+    single = np.isin(opcodes, ops.SINGLE_GATE_CODES) | np.isin(
+        opcodes, [ops.STATE_PREPARATION, ops.QUBIT_MEASURE]
+    )
+    dual = np.isin(opcodes, ops.DUAL_GATE_CODES)
+    out_of_range = ((single | dual) & (qubits_0 >= register_size)) | \
+        (dual & (qubits_1 >= register_size))
+    report(np.flatnonzero(out_of_range),
+           f"Qubit index greater than register size ({register_size})!")
+
+    # qubit lifecycle
+    active = known & (start | started) & ~out_of_range
+    auto_release = _auto_releases(opcodes, qubits_0, active, register_size)
+    state = _lifecycle(
+        opcodes, qubits_0, qubits_1, active, auto_release
+    )
+
+    allocated = state["allocated"]
+    event_words = state["event_words"]
+    measured = state["measured"]
+    event_opcodes = opcodes[event_words]
+    event_allocated = allocated[event_words]
+    is_gate = np.isin(event_opcodes, ops.SINGLE_GATE_CODES) | \
+        np.isin(event_opcodes, ops.DUAL_GATE_CODES)
+    is_prepare = event_opcodes == ops.STATE_PREPARATION
+    is_measure = event_opcodes == ops.QUBIT_MEASURE
+
+    report(np.flatnonzero(
+        active & (opcodes == ops.STATE_PREPARATION_ALL) & allocated
+    ), "Qubit register has already been initialised!")
+    report(np.flatnonzero(
+        active & (opcodes == ops.QUBIT_MEASURE_ALL) & ~allocated
+    ), "Qubit register is not prepared!")
+    report(event_words[is_prepare & event_allocated & ~measured],
+           "Qubit already prepared!")
+    report(event_words[is_measure & measured], "Qubit already measured!")
+    report(event_words[is_gate & measured], "Qubit requires re-preparation!")
+    report(np.unique(event_words[(is_gate | is_measure) & ~measured &
+                                 ~event_allocated]),
+           "Qubit register is not prepared!")
+
+    # a dual gate reports a violation once, even if both qubits cause it
+    return sorted(set(violations))
+
+
+def check_program(
+    commands: np.ndarray,
+    register_size: int,
+    offsets: Sequence[int] = (0, 0)
+):
+    """Raises a ValueError listing every violation of a program, see
+    ``validate_program``."""
+    violations = validate_program(commands, register_size, offsets)
+    if violations:
+        raise ValueError(
+            f"Program has {len(violations)} invalid command(s):\n" +
+            "\n".join(
+                f"  Command {index}: {message}"
+                for index, message in violations
+            )
+        )
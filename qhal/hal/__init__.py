@@ -1,8 +1,12 @@
 from ._commands import (command_creator,
                         command_unpacker,
+                        measurement_creator,
                         measurement_unpacker,
                         string_to_opcode,
                         Opcode,
                         Masks,
                         Shifts)
+from ._measurement_results import MeasurementResults
+from ._profiler import Profiler
+from ._program import HALProgram, ProgramTemplate
 from ._hardware_abstraction_layer import HardwareAbstractionLayer, HALMetadata
@@ -26,8 +26,9 @@ SINGLE/DUAL | CONSTANT/PARAMETRIC   |   OPCODE
 """
 
 from enum import Enum
-from typing import List, Tuple
+from typing import List, Sequence, Tuple
 
+import numpy as np
 from numpy import uint64
 
 
@@ -87,6 +88,7 @@ _OPCODES = [
     Opcode("STATE_PREPARATION_ALL", 5, "SINGLE", "CONST"),
     Opcode("STATE_PREPARATION", 6, "SINGLE", "CONST"),
     Opcode("QUBIT_MEASURE", 7, "SINGLE", "CONST"),
+    Opcode("QUBIT_MEASURE_ALL", 9, "SINGLE", "CONST"),
     Opcode(
         "REQUEST_METADATA",
         8 | Masks.OPCODE_DUAL_MASK.value | Masks.OPCODE_PARAM_MASK.value,
@@ -145,18 +147,22 @@ _OPCODES = [
 ]
 
 
+_OPCODES_BY_NAME = {opcode.name: opcode for opcode in _OPCODES}
+_OPCODES_BY_CODE = {opcode.code: opcode for opcode in _OPCODES}
+
+
 def string_to_opcode(op: str) -> Opcode:
-    for opcode in _OPCODES:
-        if opcode.name == op:
-            return opcode
-    raise ValueError(f"{op} not found!")
+    try:
+        return _OPCODES_BY_NAME[op]
+    except KeyError:
+        raise ValueError(f"{op} not found!") from None
 
 
 def int_to_opcode(op_code: uint64) -> Opcode:
-    for opcode in _OPCODES:
-        if opcode.code == op_code:
-            return opcode
-    raise ValueError(f"{op_code} not found!")
+    try:
+        return _OPCODES_BY_CODE[int(op_code)]
+    except KeyError:
+        raise ValueError(f"{op_code} not found!") from None
 
 
 def command_creator(
@@ -294,3 +300,70 @@ def measurement_unpacker(bitcode: uint64) -> Tuple[int, int, int, int]:
         (bitcode & 3968) >> 7,
         bitcode & 1
     )
+
+
+def command_array_unpacker(
+    commands: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Vectorised version of ``command_unpacker`` over a buffer of commands.
+
+    Parameters
+    ----------
+    commands : np.ndarray
+        Array of 64-bit HAL commands.
+
+    Returns
+    -------
+    opcodes : np.ndarray
+        12-bit opcode of each command, see ``Opcode.code``.
+    args0, args1 : np.ndarray
+        Integer representation of the argument values. ``args1`` is only
+        meaningful for DUAL commands.
+    qubits0, qubits1 : np.ndarray
+        Relative qubit indexes. ``qubits1`` is only meaningful for DUAL
+        commands.
+    """
+    commands = np.asarray(commands, dtype=uint64)
+    opcodes = (commands >> uint64(Shifts.OPCODE.value)).astype(np.int64)
+    args0 = ((commands & uint64(Masks.ARG0_MASK.value))
+             >> uint64(Shifts.ARG0.value)).astype(np.int64)
+    args1 = ((commands & uint64(Masks.ARG1_MASK.value))
+             >> uint64(Shifts.ARG1.value)).astype(np.int64)
+    qubits0 = (commands & uint64(Masks.QUBIT0_MASK.value)).astype(np.int64)
+    qubits1 = ((commands & uint64(Masks.QUBIT1_MASK.value))
+               >> uint64(Shifts.IDX1.value)).astype(np.int64)
+    return opcodes, args0, args1, qubits0, qubits1
+
+
+def resolve_qubit_indexes(
+    commands: np.ndarray,
+    offsets: Sequence[int] = (0, 0)
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Resolves the absolute qubit indexes of a buffer of commands, applying
+    the base indexes set by the PAGE_SET_QUBIT_0/1 commands.
+
+    Parameters
+    ----------
+    commands : np.ndarray
+        Array of 64-bit HAL commands.
+    offsets : Sequence[int], optional
+        Base indexes of qubit 0 and 1 before the first command.
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray]
+        Absolute index of qubit 0 and of qubit 1 of each command.
+    """
+    opcodes, _, _, qubits0, qubits1 = command_array_unpacker(commands)
+    positions = np.arange(len(opcodes))
+    resolved = []
+    for page_op, qubits in (("PAGE_SET_QUBIT_0", qubits0),
+                            ("PAGE_SET_QUBIT_1", qubits1)):
+        is_page = opcodes == _OPCODES_BY_NAME[page_op].code
+        # index of the latest page command up to each position, -1 if none
+        latest = np.maximum.accumulate(np.where(is_page, positions, -1))
+        bases = np.where(
+            latest >= 0, qubits0[np.maximum(latest, 0)], offsets[len(resolved)]
+        )
+        resolved.append(bases + qubits)
+    return resolved[0], resolved[1]
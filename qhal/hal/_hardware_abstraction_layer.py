@@ -1,9 +1,16 @@
-from typing import Dict, Tuple
+from typing import Dict, List, Tuple, TYPE_CHECKING
 
 import numpy as np
+from numpy import uint64
 
 from . import command_unpacker, string_to_opcode
-from ..quantum_simulators import IQuantumSimulator
+from ._commands import command_array_unpacker
+from ._measurement_results import MeasurementResults
+from ._profiler import Profiler
+
+if TYPE_CHECKING:
+    # only for annotations: the simulators are slow to import
+    from ..quantum_simulators import IQuantumSimulator
 
 
 class HALMetadata:
@@ -50,14 +57,26 @@ class HardwareAbstractionLayer:
     hal_metadata : HALMetadata
         Object that holds a series of metadata items using a pre-defined
         structure.
+    profiler : Profiler, optional
+        Records per-opcode and per-phase timings of the commands. It is
+        shared with the quantum simulator.
+    measurement_results : MeasurementResults, optional
+        Collects the QUBIT_MEASURE results, closing a shot at every
+        END_SESSION.
     """
 
     def __init__(
         self,
-        quantum_simulator: IQuantumSimulator,
-        hal_metadata: HALMetadata
+        quantum_simulator: "IQuantumSimulator",
+        hal_metadata: HALMetadata,
+        profiler: Profiler = None,
+        measurement_results: MeasurementResults = None
     ):
         self._quantum_simulator = quantum_simulator
+        self.measurement_results = measurement_results
+        self.profiler = profiler
+        if profiler is not None:
+            quantum_simulator.profiler = profiler
 
         # set up some of the metadata in correct format
         self._hal_metadata = hal_metadata
@@ -106,9 +125,71 @@ class HardwareAbstractionLayer:
             simulate receiving the stream by sending multiple metadata request
             calls until the "final" flag is receieved.
         """
+        if self.profiler is None:
+            return self._accept_command(hal_command)
+
+        self.profiler.begin()
+        try:
+            return self._accept_command(hal_command)
+        finally:
+            self.profiler.end(hal_command)
+
+    def accept_commands(self, hal_commands: np.ndarray) -> List[np.uint64]:
+        """Interface for ``quantum_simulator.accept_commands``, passing a
+        whole buffer of commands, e.g. a ``HALProgram``, without copying it.
+
+        Buffers with metadata requests, or commands that are profiled or
+        whose measurement results are collected, are accepted one by one.
+
+        Parameters
+        ----------
+        hal_commands : np.ndarray
+            Array of HAL commands.
+
+        Returns
+        -------
+        List[uint64]
+            Results of the commands that returned one, in order.
+        """
+        hal_commands = np.asarray(hal_commands, dtype=uint64)
+        opcodes = command_array_unpacker(hal_commands)[0]
+        if self.profiler is None and self.measurement_results is None and \
+                not np.any(opcodes == string_to_opcode("REQUEST_METADATA").code):
+            return self._quantum_simulator.accept_commands(hal_commands)
+
+        results = []
+        for hal_command in hal_commands.tolist():
+            result = self.accept_command(hal_command)
+            if result is not None:
+                results.append(result)
+        return results
+
+    def accept_batch(self, hal_commands: np.ndarray) -> List[List[np.uint64]]:
+        """Accepts a batch of programs back to back, such as the bindings of
+        a ``ProgramTemplate``, each with ``accept_commands``.
+
+        Parameters
+        ----------
+        hal_commands : np.ndarray
+            ``(n_programs, n_words)`` array of HAL commands.
+
+        Returns
+        -------
+        List[List[uint64]]
+            Results of each program.
+        """
+        return [
+            self.accept_commands(program)
+            for program in np.asarray(hal_commands, dtype=uint64)
+        ]
+
+    def _accept_command(self, hal_command: np.uint64) -> np.uint64:
 
         # check if we've receieved a metadata request
         opcode, _, param, idx = command_unpacker(hal_command)
+        if self.profiler is not None:
+            self.profiler.lap("decode")
+
         if opcode == "REQUEST_METADATA":
 
             # reset the internal counter for streaming back data
@@ -314,4 +395,12 @@ class HardwareAbstractionLayer:
                 return int(data)
 
         else:
-            return self._quantum_simulator.accept_command(hal_command)
+            result = self._quantum_simulator.accept_command(hal_command)
+            if self.measurement_results is not None:
+                if opcode == "QUBIT_MEASURE":
+                    self.measurement_results.add(result)
+                elif opcode == "QUBIT_MEASURE_ALL":
+                    self.measurement_results.add_register(result)
+                elif opcode == "END_SESSION":
+                    self.measurement_results.end_shot()
+            return result
@@ -0,0 +1,204 @@
+from typing import Dict, Sequence, Union
+
+import numpy as np
+from numpy import uint64
+
+
+class MeasurementResults:
+    """Collects QUBIT_MEASURE result words across a session and across shots
+    into a bit-packed ``(n_shots, ceil(n_qubits / 8))`` array.
+
+    Words are recorded with ``add`` (QUBIT_MEASURE) or ``add_register``
+    (QUBIT_MEASURE_ALL) while a session runs and the shot is closed with
+    ``end_shot``. Batched simulators return the words of every shot at once:
+    the session then holds as many shots as there are words per qubit.
+    Qubits that were not measured in a shot read as 0.
+
+    Bitstrings and histogram indexes are little-endian: qubit ``q`` is bit
+    ``q`` of the index, and the rightmost character of a bitstring.
+
+    Dense histograms are limited to ``MAX_HISTOGRAM_QUBITS`` qubits and
+    integer outcome indexes to 63 qubits, ``counts`` works for any width.
+
+    Parameters
+    ----------
+    n_qubits : int
+        Number of qubits of the device, i.e. width of each shot.
+    """
+
+    #: largest number of qubits of a dense histogram, of 2**n counts
+    MAX_HISTOGRAM_QUBITS = 24
+
+    def __init__(self, n_qubits: int):
+        self.n_qubits = n_qubits
+        self._n_bytes = (n_qubits + 7) // 8
+        self._packed = np.zeros((16, self._n_bytes), dtype=np.uint8)
+        self._n_shots = 0
+        self._session = None  # (shots in session, n_qubits) unpacked bits
+
+    def __len__(self) -> int:
+        return self._n_shots
+
+    def add(self, words: Union[uint64, np.ndarray]):
+        """Records the result of a QUBIT_MEASURE in the current session.
+
+        Parameters
+        ----------
+        words : uint64 or np.ndarray
+            A measurement word, or an array of the words of the same
+            measurement across shots.
+        """
+        self._record(np.asarray(words, dtype=uint64).reshape(-1, 1))
+
+    def add_register(self, words: np.ndarray):
+        """Records the result of a QUBIT_MEASURE_ALL in the current session.
+
+        Parameters
+        ----------
+        words : np.ndarray
+            ``(n_measured,)`` array with one word per qubit, or
+            ``(n_shots, n_measured)`` array with one row per shot.
+        """
+        self._record(np.atleast_2d(np.asarray(words, dtype=uint64)))
+
+    def _record(self, words: np.ndarray):
+        """Records an ``(n_shots, n_words)`` array of measurement words."""
+        if self._session is None:
+            self._session = np.zeros((len(words), self.n_qubits), dtype=np.uint8)
+        elif len(words) != len(self._session):
+            raise ValueError(
+                f"Got {len(words)} shots for a session of "
+                f"{len(self._session)} shots!"
+            )
+        # QUBIT INDEX [63-52] | OFFSET [51-12] | STATUS [11-7] | VALUE [0]
+        qubits = (words >> uint64(52)) + ((words >> uint64(12)) & uint64(1023))
+        if np.any(qubits >= self.n_qubits):
+            raise ValueError(
+                f"Qubit index greater than result width ({self.n_qubits})!"
+            )
+        rows = np.arange(len(words))[:, np.newaxis]
+        self._session[rows, qubits.astype(np.intp)] = words & uint64(1)
+
+    def end_shot(self):
+        """Closes the current session, storing its shot(s)."""
+        if self._session is None:
+            return
+        packed = np.packbits(self._session, axis=1, bitorder="little")
+        n_new = len(packed)
+        if self._n_shots + n_new > len(self._packed):
+            capacity = max(2 * len(self._packed), self._n_shots + n_new)
+            grown = np.zeros((capacity, self._n_bytes), dtype=np.uint8)
+            grown[:self._n_shots] = self._packed[:self._n_shots]
+            self._packed = grown
+        self._packed[self._n_shots:self._n_shots + n_new] = packed
+        self._n_shots += n_new
+        self._session = None
+
+    def clear(self):
+        """Discards every stored shot."""
+        self._n_shots = 0
+        self._session = None
+
+    @property
+    def packed(self) -> np.ndarray:
+        """``(n_shots, ceil(n_qubits / 8))`` bit-packed shots."""
+        return self._packed[:self._n_shots]
+
+    @property
+    def bitstrings(self) -> np.ndarray:
+        """``(n_shots, n_qubits)`` array of the measured bits."""
+        return np.unpackbits(
+            self.packed, axis=1, count=self.n_qubits, bitorder="little"
+        )
+
+    def _outcome_indexes(self, qubits: Sequence[int]) -> np.ndarray:
+        if len(qubits) > 63:
+            raise ValueError(
+                f"Outcome indexes are limited to 63 qubits, {len(qubits)} "
+                f"requested!"
+            )
+        bits = self.bitstrings[:, list(qubits)].astype(np.int64)
+        return bits @ (1 << np.arange(len(qubits), dtype=np.int64))
+
+    def histogram(self, qubits: Sequence[int] = None) -> np.ndarray:
+        """Returns the number of shots of each outcome.
+
+        Parameters
+        ----------
+        qubits : Sequence[int], optional
+            Qubits to histogram, by default all of them. ``qubits[i]`` is bit
+            ``i`` of the outcome index.
+
+        Returns
+        -------
+        np.ndarray
+            ``(2**len(qubits),)`` array of counts.
+        """
+        if qubits is None:
+            qubits = range(self.n_qubits)
+        if len(qubits) > self.MAX_HISTOGRAM_QUBITS:
+            raise ValueError(
+                f"Dense histograms are limited to {self.MAX_HISTOGRAM_QUBITS}"
+                f" qubits, {len(qubits)} requested: use counts instead!"
+            )
+        return np.bincount(
+            self._outcome_indexes(qubits), minlength=2 ** len(qubits)
+        )
+
+    def counts(self, qubits: Sequence[int] = None) -> Dict[str, int]:
+        """Returns the number of shots of each observed bitstring."""
+        if qubits is None:
+            qubits = range(self.n_qubits)
+        if len(qubits) <= 63:
+            outcomes, counts = np.unique(
+                self._outcome_indexes(qubits), return_counts=True
+            )
+            return {
+                np.binary_repr(outcome, width=len(qubits)): int(count)
+                for outcome, count in zip(outcomes, counts)
+            }
+        # wide outcomes are compared as rows of packed bytes
+        packed = np.packbits(self.bitstrings[:, list(qubits)], axis=1,
+                             bitorder="little")
+        outcomes, counts = np.unique(
+            np.ascontiguousarray(packed).view(f"V{packed.shape[1]}").ravel(),
+            return_counts=True
+        )
+        bits = np.unpackbits(
+            np.frombuffer(outcomes.tobytes(), dtype=np.uint8).reshape(
+                len(outcomes), -1
+            ), axis=1, count=len(qubits), bitorder="little"
+        )
+        return {
+            "".join(map(str, row[::-1])): int(count)
+            for row, count in zip(bits.tolist(), counts)
+        }
+
+    def marginal(self, qubits: Sequence[int]) -> np.ndarray:
+        """Returns the empirical distribution of the outcomes of ``qubits``.
+        """
+        return self.histogram(qubits) / max(self._n_shots, 1)
+
+    def expectation_z(
+        self,
+        z_strings: Union[Sequence[int], np.ndarray]
+    ) -> Union[float, np.ndarray]:
+        """Returns the empirical expectation value of Z-strings.
+
+        Parameters
+        ----------
+        z_strings : Sequence[int] or np.ndarray
+            Qubits of a single Z-string, or an ``(n_strings, n_qubits)``
+            boolean array with one Z-string mask per row.
+
+        Returns
+        -------
+        float or np.ndarray
+            Expectation value, or ``(n_strings,)`` expectation values.
+        """
+        bits = self.bitstrings.astype(np.int64)
+        if np.ndim(z_strings) == 2:
+            parities = (bits @ np.asarray(z_strings, dtype=np.int64).T) & 1
+            return 1 - 2 * np.mean(parities, axis=0)
+        parities = np.sum(bits[:, list(z_strings)], axis=1) & 1
+        return float(1 - 2 * np.mean(parities))
@@ -0,0 +1,68 @@
+"""Opcode codes and families shared by the simulators and the passes over
+command buffers."""
+
+import numpy as np
+
+from ._commands import _OPCODES, _OPCODES_BY_NAME
+
+
+def code(name: str) -> int:
+    """Returns the 12-bit code of the opcode called ``name``."""
+    return _OPCODES_BY_NAME[name].code
+
+
+START_SESSION = code("START_SESSION")
+END_SESSION = code("END_SESSION")
+PAGE_SET_QUBIT_0 = code("PAGE_SET_QUBIT_0")
+PAGE_SET_QUBIT_1 = code("PAGE_SET_QUBIT_1")
+STATE_PREPARATION_ALL = code("STATE_PREPARATION_ALL")
+STATE_PREPARATION = code("STATE_PREPARATION")
+QUBIT_MEASURE = code("QUBIT_MEASURE")
+QUBIT_MEASURE_ALL = code("QUBIT_MEASURE_ALL")
+REQUEST_METADATA = code("REQUEST_METADATA")
+FOR_START = code("FOR_START")
+FOR_END = code("FOR_END")
+IF = code("IF")
+WHILE = code("WHILE")
+
+#: opcodes that do not act on the qubits
+NO_OPERATION_CODES = np.array([code("NOP"), code("ID")])
+#: loop and branch opcodes
+CONTROL_FLOW_CODES = np.array([FOR_START, FOR_END, IF, WHILE])
+
+_NON_GATES = {
+    START_SESSION, END_SESSION, PAGE_SET_QUBIT_0, PAGE_SET_QUBIT_1,
+    STATE_PREPARATION_ALL, STATE_PREPARATION, QUBIT_MEASURE,
+    QUBIT_MEASURE_ALL, REQUEST_METADATA,
+    *NO_OPERATION_CODES.tolist(), *CONTROL_FLOW_CODES.tolist()
+}
+#: single qubit gate opcodes
+SINGLE_GATE_CODES = np.array([
+    opcode.code for opcode in _OPCODES
+    if opcode.cmd_type == "SINGLE" and opcode.code not in _NON_GATES
+])
+#: two qubit gate opcodes
+DUAL_GATE_CODES = np.array([
+    opcode.code for opcode in _OPCODES
+    if opcode.cmd_type == "DUAL" and opcode.code not in _NON_GATES
+])
+#: parametrised gate opcodes, whose argument is an angle
+PARAMETRISED_GATE_CODES = np.array([
+    opcode.code for opcode in _OPCODES
+    if opcode.param == "PARAM" and opcode.code not in _NON_GATES
+])
+#: every known opcode
+KNOWN_CODES = np.array([opcode.code for opcode in _OPCODES])
+
+#: opcode name indexed by code, empty for unknown codes
+NAMES = np.full(1 << 12, "", dtype=object)
+NAMES[KNOWN_CODES] = [opcode.name for opcode in _OPCODES]
+
+
+def latest(mask: np.ndarray, inclusive: bool = False) -> np.ndarray:
+    """Returns, for every position, the index of the latest ``True`` of
+    ``mask`` before it (or at it if ``inclusive``), -1 if there is none."""
+    positions = np.where(mask, np.arange(len(mask)), -1)
+    if not inclusive and len(positions):
+        positions = np.concatenate(([-1], positions[:-1]))
+    return np.maximum.accumulate(positions)
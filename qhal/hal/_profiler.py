@@ -0,0 +1,161 @@
+import json
+from collections import defaultdict
+from time import perf_counter_ns
+from typing import Dict, List
+
+import numpy as np
+from numpy import uint64
+
+from ._commands import Shifts, _OPCODES
+
+
+_OPCODE_NAMES = {opcode.code: opcode.name for opcode in _OPCODES}
+
+
+class Profiler:
+    """Opt-in instrumentation of the HAL command hot path.
+
+    A profiler records, for every command, its opcode and end-to-end latency,
+    and splits the time spent into phases (decode, dispatch, gate
+    construction, engine flush, measurement, ...). Phases are timed as laps:
+    ``lap(phase)`` attributes the time elapsed since the previous lap (or
+    since the command began) to ``phase``.
+
+    The same profiler can be shared by the HAL and its quantum simulator:
+    nested ``begin``/``end`` calls are folded into the outermost command.
+    Components only pay for an ``is None`` check when no profiler is set.
+
+    Parameters
+    ----------
+    record_trace : bool
+        Whether to keep every phase as a timed event for the Chrome trace
+        export. Off by default as memory grows with the number of commands.
+    """
+
+    QUANTILES = (0.5, 0.9, 0.99)
+
+    def __init__(self, record_trace: bool = False):
+        self.record_trace = record_trace
+        self.reset()
+
+    def reset(self):
+        """Discards all the recorded data."""
+        self._latencies: Dict[str, List[int]] = defaultdict(list)
+        self._phase_ns: Dict[str, int] = defaultdict(int)
+        self._phase_counts: Dict[str, int] = defaultdict(int)
+        self._events = []
+        self._depth = 0
+        self._command_start = 0
+        self._last_lap = 0
+
+    def begin(self):
+        """Marks the start of a command."""
+        self._depth += 1
+        if self._depth == 1:
+            self._command_start = self._last_lap = perf_counter_ns()
+
+    def lap(self, phase: str):
+        """Attributes the time since the previous lap to ``phase``."""
+        now = perf_counter_ns()
+        self._phase_ns[phase] += now - self._last_lap
+        self._phase_counts[phase] += 1
+        if self.record_trace:
+            self._events.append((phase, "phase", self._last_lap, now))
+        self._last_lap = now
+
+    def end(self, command: uint64):
+        """Marks the end of a command, attributing the time since the last lap
+        to the dispatch phase.
+
+        Parameters
+        ----------
+        command : uint64
+            The HAL command that was processed.
+        """
+        self._depth -= 1
+        if self._depth > 0:
+            return
+        self.lap("dispatch")
+        opcode = _OPCODE_NAMES.get(
+            int(command) >> Shifts.OPCODE.value, "UNKNOWN"
+        )
+        self._latencies[opcode].append(self._last_lap - self._command_start)
+        if self.record_trace:
+            self._events.append(
+                (opcode, "command", self._command_start, self._last_lap)
+            )
+
+    def to_dict(self) -> dict:
+        """Exports per-opcode counts and latency statistics, and per-phase
+        cumulative timings, in seconds."""
+        commands = {}
+        for opcode, latencies in self._latencies.items():
+            latencies = np.array(latencies) * 1e-9
+            commands[opcode] = {
+                "count": len(latencies),
+                "total_s": float(np.sum(latencies)),
+                "mean_s": float(np.mean(latencies)),
+                **{
+                    f"p{int(100 * q)}_s": float(np.quantile(latencies, q))
+                    for q in self.QUANTILES
+                }
+            }
+        phases = {
+            phase: {
+                "count": self._phase_counts[phase],
+                "total_s": total * 1e-9
+            }
+            for phase, total in self._phase_ns.items()
+        }
+        return {"commands": commands, "phases": phases}
+
+    def to_prometheus(self) -> str:
+        """Exports the recorded data in the Prometheus text exposition
+        format."""
+        data = self.to_dict()
+        lines = [
+            "# HELP qhal_command_latency_seconds HAL command latency.",
+            "# TYPE qhal_command_latency_seconds summary",
+        ]
+        for opcode, stats in data["commands"].items():
+            for q in self.QUANTILES:
+                lines.append(
+                    f'qhal_command_latency_seconds{{opcode="{opcode}",'
+                    f'quantile="{q}"}} {stats[f"p{int(100 * q)}_s"]}'
+                )
+            lines.append(
+                f'qhal_command_latency_seconds_sum{{opcode="{opcode}"}} '
+                f'{stats["total_s"]}'
+            )
+            lines.append(
+                f'qhal_command_latency_seconds_count{{opcode="{opcode}"}} '
+                f'{stats["count"]}'
+            )
+        lines += [
+            "# HELP qhal_phase_seconds_total Time spent in each phase.",
+            "# TYPE qhal_phase_seconds_total counter",
+        ]
+        for phase, stats in data["phases"].items():
+            lines.append(
+                f'qhal_phase_seconds_total{{phase="{phase}"}} {stats["total_s"]}'
+            )
+        return "\n".join(lines) + "\n"
+
+    def to_chrome_trace(self) -> str:
+        """Exports the recorded events as Chrome trace JSON, viewable in
+        ``chrome://tracing`` or Perfetto. Requires ``record_trace``."""
+        if not self.record_trace:
+            raise ValueError("Profiler was created without record_trace!")
+        events = [
+            {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": start / 1000,
+                "dur": (end - start) / 1000,
+                "pid": 0,
+                "tid": 0
+            }
+            for name, category, start, end in self._events
+        ]
+        return json.dumps({"traceEvents": events})
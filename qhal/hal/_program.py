@@ -0,0 +1,450 @@
+from typing import Iterator, Sequence, Union
+
+import numpy as np
+from numpy import uint64
+
+from . import _opcodes as ops
+from ._commands import (_OPCODES, _OPCODES_BY_NAME, Masks, Shifts,
+                        command_array_unpacker)
+from ._utils import N_ANGLES, angle_binary_representation
+
+#: opcode bits of each command, by opcode name
+_TEMPLATES = {
+    opcode.name: opcode.code << Shifts.OPCODE.value for opcode in _OPCODES
+}
+_SINGLE_TEMPLATES = {
+    opcode.name: _TEMPLATES[opcode.name] for opcode in _OPCODES
+    if opcode.cmd_type == "SINGLE"
+}
+_DUAL_TEMPLATES = {
+    opcode.name: _TEMPLATES[opcode.name] for opcode in _OPCODES
+    if opcode.cmd_type == "DUAL"
+}
+# enum lookups are slow on the append path
+_ARG0 = Shifts.ARG0.value
+_ARG1 = Shifts.ARG1.value
+_IDX1 = Shifts.IDX1.value
+_MAX_ARG = Masks.ARG0_MASK.value >> _ARG0
+_MAX_QUBIT = Masks.QUBIT0_MASK.value
+#: 16-bit representation of pi / 2, the shift of the parameter-shift rule
+PARAMETER_SHIFT = N_ANGLES // 4
+
+
+def _template_error(op: str, cmd_type: str) -> ValueError:
+    """Returns the error of ``op`` missing from the ``cmd_type`` opcodes."""
+    if op not in _OPCODES_BY_NAME:
+        return ValueError(f"{op} not found!")
+    return ValueError(f"{op} is not a {cmd_type} command!")
+
+
+def _check_fields(args: np.ndarray, qubits: np.ndarray):
+    if np.any(args < 0) or np.any(args > _MAX_ARG):
+        raise ValueError(f"Argument greater than {_MAX_ARG}!")
+    if np.any(qubits < 0) or np.any(qubits > _MAX_QUBIT):
+        raise ValueError(f"Qubit index greater than {_MAX_QUBIT}!")
+
+
+class HALProgram:
+    """Growable buffer of 64-bit HAL commands.
+
+    Commands are packed straight into a preallocated uint64 array, whose
+    capacity doubles when it is full, so appending is amortised constant
+    time and the program never holds Python ints. A program is accepted
+    wherever an array of commands is, through ``np.asarray(program)``
+    which returns its buffer without a copy, e.g. by
+    ``IQuantumSimulator.accept_commands``.
+
+    Slicing returns a program viewing the same buffer: writes to either are
+    shared, but appending to a slice first copies it.
+
+    Parameters
+    ----------
+    commands : array_like, optional
+        Initial commands, copied.
+    capacity : int, optional
+        Number of commands preallocated, 64 by default.
+    """
+
+    __slots__ = ("_buffer", "_items", "_size")
+
+    def __init__(self, commands=None, capacity: int = 64):
+        commands = np.empty(0, dtype=uint64) if commands is None else \
+            np.asarray(commands, dtype=uint64).ravel()
+        self._set_buffer(np.empty(max(capacity, len(commands)), dtype=uint64))
+        self._buffer[:len(commands)] = commands
+        self._size = len(commands)
+
+    def _set_buffer(self, buffer: np.ndarray):
+        self._buffer = buffer
+        # item assignment is much faster through a memoryview
+        self._items = memoryview(buffer).cast("B").cast("Q") \
+            if buffer.flags.c_contiguous else None
+
+    @classmethod
+    def _view(cls, buffer: np.ndarray) -> "HALProgram":
+        program = cls.__new__(cls)
+        program._set_buffer(buffer)
+        program._size = len(buffer)
+        return program
+
+    @property
+    def commands(self) -> np.ndarray:
+        """The commands, as a view of the buffer."""
+        return self._buffer[:self._size]
+
+    @property
+    def capacity(self) -> int:
+        """Number of commands the buffer holds before it grows."""
+        return len(self._buffer)
+
+    def __array__(self, dtype=None, copy=None):
+        if dtype is None or np.dtype(dtype) == self._buffer.dtype:
+            return self.commands.copy() if copy else self.commands
+        return self.commands.astype(dtype)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.commands.tolist())
+
+    def __getitem__(self, index) -> Union[int, "HALProgram"]:
+        if isinstance(index, slice):
+            return self._view(self.commands[index])
+        return int(self.commands[index])
+
+    def __setitem__(self, index, commands):
+        self.commands[index] = commands
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, HALProgram):
+            return NotImplemented
+        return np.array_equal(self.commands, other.commands)
+
+    def __repr__(self) -> str:
+        return f"HALProgram({len(self)} commands)"
+
+    def __add__(self, other) -> "HALProgram":
+        other = np.asarray(other, dtype=uint64).ravel()
+        program = HALProgram(capacity=len(self) + len(other))
+        return program.extend(self.commands).extend(other)
+
+    def __iadd__(self, other) -> "HALProgram":
+        return self.extend(other)
+
+    def __mul__(self, repeats: int) -> "HALProgram":
+        return self.repeat(repeats)
+
+    __rmul__ = __mul__
+
+    def copy(self) -> "HALProgram":
+        return HALProgram(self.commands)
+
+    def reserve(self, capacity: int) -> "HALProgram":
+        """Grows the buffer so that it holds at least ``capacity``
+        commands."""
+        if capacity > len(self._buffer):
+            buffer = np.empty(max(capacity, 2 * len(self._buffer), 16),
+                              dtype=uint64)
+            buffer[:self._size] = self.commands
+            self._set_buffer(buffer)
+        return self
+
+    def append(self, command: int) -> "HALProgram":
+        """Appends a 64-bit command."""
+        if self._size == len(self._buffer):
+            self.reserve(self._size + 1)
+        if self._items is None:
+            self._buffer[self._size] = command
+        else:
+            self._items[self._size] = command
+        self._size += 1
+        return self
+
+    def extend(self, commands) -> "HALProgram":
+        """Appends an array of 64-bit commands."""
+        commands = np.asarray(commands, dtype=uint64).ravel()
+        self.reserve(self._size + len(commands))
+        self._buffer[self._size:self._size + len(commands)] = commands
+        self._size += len(commands)
+        return self
+
+    def repeat(self, repeats: int) -> "HALProgram":
+        """Returns the program repeated ``repeats`` times."""
+        return HALProgram(np.tile(self.commands, repeats))
+
+    def start_session(self) -> "HALProgram":
+        return self.append(_TEMPLATES["START_SESSION"])
+
+    def end_session(self) -> "HALProgram":
+        return self.append(_TEMPLATES["END_SESSION"])
+
+    def prepare_all(self) -> "HALProgram":
+        return self.append(_TEMPLATES["STATE_PREPARATION_ALL"])
+
+    def prepare(self, qubit: int) -> "HALProgram":
+        return self.append(_TEMPLATES["STATE_PREPARATION"] | qubit)
+
+    def measure(self, qubit: int) -> "HALProgram":
+        return self.append(_TEMPLATES["QUBIT_MEASURE"] | qubit)
+
+    def measure_all(self) -> "HALProgram":
+        return self.append(_TEMPLATES["QUBIT_MEASURE_ALL"])
+
+    def page(self, register: int, offset: int) -> "HALProgram":
+        """Appends a PAGE_SET_QUBIT_0/1 command."""
+        return self.append(_TEMPLATES[f"PAGE_SET_QUBIT_{register}"] | offset)
+
+    def request_metadata(self, index: int, arg1: int = 0) -> "HALProgram":
+        return self.append(
+            _TEMPLATES["REQUEST_METADATA"] |
+            (index << _ARG0) | (arg1 << _ARG1)
+        )
+
+    def gate(self, op: str, qubit: int, arg: int = 0) -> "HALProgram":
+        """Appends a single qubit command.
+
+        Parameters
+        ----------
+        op : str
+            Name of opcode.
+        qubit : int
+            Relative qubit index.
+        arg : int, optional
+            Integer representation of the argument (angle) value.
+        """
+        try:
+            template = _SINGLE_TEMPLATES[op]
+        except KeyError:
+            raise _template_error(op, "SINGLE") from None
+        if not 0 <= arg <= _MAX_ARG or not 0 <= qubit <= _MAX_QUBIT:
+            _check_fields(np.array([arg]), np.array([qubit]))
+        return self.append(template | (arg << _ARG0) | qubit)
+
+    def dual_gate(
+        self,
+        op: str,
+        qubit_0: int,
+        qubit_1: int,
+        arg: int = 0
+    ) -> "HALProgram":
+        """Appends a two qubit command.
+
+        Parameters
+        ----------
+        op : str
+            Name of opcode.
+        qubit_0, qubit_1 : int
+            Relative qubit indexes.
+        arg : int, optional
+            Integer representation of the argument (angle) value, packed as
+            argument 1.
+        """
+        try:
+            template = _DUAL_TEMPLATES[op]
+        except KeyError:
+            raise _template_error(op, "DUAL") from None
+        if not (0 <= arg <= _MAX_ARG and 0 <= qubit_0 <= _MAX_QUBIT and
+                0 <= qubit_1 <= _MAX_QUBIT):
+            _check_fields(np.array([arg]), np.array([qubit_0, qubit_1]))
+        return self.append(
+            template | (arg << _ARG1) | (qubit_1 << _IDX1) | qubit_0
+        )
+
+    def append_columns(
+        self,
+        ops,
+        qubits_0=0,
+        args_0=0,
+        qubits_1=0,
+        args_1=0
+    ) -> "HALProgram":
+        """Packs and appends commands given as columns, broadcast against
+        each other.
+
+        Parameters
+        ----------
+        ops : str or array_like
+            Name(s) or 12-bit code(s) of the opcodes.
+        qubits_0, args_0, qubits_1, args_1 : int or array_like, optional
+            Relative qubit indexes and integer representation of the
+            arguments. Qubit 1 and argument 1 are only packed for DUAL
+            commands.
+        """
+        ops = np.asarray(ops)
+        if ops.dtype.kind in "US":
+            names, inverse = np.unique(ops, return_inverse=True)
+            unknown = set(names.tolist()) - set(_TEMPLATES)
+            if unknown:
+                raise ValueError(f"{min(unknown)} not found!")
+            templates = np.array(
+                [_TEMPLATES[name] for name in names.tolist()], dtype=uint64
+            )
+            opcodes = templates[inverse.reshape(ops.shape)]
+        else:
+            opcodes = ops.astype(uint64) << uint64(Shifts.OPCODE.value)
+        opcodes, qubits_0, args_0, qubits_1, args_1 = np.broadcast_arrays(
+            opcodes, *(np.asarray(column, dtype=np.int64) for column in
+                       (qubits_0, args_0, qubits_1, args_1))
+        )
+        _check_fields(np.concatenate((args_0.ravel(), args_1.ravel())),
+                      np.concatenate((qubits_0.ravel(), qubits_1.ravel())))
+        dual = (opcodes >> uint64(Shifts.OPCODE.value)) & \
+            uint64(Masks.OPCODE_DUAL_MASK.value)
+        commands = opcodes | \
+            (args_0.astype(uint64) << uint64(Shifts.ARG0.value)) | \
+            qubits_0.astype(uint64)
+        commands |= np.where(
+            dual != 0,
+            (args_1.astype(uint64) << uint64(Shifts.ARG1.value)) |
+            (qubits_1.astype(uint64) << uint64(Shifts.IDX1.value)),
+            uint64(0)
+        )
+        return self.extend(commands)
+
+
+class ProgramTemplate:
+    """Program whose parameters are rebound by patching the argument fields
+    of the words holding them, without encoding the commands again.
+
+    The angle of a SINGLE command is its argument 0 and the angle of a DUAL
+    command its argument 1, as the simulators read them.
+
+    Parameters
+    ----------
+    program : array_like
+        The commands, e.g. a ``HALProgram``, copied.
+    words : Sequence[int], optional
+        Indexes of the words holding parameters, every parametrised gate
+        by default.
+    parameters : Sequence[int], optional
+        Index of the parameter bound to each of ``words``, so that words can
+        share a parameter. By default each word has its own parameter.
+    """
+
+    __slots__ = ("program", "words", "parameters", "n_parameters",
+                 "_shifts", "_cleared")
+
+    def __init__(
+        self,
+        program,
+        words: Sequence[int] = None,
+        parameters: Sequence[int] = None
+    ):
+        self.program = HALProgram(program)
+        opcodes = command_array_unpacker(self.program.commands)[0]
+        self.words = np.flatnonzero(
+            np.isin(opcodes, ops.PARAMETRISED_GATE_CODES)
+        ) if words is None else np.asarray(words, dtype=np.int64)
+        self.parameters = np.arange(len(self.words)) if parameters is None \
+            else np.asarray(parameters, dtype=np.int64)
+        if self.parameters.shape != self.words.shape:
+            raise ValueError("One parameter index is required per word!")
+        self.n_parameters = int(self.parameters.max(initial=-1)) + 1
+
+        dual = (opcodes[self.words] & Masks.OPCODE_DUAL_MASK.value) != 0
+        self._shifts = np.where(dual, _ARG1, _ARG0).astype(uint64)
+        # words with their parameter fields cleared
+        self._cleared = self.program.commands[self.words] & ~np.where(
+            dual, Masks.ARG1_MASK.value, Masks.ARG0_MASK.value
+        ).astype(uint64)
+
+    def __len__(self) -> int:
+        return len(self.program)
+
+    def _arguments(self, values, binary: bool) -> np.ndarray:
+        """Returns the 16-bit argument of every word for ``values``."""
+        values = np.asarray(values)
+        if values.shape[-1:] != (self.n_parameters,):
+            raise ValueError(
+                f"Expected {self.n_parameters} parameters, got "
+                f"{values.shape[-1:]}!"
+            )
+        if binary:
+            values = values.astype(np.int64)
+            if np.any(values < 0) or np.any(values > _MAX_ARG):
+                raise ValueError(f"Argument greater than {_MAX_ARG}!")
+        else:
+            values = angle_binary_representation(values)
+        return values[..., self.parameters]
+
+    def _fields(self, arguments: np.ndarray) -> np.ndarray:
+        """Returns the words holding the given arguments."""
+        return self._cleared | (arguments.astype(uint64) << self._shifts)
+
+    def bind(self, values, binary: bool = False) -> Union[
+        HALProgram, np.ndarray
+    ]:
+        """Binds the parameters.
+
+        Parameters
+        ----------
+        values : array_like
+            ``(n_parameters,)`` values, or ``(n_bindings, n_parameters)``
+            values of several bindings.
+        binary : bool, optional
+            Whether the values are 16-bit representations rather than angles
+            in radians, False by default.
+
+        Returns
+        -------
+        HALProgram or np.ndarray
+            For a single binding, ``program`` with its words patched in
+            place. For several bindings, a new ``(n_bindings, n_words)``
+            array with one bound program per row, e.g. for
+            ``HardwareAbstractionLayer.accept_batch``.
+        """
+        fields = self._fields(self._arguments(values, binary))
+        if fields.ndim == 1:
+            self.program.commands[self.words] = fields
+            return self.program
+        batch = np.repeat(
+            self.program.commands[np.newaxis], len(fields), axis=0
+        )
+        batch[:, self.words] = fields
+        return batch
+
+    def shifted_bindings(
+        self,
+        values,
+        binary: bool = False,
+        shift: int = PARAMETER_SHIFT
+    ) -> np.ndarray:
+        """Returns the programs of the parameter-shift rule, with the
+        argument of one word shifted forwards or backwards at a time.
+
+        Rows ``2 * w`` and ``2 * w + 1`` shift word ``w`` by ``+shift`` and
+        ``-shift``, modulo ``2**16``, in its 16-bit argument field. For the
+        gates ``exp(-i angle / 2 P)``, e.g. RX or RZZ, the derivative of an
+        expectation value ``f`` with respect to a parameter is the sum of
+        ``(f[2 * w] - f[2 * w + 1]) / 2`` over the words bound to it.
+
+        Parameters
+        ----------
+        values : array_like
+            ``(n_parameters,)`` values the shifts are applied to.
+        binary : bool, optional
+            Whether the values are 16-bit representations rather than angles
+            in radians, False by default.
+        shift : int, optional
+            16-bit representation of the shift, ``PARAMETER_SHIFT`` (pi / 2)
+            by default.
+
+        Returns
+        -------
+        np.ndarray
+            ``(2 * n_words, n_commands)`` array with one bound program per
+            row, e.g. for ``HardwareAbstractionLayer.accept_batch``.
+        """
+        arguments = self._arguments(values, binary)
+        if arguments.ndim != 1:
+            raise ValueError("Shifts are applied to a single binding!")
+        words = np.arange(len(self.words))
+        shifted = np.repeat(arguments[np.newaxis], 2 * len(words), axis=0)
+        shifted[2 * words, words] += shift
+        shifted[2 * words + 1, words] -= shift
+        batch = np.repeat(
+            self.program.commands[np.newaxis], len(shifted), axis=0
+        )
+        batch[:, self.words] = self._fields(shifted % N_ANGLES)
+        return batch
@@ -1,17 +1,83 @@
+from functools import lru_cache
+from typing import NamedTuple, Union
+
 import numpy as np
 
+#: number of 16-bit angle values
+N_ANGLES = 2 ** 16
+#: angle (in radians) of one 16-bit unit
+ANGLE_UNIT = 2 * np.pi / N_ANGLES
+
 
-def angle_binary_representation(angle: float) -> int:
+def angle_binary_representation(
+    angle: Union[float, np.ndarray]
+) -> Union[int, np.ndarray]:
     """Converts an angle in radians to a 16-bit representation.
 
     Parameters
     ----------
-    angle : float
-        The angle (in radians) to be converted.
+    angle : float or np.ndarray
+        The angle(s) (in radians) to be converted.
 
     Returns
     -------
-    int
-        16-bit representation of angle.
+    int or np.ndarray
+        16-bit representation of angle, an int64 array for an array of
+        angles.
     """
-    return int(np.rint((angle % (2*np.pi)) / (2 * np.pi / 2**16)))
+    binary = np.rint(np.mod(angle, 2 * np.pi) / ANGLE_UNIT).astype(np.int64) \
+        % N_ANGLES
+    return int(binary) if np.ndim(binary) == 0 else binary
+
+
+def angle_from_binary_representation(
+    binary: Union[int, np.ndarray]
+) -> Union[float, np.ndarray]:
+    """Converts 16-bit representations of angles back to radians, with a
+    lookup in ``angle_table``.
+
+    Parameters
+    ----------
+    binary : int or np.ndarray
+        16-bit representation(s) of the angle(s).
+
+    Returns
+    -------
+    float or np.ndarray
+        The angle(s) in radians, in [0, 2 pi).
+    """
+    if isinstance(binary, int):
+        # same value as the table entry, without the array indexing
+        return binary * ANGLE_UNIT
+    angles = angle_table().angles[binary]
+    return float(angles) if np.ndim(angles) == 0 else angles
+
+
+class AngleTable(NamedTuple):
+    """Read-only ``(2**16,)`` tables of the angle of every 16-bit value
+    and of its trigonometric functions."""
+    #: angle in radians
+    angles: np.ndarray
+    cos: np.ndarray
+    sin: np.ndarray
+    #: cosine and sine of half the angle, for rotation gates
+    half_cos: np.ndarray
+    half_sin: np.ndarray
+
+
+@lru_cache(maxsize=None)
+def angle_table() -> AngleTable:
+    """Returns the table of the 16-bit angles, computed once and shared by
+    every backend, so that a parametrised gate costs lookups rather than
+    trigonometric functions."""
+    angles = np.arange(N_ANGLES) * ANGLE_UNIT
+    table = AngleTable(
+        angles=angles,
+        cos=np.cos(angles),
+        sin=np.sin(angles),
+        half_cos=np.cos(angles / 2),
+        half_sin=np.sin(angles / 2)
+    )
+    for column in table:
+        column.setflags(write=False)
+    return table
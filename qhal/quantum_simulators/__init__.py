@@ -1,3 +1,17 @@
-from ._interface_quantum_simulator import IQuantumSimulator
-from ._projectq_quantum_simulator import ProjectqQuantumSimulator
+from ._interface_quantum_simulator import IQuantumSimulator, ZERO_COPY_BACKENDS
+from ._control_flow import resolve_control_flow, run_program
+from ._gradient import Gradient, parameter_shift_gradient
+from ._observables import Observable
+from ._sampling import ShotSampler
+from ._sweep import sweep_program
 
+from ._trajectory_quantum_simulator import TrajectoryQuantumSimulator
+from ._density_matrix_quantum_simulator import DensityMatrixQuantumSimulator
+
+
+def __getattr__(name: str):
+    # ProjectQ is slow to import, so its simulator is loaded on first use
+    if name == "ProjectqQuantumSimulator":
+        from ._projectq_quantum_simulator import ProjectqQuantumSimulator
+        return ProjectqQuantumSimulator
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,193 @@
+from typing import List
+
+import numpy as np
+from numpy import uint64
+
+from ..hal._commands import command_array_unpacker
+from ..hal._opcodes import (CONTROL_FLOW_CODES, FOR_END, FOR_START, IF,
+                            QUBIT_MEASURE, QUBIT_MEASURE_ALL, WHILE)
+
+
+def resolve_control_flow(commands: np.ndarray) -> np.ndarray:
+    """Matches the blocks of a program in a single pass over its control
+    flow commands.
+
+    FOR_START, WHILE and IF open a block that is closed by the following
+    FOR_END at the same depth. Blocks can be nested.
+
+    Parameters
+    ----------
+    commands : np.ndarray
+        Array of 64-bit HAL commands.
+
+    Returns
+    -------
+    np.ndarray
+        Jump table: for every FOR_START, WHILE and IF the index of the
+        FOR_END closing its block, for every FOR_END the index of the
+        command opening it, -1 for the other commands.
+
+    Raises
+    ------
+    ValueError
+        If a block is not closed, a FOR_END closes no block or a WHILE
+        block measures no qubit, so that its condition never changes.
+    """
+    opcodes = command_array_unpacker(commands)[0]
+    jumps = np.full(len(opcodes), -1, dtype=np.int64)
+    measures = np.cumsum(np.isin(opcodes, [QUBIT_MEASURE, QUBIT_MEASURE_ALL]))
+
+    stack = []
+    control = np.flatnonzero(np.isin(opcodes, CONTROL_FLOW_CODES))
+    for index, code in zip(control.tolist(), opcodes[control].tolist()):
+        if code != FOR_END:
+            stack.append(index)
+            continue
+        if not stack:
+            raise ValueError(f"Command {index}: FOR_END closes no block!")
+        start = stack.pop()
+        if opcodes[start] == WHILE and measures[index] == measures[start]:
+            raise ValueError(
+                f"Command {start}: WHILE block measures no qubit!"
+            )
+        jumps[start], jumps[index] = index, start
+    if stack:
+        raise ValueError(f"Command {stack[-1]}: block is not closed!")
+    return jumps
+
+
+def _outcome(result, measure_all: bool) -> int:
+    """Returns the value of the last qubit measured by a result, which must
+    agree between the trajectories of a batched simulator."""
+    words = np.asarray(result, dtype=uint64)
+    if measure_all:
+        words = words[..., -1]
+    values = np.unique(words & uint64(1))
+    if len(values) > 1:
+        raise ValueError("Measurement outcomes differ between trajectories!")
+    return int(values[0])
+
+
+class _Interpreter:
+    """Runs the blocks of a program resolved by ``resolve_control_flow``."""
+
+    def __init__(self, simulator, commands: np.ndarray, jumps: np.ndarray):
+        self.simulator = simulator
+        self.commands = commands
+        self.jumps = jumps
+        opcodes, self.args, *_ = command_array_unpacker(commands)
+        self.opcodes = opcodes.tolist()
+
+        is_control = np.isin(opcodes, CONTROL_FLOW_CODES)
+        positions = np.arange(len(opcodes))
+        # first control flow command at or after each position
+        self.next_control = np.minimum.accumulate(
+            np.where(is_control, positions, len(opcodes))[::-1]
+        )[::-1].tolist() + [len(opcodes)]
+        # latest measurement at or before each position
+        self.latest_measure = np.maximum.accumulate(np.where(
+            np.isin(opcodes, [QUBIT_MEASURE, QUBIT_MEASURE_ALL]),
+            positions, -1
+        )).tolist()
+
+        self.results = []
+        self.outcome = None
+
+    def _condition(self, position: int) -> bool:
+        if self.outcome is None:
+            raise ValueError(
+                f"Command {position}: no measurement to branch on!"
+            )
+        return self.outcome == int(self.args[position])
+
+    def _accept(self, start: int, stop: int, repeats: int = 1):
+        """Sends the commands in ``[start, stop)``, which contain no control
+        flow, to the simulator ``repeats`` times."""
+        if start >= stop or repeats == 0:
+            return
+        if repeats == 1:
+            results = self.simulator.accept_commands(
+                self.commands[start:stop]
+            )
+        else:
+            results = self.simulator.accept_repeated(
+                self.commands[start:stop], repeats
+            )
+        if results:
+            self.results.extend(results)
+            last = self.latest_measure[stop - 1]
+            self.outcome = _outcome(
+                results[-1], self.opcodes[last] == QUBIT_MEASURE_ALL
+            )
+
+    def run(self, start: int, stop: int):
+        """Runs the commands in ``[start, stop)``."""
+        position = start
+        while position < stop:
+            control = min(self.next_control[position], stop)
+            if control > position:
+                self._accept(position, control)
+                position = control
+                continue
+
+            code = self.opcodes[position]
+            end = int(self.jumps[position])
+            body = position + 1
+            if code == FOR_START:
+                if self.next_control[body] >= end:
+                    self._accept(body, end, int(self.args[position]))
+                else:
+                    for _ in range(int(self.args[position])):
+                        self.run(body, end)
+            elif code == IF:
+                if self._condition(position):
+                    self.run(body, end)
+            elif code == WHILE:
+                while self._condition(position):
+                    self.run(body, end)
+            position = end + 1
+
+
+def run_program(
+    simulator,
+    commands: np.ndarray,
+    jumps: np.ndarray = None
+) -> List[uint64]:
+    """Runs a program with control flow on a simulator.
+
+    The blocks are resolved once into a jump table, then the commands
+    between the control flow commands are sent to the simulator as whole
+    buffers with ``accept_commands``.
+
+    - ``FOR_START n`` repeats its block ``n`` times. A block without
+      control flow is sent once with ``accept_repeated``, so that
+      simulators can apply it as a single fused unitary.
+    - ``IF v`` runs its block once if the latest measured value is ``v``.
+    - ``WHILE v`` repeats its block as long as the latest measured value
+      is ``v``.
+
+    The latest measured value is the one of the last qubit measured by the
+    latest QUBIT_MEASURE or QUBIT_MEASURE_ALL command.
+
+    Parameters
+    ----------
+    simulator : IQuantumSimulator
+        Simulator performing the commands.
+    commands : np.ndarray
+        Array of 64-bit HAL commands.
+    jumps : np.ndarray, optional
+        Jump table of the program from ``resolve_control_flow``, resolved
+        if None.
+
+    Returns
+    -------
+    List[uint64]
+        Results of the commands that returned one (measurements), in the
+        order they were performed.
+    """
+    commands = np.asarray(commands, dtype=uint64).ravel()
+    if jumps is None:
+        jumps = resolve_control_flow(commands)
+    interpreter = _Interpreter(simulator, commands, jumps)
+    interpreter.run(0, len(commands))
+    return interpreter.results
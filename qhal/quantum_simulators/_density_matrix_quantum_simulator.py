@@ -0,0 +1,232 @@
+from typing import Dict, Sequence
+
+import numpy as np
+
+from ._numpy_gates import (PAULI_MATRICES, apply_matrix,
+                           apply_single_qubit_layer, gate_matrix)
+from ._numpy_quantum_simulator import NumpyQuantumSimulator
+from ._observables import BASIS_ROTATIONS
+from ._sampling import ShotSampler
+
+
+def depolarising_kraus_operators(error_rate: float) -> list:
+    """Kraus operators of the single qubit depolarising channel matching the
+    Pauli errors inserted by ``TrajectoryQuantumSimulator``."""
+    return [np.sqrt(1 - error_rate) * np.eye(2)] + [
+        np.sqrt(error_rate / 3) * PAULI_MATRICES[pauli] for pauli in "XYZ"
+    ]
+
+
+def kraus_superoperator(kraus_operators: Sequence[np.ndarray]) -> np.ndarray:
+    """Superoperator ``sum_k K (x) K*`` of a channel given by its Kraus
+    operators, acting on a row-major vectorised density matrix."""
+    return sum(np.kron(k, k.conj()) for k in kraus_operators)
+
+
+#: superoperator of the reset channel, with Kraus operators |0><0| and
+#: |0><1|, which re-prepares a qubit in |0> whatever its state
+RESET_SUPEROPERATOR = kraus_superoperator([
+    np.array([[1, 0], [0, 0]], dtype=complex),
+    np.array([[0, 1], [0, 0]], dtype=complex),
+])
+
+
+class DensityMatrixQuantumSimulator(NumpyQuantumSimulator):
+    """Exact noisy simulation of small registers with a density matrix.
+
+    The density matrix is stored as a row-major vectorised
+    ``(1, 4**register_size)`` array, so that bit ``q`` of the row index is
+    qubit ``register_size + q`` and bit ``q`` of the column index is qubit
+    ``q`` of a doubled register. Gates are applied as the superoperator
+    ``U (x) U*`` and noise as the superoperator of the depolarising Kraus
+    channel, each with a single tensor contraction over the doubled
+    register.
+
+    Besides the sampled QUBIT_MEASURE words, the exact probability of each
+    outcome is available through ``measurement_probabilities`` and
+    ``get_probabilities``.
+
+    Parameters
+    ----------
+    register_size : int
+        Size of the qubit register, at most ``MAX_REGISTER_SIZE``.
+    seed : int
+        Random number generator seed for measurements.
+    hal_metadata : HALMetadata, optional
+        Metadata whose native gate error rates define the noise channels.
+        If None, the simulation is noiseless.
+    """
+
+    MAX_REGISTER_SIZE = 12
+
+    def __init__(self,
+                 register_size: int = 8,
+                 seed: int = None,
+                 hal_metadata=None):
+        if register_size > self.MAX_REGISTER_SIZE:
+            raise ValueError(
+                f"Density matrix simulation is limited to "
+                f"{self.MAX_REGISTER_SIZE} qubits, {register_size} requested!"
+            )
+        super().__init__(register_size, seed, hal_metadata)
+        self._rho = None
+        self._channels: Dict[float, np.ndarray] = {}  # superoperator cache
+
+        #: exact probability of reading 1, for each measured qubit
+        self.measurement_probabilities: Dict[int, float] = {}
+
+    @property
+    def is_allocated(self) -> bool:
+        return self._rho is not None
+
+    def _init_qureg(self):
+        self._rho = np.zeros((1, 4 ** self._qubit_register_size), dtype=complex)
+        self._rho[0, 0] = 1
+        self.measurement_probabilities = {}
+
+    def _release_qureg(self):
+        self._rho = None
+
+    def _apply_superoperator(self, superoperator: np.ndarray, qubits: tuple):
+        n_qubits = self._qubit_register_size
+        doubled_qubits = [n_qubits + q for q in qubits] + list(qubits)
+        self._rho[...] = apply_matrix(
+            self._rho, superoperator, doubled_qubits, 2 * n_qubits
+        )
+
+    def apply_gate(self, op: str, qubits: tuple, angle: float = None):
+        unitary = gate_matrix(op, angle)
+        self._apply_superoperator(np.kron(unitary, unitary.conj()), qubits)
+
+        error_rate = self._noise_model.error_rate(op, qubits)
+        if error_rate > 0:
+            if error_rate not in self._channels:
+                self._channels[error_rate] = kraus_superoperator(
+                    depolarising_kraus_operators(error_rate)
+                )
+            channel = self._channels[error_rate]
+            for qubit in qubits:
+                self._apply_superoperator(channel, (qubit,))
+
+    def apply_unitary(self, matrix: np.ndarray, qubits: tuple):
+        # U rho U^dagger, with U on the row and U* on the column qubits
+        n_qubits = self._qubit_register_size
+        rho = apply_matrix(
+            self._rho, matrix, [n_qubits + q for q in qubits], 2 * n_qubits
+        )
+        self._rho[...] = apply_matrix(
+            rho, np.conj(matrix), list(qubits), 2 * n_qubits
+        )
+
+    def _matrix(self) -> np.ndarray:
+        dim = 2 ** self._qubit_register_size
+        return self._rho.reshape(dim, dim)
+
+    def _qubit_mask(self, qubit: int) -> np.ndarray:
+        return ((np.arange(2 ** self._qubit_register_size) >> qubit) & 1) == 1
+
+    def _pair_products(self, x_mask: int) -> np.ndarray:
+        indexes = np.arange(2 ** self._qubit_register_size)
+        return self._matrix()[indexes, indexes ^ x_mask][np.newaxis]
+
+    def _basis_probabilities(self, bases: dict) -> np.ndarray:
+        # U rho U^dagger, with U on the row and U* on the column qubits
+        n_qubits = self._qubit_register_size
+        rotated = [(BASIS_ROTATIONS[basis], qubit)
+                   for qubit, basis in bases.items() if basis != "Z"]
+        rho = self._rho
+        if rotated:
+            matrices, qubits = zip(*rotated)
+            rho = apply_single_qubit_layer(
+                rho, matrices + tuple(np.conj(matrices)),
+                [n_qubits + q for q in qubits] + list(qubits), 2 * n_qubits
+            )
+        dim = 2 ** n_qubits
+        # rounding errors may leave slightly negative probabilities
+        return np.maximum(
+            np.real(np.diagonal(rho.reshape(dim, dim))), 0
+        )[np.newaxis]
+
+    def _reset_qubit(self, qubit: int):
+        self._apply_superoperator(RESET_SUPEROPERATOR, (qubit,))
+
+    def _measure(self, qubit: int) -> int:
+        diagonal = np.real(np.diagonal(self._matrix()))
+        in_one = self._qubit_mask(qubit)
+        prob_one = float(np.clip(np.sum(diagonal[in_one]), 0, 1))
+        self.measurement_probabilities[qubit] = prob_one
+
+        outcome = int(self._random_state.rand() < prob_one)
+        discarded = in_one if outcome == 0 else ~in_one
+        matrix = self._matrix()
+        matrix[discarded, :] = 0
+        matrix[:, discarded] = 0
+        matrix /= prob_one if outcome else 1 - prob_one
+        return outcome
+
+    def _measure_all(self, qubits: list) -> np.ndarray:
+        probabilities = np.real(np.diagonal(self._matrix()))
+        for qubit in qubits:
+            self.measurement_probabilities[qubit] = float(
+                np.sum(probabilities[self._qubit_mask(qubit)])
+            )
+        # rounding errors may leave slightly negative probabilities
+        index = int(ShotSampler(
+            np.maximum(probabilities, 0), self._random_state
+        ).sample(1)[0])
+        return (index >> np.array(qubits, dtype=np.int64)).astype(np.uint64) & 1
+
+    def get_density_matrix(self, copy: bool = False) -> np.ndarray:
+        """Returns the density matrix of the qubit register, a read-only view
+        unless ``copy`` is True, see ``IQuantumSimulator.get_statevector``.
+
+        Returns
+        -------
+        np.ndarray
+            ``(2**register_size, 2**register_size)`` density matrix.
+        """
+        if not self.is_allocated:
+            raise ValueError("Qubit register is not prepared!")
+        if copy:
+            return self._matrix().copy()
+        view = self._matrix().view()
+        view.flags.writeable = False
+        return view
+
+    def get_probabilities(
+        self,
+        qubits: Sequence[int] = None,
+        copy: bool = False
+    ) -> np.ndarray:
+        """Returns the exact computational basis probabilities.
+
+        Parameters
+        ----------
+        qubits : Sequence[int], optional
+            Qubits to return the marginal distribution of, by default all of
+            them. ``qubits[i]`` is bit ``i`` of the returned indexes.
+        copy : bool, optional
+            Whether to return a writeable copy of the probabilities of all
+            the qubits rather than a read-only view of the diagonal of the
+            density matrix, False by default. Marginals are always new
+            arrays.
+
+        Returns
+        -------
+        np.ndarray
+            ``(2**len(qubits),)`` array of probabilities.
+        """
+        if not self.is_allocated:
+            raise ValueError("Qubit register is not prepared!")
+        n_qubits = self._qubit_register_size
+        probabilities = np.real(np.diagonal(self._matrix()))
+        if qubits is None:
+            return probabilities.copy() if copy else probabilities
+        tensor = probabilities.reshape((2,) * n_qubits)
+        kept_axes = [n_qubits - 1 - q for q in qubits]
+        summed_axes = tuple(set(range(n_qubits)) - set(kept_axes))
+        marginal = np.sum(tensor, axis=summed_axes)
+        # remaining axes are in increasing order: reorder as qubits reversed
+        order = np.argsort(np.argsort(kept_axes))
+        marginal = np.transpose(marginal, order[::-1])
+        return marginal.reshape(-1)
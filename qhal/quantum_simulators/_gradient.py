@@ -0,0 +1,120 @@
+from typing import NamedTuple
+
+import numpy as np
+
+from ._numpy_gates import apply_batched_matrix, binary_gate_matrices
+from ._observables import (Observable, exact_expectation,
+                           statevector_pair_products)
+from ._sweep import _compile
+from ..hal import ProgramTemplate
+from ..hal._program import PARAMETER_SHIFT
+from ..hal._utils import N_ANGLES
+
+#: gates ``exp(-i angle / 2 P)`` with ``P**2 = I``, whose derivatives follow
+#: from shifts of their angle by pi / 2
+PARAMETER_SHIFT_GATES = ("RX", "RY", "RZ", "RXX", "RZZ")
+
+
+class Gradient(NamedTuple):
+    """Expectation value of an observable and its derivatives with respect to
+    the parameters of a program."""
+    value: float
+    gradient: np.ndarray
+
+
+def parameter_shift_gradient(
+    template: ProgramTemplate,
+    values: np.ndarray,
+    observable: Observable,
+    register_size: int,
+    binary: bool = False
+) -> Gradient:
+    """Computes the gradient of the expectation value of an observable with
+    the parameter-shift rule, without noise.
+
+    The ``2 * n_words`` shifted programs of
+    ``ProgramTemplate.shifted_bindings`` are simulated together as one
+    batch of statevectors. The batch starts from the unshifted statevector
+    alone, and the two variants of a parametrised word are forked from it
+    when the word is reached, so that the gates before a word are applied
+    once for all its variants rather than once per variant. The gates are
+    applied between two buffers of ``1 + 2 * n_words`` statevectors.
+
+    Parameters
+    ----------
+    template : ProgramTemplate
+        The program and its parameters, a ``HALProgram`` or an array of
+        commands is wrapped into a template of every parametrised gate. The
+        parametrised gates must be in ``PARAMETER_SHIFT_GATES`` and followed
+        by the measurement commands only.
+    values : np.ndarray
+        ``(n_parameters,)`` values of the parameters.
+    observable : Observable
+        The observable whose expectation value is differentiated.
+    register_size : int
+        Size of the qubit register.
+    binary : bool, optional
+        Whether the values are 16-bit representations rather than angles in
+        radians, False by default. The derivatives are always per radian.
+
+    Returns
+    -------
+    Gradient
+        The expectation value and its ``(n_parameters,)`` gradient.
+    """
+    if not isinstance(template, ProgramTemplate):
+        template = ProgramTemplate(template)
+    values = np.asarray(values)
+    if values.shape != (template.n_parameters,):
+        raise ValueError(
+            f"Expected ({template.n_parameters},) parameter values, got "
+            f"{values.shape}!"
+        )
+    if observable.n_qubits > register_size:
+        raise ValueError(
+            f"Observable acts on qubits beyond the register size "
+            f"({register_size})!"
+        )
+    arguments = template._arguments(values, binary)
+
+    # the statevectors alternate between two buffers, whose first rows hold
+    # the unshifted statevector and the pairs of forked ones, in the order
+    # of their words
+    buffers = np.zeros((2, 1 + 2 * len(template.words), 2 ** register_size),
+                       dtype=complex)
+    states, spare = buffers
+    states[0, 0] = 1
+    n_states = 1
+    forked = []
+    for matrix, op, word, qubits in _compile(template):
+        if max(qubits) >= register_size:
+            raise ValueError(
+                f"Qubit index greater than register size ({register_size})!"
+            )
+        if matrix is None:
+            if op not in PARAMETER_SHIFT_GATES:
+                raise ValueError(f"{op} has no parameter-shift rule!")
+            shifts = arguments[word] + np.array([PARAMETER_SHIFT,
+                                                 -PARAMETER_SHIFT])
+            apply_batched_matrix(
+                np.repeat(states[:1], 2, axis=0),
+                binary_gate_matrices(op, shifts % N_ANGLES), qubits,
+                register_size, out=spare[n_states:n_states + 2]
+            )
+            matrix = binary_gate_matrices(op, arguments[word])
+            forked.append(word)
+        apply_batched_matrix(states[:n_states], matrix, qubits,
+                             register_size, out=spare[:n_states])
+        states, spare = spare, states
+        n_states = 1 + 2 * len(forked)
+    states = states[:n_states]
+
+    expectations = exact_expectation(
+        lambda x_mask: statevector_pair_products(states, x_mask),
+        observable, register_size
+    ) @ observable.coefficients
+    derivatives = np.zeros(len(template.words))
+    derivatives[forked] = (expectations[1::2] - expectations[2::2]) / 2
+    gradient = np.bincount(template.parameters, weights=derivatives,
+                           minlength=template.n_parameters)
+    return Gradient(float(expectations[0]), gradient)
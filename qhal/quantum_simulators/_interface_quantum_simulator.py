@@ -1,13 +1,34 @@
 from abc import ABC, abstractclassmethod
+from typing import List, Tuple
 
+import numpy as np
 from numpy import uint64
 
+from ._control_flow import run_program
+from ._observables import Observable
+from ._qubit_states import validate_command_buffer
+from ..hal._commands import _OPCODES_BY_CODE, Opcode
+from ..hal._opcodes import CONTROL_FLOW_CODES
+
+#: methods of each simulator returning read-only views of its state rather
+#: than copies, see ``IQuantumSimulator.get_statevector``. ProjectQ copies
+#: its wavefunction out of the C++ simulator.
+ZERO_COPY_BACKENDS = {
+    "TrajectoryQuantumSimulator": ("get_statevector", "get_statevectors"),
+    "DensityMatrixQuantumSimulator": ("get_probabilities",
+                                      "get_density_matrix"),
+    "ProjectqQuantumSimulator": (),
+}
+
 
 class IQuantumSimulator(ABC):
     """Abstract class for interfacing with a quantum simulators that interacts
     with the HAL.
     """
 
+    #: Optional ``Profiler`` recording the phases of ``accept_command``.
+    profiler = None
+
     @abstractclassmethod
     def accept_command(
         cls,
@@ -28,3 +49,204 @@ class IQuantumSimulator(ABC):
             Result of a measurement command.
         """
         pass
+
+    def accept_commands(
+        self,
+        commands: np.ndarray
+    ) -> List[uint64]:
+        """Performs the logic of a whole buffer of commands, in order.
+
+        Simulators implementing the ``_execute`` hook have the whole buffer
+        validated in one vectorised pass, then executed without decoding
+        each command again, and buffers with control flow are run by
+        ``run_program``. Otherwise, or while a profiler records the
+        commands, each command goes through ``accept_command``.
+
+        Parameters
+        ----------
+        commands : np.ndarray
+            Array of HAL commands.
+
+        Returns
+        -------
+        List[uint64]
+            Results of the commands that returned one (measurements), in
+            order.
+        """
+        if type(self)._execute is IQuantumSimulator._execute:
+            return self._accept_each(commands)
+        fields = self._validate_buffer(commands)
+        if np.isin(fields[0], CONTROL_FLOW_CODES).any():
+            return run_program(self, commands)
+        if self.profiler is not None:
+            return self._accept_each(commands)
+
+        results = []
+        for code, arg0, arg1, qubit0, qubit1 in zip(
+            *(field.tolist() for field in fields)
+        ):
+            opcode = _OPCODES_BY_CODE[code]
+            if opcode.cmd_type == "DUAL":
+                result = self._execute(opcode, [arg0, arg1], [qubit0, qubit1])
+            else:
+                result = self._execute(opcode, [arg0], [qubit0])
+            if result is not None:
+                results.append(result)
+        return results
+
+    def _accept_each(self, commands: np.ndarray) -> List[uint64]:
+        """Performs a buffer of commands one ``accept_command`` at a time."""
+        results = []
+        for command in np.asarray(commands, dtype=uint64).tolist():
+            result = self.accept_command(command)
+            if result is not None:
+                results.append(result)
+        return results
+
+    def _validate_buffer(self, commands: np.ndarray) -> Tuple[np.ndarray, ...]:
+        """Checks a buffer before ``_execute`` runs it, against the
+        ``_qubit_register_size`` and ``_offset_registers`` of the simulator,
+        and returns its ``command_array_unpacker`` fields."""
+        return validate_command_buffer(
+            commands, self._qubit_register_size, self._offset_registers
+        )
+
+    def _execute(
+        self,
+        opcode: Opcode,
+        args: List[int],
+        qubit_indexes: List[int]
+    ) -> uint64:
+        """Performs the logic of a decoded command.
+
+        Parameters
+        ----------
+        opcode : Opcode
+            The opcode of the command.
+        args : List[int]
+            Its arguments, one per qubit.
+        qubit_indexes : List[int]
+            Its qubit indexes, relative to the page offsets.
+
+        Returns
+        -------
+        uint64
+            Result of a measurement command.
+        """
+        raise NotImplementedError
+
+    def accept_layer(
+        self,
+        commands: np.ndarray
+    ) -> List[uint64]:
+        """Performs the logic of a layer of commuting commands, such as a
+        layer of ``qhal.compiler.schedule_program``.
+
+        Simulators may override this to apply the single qubit gates of the
+        layer at once, by default the commands are performed in order.
+
+        Parameters
+        ----------
+        commands : np.ndarray
+            Array of HAL commands that commute with each other.
+
+        Returns
+        -------
+        List[uint64]
+            Results of the commands that returned one (measurements), in
+            order.
+        """
+        return self.accept_commands(commands)
+
+    def accept_repeated(
+        self,
+        commands: np.ndarray,
+        repeats: int
+    ) -> List[uint64]:
+        """Performs the logic of a buffer of commands ``repeats`` times, such
+        as the body of a FOR_START block.
+
+        Simulators may override this to apply a body of gates as a single
+        fused unitary, by default the buffer is performed ``repeats`` times.
+
+        Parameters
+        ----------
+        commands : np.ndarray
+            Array of HAL commands, without control flow.
+        repeats : int
+            Number of times the buffer is performed.
+
+        Returns
+        -------
+        List[uint64]
+            Results of the commands that returned one (measurements), in
+            order.
+        """
+        results = []
+        for _ in range(repeats):
+            results.extend(self.accept_commands(commands))
+        return results
+
+    def get_statevector(self, copy: bool = False) -> np.ndarray:
+        """Returns the amplitudes of the qubit register, where qubit ``q`` is
+        bit ``q`` of the index.
+
+        Simulators listed in ``ZERO_COPY_BACKENDS`` return a read-only view
+        of their state unless ``copy`` is True: the view is not a snapshot,
+        later commands update the state in place, until the register is
+        released.
+
+        Parameters
+        ----------
+        copy : bool, optional
+            Whether to return a writeable copy of the amplitudes rather than
+            a view of them, False by default.
+
+        Returns
+        -------
+        np.ndarray
+            ``(2**register_size,)`` array of amplitudes.
+        """
+        raise NotImplementedError(
+            f"{type(self).__name__} does not expose a statevector!"
+        )
+
+    def expectation(
+        self,
+        observable: Observable,
+        n_shots: int = None
+    ) -> float:
+        """Evaluates the expectation value of an observable on the current
+        state, without measuring it.
+
+        Simulators evolving several trajectories return the average over
+        them, see ``TrajectoryQuantumSimulator.trajectory_expectations`` for
+        the value of each trajectory.
+
+        Parameters
+        ----------
+        observable : Observable
+            Weighted sum of Pauli strings over absolute qubit indexes.
+        n_shots : int, optional
+            Number of samples per qubit-wise commuting group of terms, and
+            per trajectory. If None, the expectation value is exact.
+
+        Returns
+        -------
+        float
+            The exact or estimated expectation value.
+        """
+        raise NotImplementedError(
+            f"{type(self).__name__} does not evaluate observables!"
+        )
+
+    def get_probabilities(self) -> np.ndarray:
+        """Returns the exact computational basis probabilities of the qubit
+        register, where qubit ``q`` is bit ``q`` of the index.
+
+        Returns
+        -------
+        np.ndarray
+            ``(2**register_size,)`` array of probabilities.
+        """
+        return np.abs(self.get_statevector()) ** 2
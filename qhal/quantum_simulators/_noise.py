@@ -0,0 +1,58 @@
+from typing import Dict, Tuple
+
+import numpy as np
+
+
+class PauliNoiseModel:
+    """Depolarising noise model built from the gate error rates stored in a
+    ``HALMetadata`` object.
+
+    After a native gate is applied, each qubit it acts on suffers an X, Y or Z
+    error, each with probability ``error_rate / 3``. Single qubit error rates
+    are indexed by qubit, ``error_rates[q]``; dual qubit error rates by the
+    qubit pair in the order the gate is applied to, ``error_rates[
+    qubit_index_1, qubit_index_0]`` (i.e. control first for CNOT).
+
+    Parameters
+    ----------
+    hal_metadata : HALMetadata, optional
+        Metadata holding the native gates and their error rates. A model
+        without metadata is noiseless.
+    """
+
+    def __init__(self, hal_metadata=None):
+        self._error_rates: Dict[str, np.ndarray] = {}
+        if hal_metadata is not None:
+            self._error_rates = {
+                gate: np.asarray(gate_data[1], dtype=float)
+                for gate, gate_data in hal_metadata.native_gates.items()
+            }
+
+    @property
+    def is_noiseless(self) -> bool:
+        return len(self._error_rates) == 0
+
+    def error_rate(self, op: str, qubits: Tuple[int, ...]) -> float:
+        """Returns the depolarising probability of ``op`` on ``qubits``.
+
+        Parameters
+        ----------
+        op : str
+            Name of the opcode.
+        qubits : Tuple[int, ...]
+            Absolute qubit indexes the gate is applied to, ``(q0,)`` or
+            ``(q1, q0)``.
+
+        Returns
+        -------
+        float
+            Error probability, 0 for gates without error data.
+        """
+        rates = self._error_rates.get(op)
+        if rates is None or rates.size == 0:
+            return 0.0
+        if rates.ndim == 1:
+            return float(rates[qubits[0]]) if qubits[0] < len(rates) else 0.0
+        if max(qubits) < rates.shape[0]:
+            return float(rates[qubits])
+        return 0.0
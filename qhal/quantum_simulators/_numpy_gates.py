@@ -0,0 +1,510 @@
+"""NumPy gate matrices and statevector kernels shared by the NumPy-based
+simulators.
+
+Statevectors are stored as ``(K, 2**n)`` complex arrays, where ``K`` is a
+leading batch dimension (trajectories, parameter points, ...). Following the
+ProjectQ convention, qubit ``q`` is bit ``q`` of the amplitude index, i.e.
+qubit 0 is the least significant bit.
+
+Two-qubit matrices are written in big-endian order over the qubit pair they
+are applied to. The simulators apply dual qubit commands to the pair
+``(qubit_index_1, qubit_index_0)``, matching ``ProjectqQuantumSimulator``
+where e.g. ``CNOT`` is controlled by ``qubit_index_1``.
+"""
+
+from functools import lru_cache
+from typing import Callable, Dict, Sequence, Tuple
+
+import numpy as np
+
+from ..hal._utils import angle_table
+
+
+_SQRT_HALF = 1 / np.sqrt(2)
+_IDENTITY = np.eye(2, dtype=complex)
+
+PAULI_MATRICES = {
+    "X": np.array([[0, 1], [1, 0]], dtype=complex),
+    "Y": np.array([[0, -1j], [1j, 0]], dtype=complex),
+    "Z": np.array([[1, 0], [0, -1]], dtype=complex),
+}
+
+CONSTANT_GATE_MATRICES: Dict[str, np.ndarray] = {
+    # SINGLE
+    "H": _SQRT_HALF * np.array([[1, 1], [1, -1]], dtype=complex),
+    "S": np.array([[1, 0], [0, 1j]], dtype=complex),
+    "SQRT_X": 0.5 * np.array([[1 + 1j, 1 - 1j], [1 - 1j, 1 + 1j]]),
+    "T": np.array([[1, 0], [0, np.exp(1j * np.pi / 4)]], dtype=complex),
+    "X": PAULI_MATRICES["X"],
+    "Y": PAULI_MATRICES["Y"],
+    "Z": PAULI_MATRICES["Z"],
+    "PAULI_X": PAULI_MATRICES["X"],
+    "PAULI_Y": PAULI_MATRICES["Y"],
+    "PAULI_Z": PAULI_MATRICES["Z"],
+    "INVT": np.array([[1, 0], [0, np.exp(-1j * np.pi / 4)]], dtype=complex),
+    "INVS": np.array([[1, 0], [0, -1j]], dtype=complex),
+    "SX": np.array([[0, 1], [1j, 0]], dtype=complex),
+    "SY": np.array([[0, 1j], [1, 0]], dtype=complex),
+    # DUAL
+    "CNOT": np.array([[1, 0, 0, 0],
+                      [0, 1, 0, 0],
+                      [0, 0, 0, 1],
+                      [0, 0, 1, 0]], dtype=complex),
+    "SWAP": np.array([[1, 0, 0, 0],
+                      [0, 0, 1, 0],
+                      [0, 1, 0, 0],
+                      [0, 0, 0, 1]], dtype=complex),
+}
+
+
+def _matrix(rows) -> np.ndarray:
+    """Stacks matrix entries, scalars or arrays broadcast against each
+    other, into a ``(..., n, n)`` array."""
+    entries = np.broadcast_arrays(
+        *(np.asarray(entry, dtype=complex) for row in rows for entry in row)
+    )
+    return np.stack(entries, axis=-1).reshape(
+        entries[0].shape + (len(rows), len(rows))
+    )
+
+
+# Parametrised gates as functions of the cosine and sine of their angle, or
+# of half their angle, so that they can be built from ``angle_table``.
+def _rx(cos: np.ndarray, sin: np.ndarray) -> np.ndarray:
+    return _matrix([[cos, -1j * sin],
+                    [-1j * sin, cos]])
+
+
+def _ry(cos: np.ndarray, sin: np.ndarray) -> np.ndarray:
+    return _matrix([[cos, -sin],
+                    [sin, cos]])
+
+
+def _rz(cos: np.ndarray, sin: np.ndarray) -> np.ndarray:
+    return _matrix([[cos - 1j * sin, 0],
+                    [0, cos + 1j * sin]])
+
+
+def _phase(cos: np.ndarray, sin: np.ndarray) -> np.ndarray:
+    return _matrix([[1, 0],
+                    [0, cos + 1j * sin]])
+
+
+def _pixy(cos: np.ndarray, sin: np.ndarray) -> np.ndarray:
+    return _matrix([[0, -sin - 1j * cos],
+                    [sin - 1j * cos, 0]])
+
+
+def _piyz(cos: np.ndarray, sin: np.ndarray) -> np.ndarray:
+    return _matrix([[cos, -1j * sin],
+                    [1j * sin, -cos]])
+
+
+def _pizx(cos: np.ndarray, sin: np.ndarray) -> np.ndarray:
+    return _matrix([[cos, sin],
+                    [sin, -cos]])
+
+
+def _pswap(cos: np.ndarray, sin: np.ndarray) -> np.ndarray:
+    phase = cos + 1j * sin
+    return _matrix([[1, 0, 0, 0],
+                    [0, 0, phase, 0],
+                    [0, phase, 0, 0],
+                    [0, 0, 0, 1]])
+
+
+def _rzz(cos: np.ndarray, sin: np.ndarray) -> np.ndarray:
+    minus, plus = cos - 1j * sin, cos + 1j * sin
+    return _matrix([[minus, 0, 0, 0],
+                    [0, plus, 0, 0],
+                    [0, 0, plus, 0],
+                    [0, 0, 0, minus]])
+
+
+def _rxx(cos: np.ndarray, sin: np.ndarray) -> np.ndarray:
+    return _matrix([[cos, 0, 0, -1j * sin],
+                    [0, cos, -1j * sin, 0],
+                    [0, -1j * sin, cos, 0],
+                    [-1j * sin, 0, 0, cos]])
+
+
+#: builder of each parametrised gate from ``(cos, sin)``, and whether they
+#: are of half the angle
+PARAMETERISED_GATE_BUILDERS: Dict[str, Tuple[Callable, bool]] = {
+    "R": (_phase, False),
+    "PHASE": (_phase, False),
+    "RX": (_rx, True),
+    "RY": (_ry, True),
+    "RZ": (_rz, True),
+    "PIXY": (_pixy, False),
+    "PIYZ": (_piyz, False),
+    "PIZX": (_pizx, False),
+    "PSWAP": (_pswap, False),
+    "RXX": (_rxx, True),
+    "RZZ": (_rzz, True),
+}
+
+
+@lru_cache(maxsize=1 << 16)
+def _parameterised_matrix(op: str, angle: float) -> np.ndarray:
+    builder, half = PARAMETERISED_GATE_BUILDERS[op]
+    if half:
+        angle = angle / 2
+    matrix = builder(np.cos(angle), np.sin(angle))
+    matrix.setflags(write=False)
+    return matrix
+
+
+def gate_matrix(op: str, angle: float = None) -> np.ndarray:
+    """Returns the unitary matrix of a HAL gate opcode.
+
+    Matrices of parametrised gates are cached per angle: the simulators
+    only use the angles of ``angle_table``, whose matrices are computed
+    once. The returned matrices are read-only.
+
+    Parameters
+    ----------
+    op : str
+        Name of the opcode.
+    angle : float, optional
+        Angle (in radians) of parametrised gates.
+
+    Returns
+    -------
+    np.ndarray
+        2x2 or 4x4 unitary matrix.
+    """
+    if op in CONSTANT_GATE_MATRICES:
+        return CONSTANT_GATE_MATRICES[op]
+    if op in PARAMETERISED_GATE_BUILDERS:
+        return _parameterised_matrix(op, float(angle))
+    raise ValueError(f"{op} has no matrix representation!")
+
+
+def binary_gate_matrices(op: str, binary: np.ndarray) -> np.ndarray:
+    """Returns the unitary matrices of a parametrised HAL gate for an array
+    of 16-bit angles, built from ``angle_table`` lookups.
+
+    Parameters
+    ----------
+    op : str
+        Name of the opcode.
+    binary : np.ndarray
+        16-bit representations of the angles.
+
+    Returns
+    -------
+    np.ndarray
+        ``binary.shape + (2, 2)`` or ``binary.shape + (4, 4)`` array of
+        unitary matrices.
+    """
+    if op not in PARAMETERISED_GATE_BUILDERS:
+        raise ValueError(f"{op} is not a parametrised gate!")
+    builder, half = PARAMETERISED_GATE_BUILDERS[op]
+    table = angle_table()
+    if half:
+        return builder(table.half_cos[binary], table.half_sin[binary])
+    return builder(table.cos[binary], table.sin[binary])
+
+
+def apply_matrix(
+    states: np.ndarray,
+    matrix: np.ndarray,
+    qubits: Sequence[int],
+    n_qubits: int
+) -> np.ndarray:
+    """Applies a 1- or 2-qubit matrix to a batch of statevectors with a
+    single tensor contraction.
+
+    Parameters
+    ----------
+    states : np.ndarray
+        ``(K, 2**n_qubits)`` batch of statevectors.
+    matrix : np.ndarray
+        ``(2**m, 2**m)`` matrix, big-endian over ``qubits``.
+    qubits : Sequence[int]
+        The ``m`` qubits the matrix acts on.
+    n_qubits : int
+        Number of qubits of each statevector.
+
+    Returns
+    -------
+    np.ndarray
+        ``(K, 2**n_qubits)`` batch of updated statevectors.
+    """
+    n_targets = len(qubits)
+    axes = [n_qubits - q for q in qubits]
+    tensor = states.reshape((-1,) + (2,) * n_qubits)
+    gate = np.asarray(matrix).reshape((2,) * (2 * n_targets))
+    result = np.tensordot(
+        gate, tensor, axes=(list(range(n_targets, 2 * n_targets)), axes)
+    )
+    result = np.moveaxis(result, list(range(n_targets)), axes)
+    return np.ascontiguousarray(result).reshape(states.shape)
+
+
+def apply_batched_matrix(
+    states: np.ndarray,
+    matrices: np.ndarray,
+    qubits: Sequence[int],
+    n_qubits: int,
+    out: np.ndarray = None
+) -> np.ndarray:
+    """Applies a different matrix on a few qubits to each statevector of a
+    batch.
+
+    The amplitudes are viewed with one axis per target qubit and every
+    output block is a sum of input blocks scaled by a matrix element, so
+    the statevectors are never transposed, and the elements that are zero
+    for every statevector are skipped.
+
+    Parameters
+    ----------
+    states : np.ndarray
+        ``(K, 2**n_qubits)`` batch of statevectors.
+    matrices : np.ndarray
+        ``(K, 2**m, 2**m)`` matrices, big-endian over ``qubits``, or a
+        single ``(2**m, 2**m)`` matrix applied to every statevector.
+    qubits : Sequence[int]
+        The ``m`` qubits the matrices act on.
+    n_qubits : int
+        Number of qubits of each statevector.
+    out : np.ndarray, optional
+        Contiguous ``(K, 2**n_qubits)`` array, not overlapping ``states``,
+        the statevectors are written to instead of a new array.
+
+    Returns
+    -------
+    np.ndarray
+        ``(K, 2**n_qubits)`` batch of updated statevectors.
+    """
+    if out is None:
+        out = np.empty_like(states)
+    matrices = np.asarray(matrices)
+    n_targets = len(qubits)
+    nonzero = matrices.any(axis=0) if matrices.ndim == 3 else matrices
+    dense = np.count_nonzero(nonzero) > 2 ** n_targets
+    if dense and min(qubits) >= 4 and \
+            list(qubits) == list(range(qubits[0], qubits[0] - n_targets, -1)):
+        # consecutive targets, from the highest one, with runs of at least 16
+        # amplitudes make the matrix product faster than the sum of blocks,
+        # unless the matrices are permutations or diagonal
+        shape = (states.shape[0], 2 ** (n_qubits - qubits[0] - 1),
+                 2 ** n_targets, 2 ** qubits[-1])
+        if matrices.ndim == 3:
+            matrices = matrices[:, np.newaxis]
+        np.matmul(matrices, states.reshape(shape), out=out.reshape(shape))
+        return out
+    if n_qubits > 4 and max(qubits) < 4:
+        # runs of fewer than 16 amplitudes: the matrices are expanded to the
+        # 4 lowest qubits and applied as one product, from the right
+        expanded = expand_matrix(matrices, qubits, 4)
+        shape = (states.shape[0], -1, 16)
+        np.matmul(states.reshape(shape), np.swapaxes(expanded, -1, -2),
+                  out=out.reshape(shape))
+        return out
+    # view with an axis of size 2 for each target, from the highest one
+    shape = [states.shape[0]]
+    previous = n_qubits
+    for qubit in sorted(qubits, reverse=True):
+        shape += [2 ** (previous - qubit - 1), 2]
+        previous = qubit
+    shape.append(2 ** previous)
+    view = states.reshape(shape)
+    # axis of each target in the view, in the order of ``qubits``
+    ranks = sorted(qubits, reverse=True)
+    axes = [2 + 2 * ranks.index(qubit) for qubit in qubits]
+
+    coefficients = matrices.reshape(
+        matrices.shape[:-2] + (2 ** n_targets, 2 ** n_targets)
+    )
+    batched = coefficients.ndim == 3
+    if batched:
+        coefficients = coefficients.reshape(
+            coefficients.shape + (1,) * (len(shape) - 1)
+        )
+    else:
+        coefficients = coefficients.tolist()
+    result = out.reshape(shape)
+    scratch = None
+    for row in range(2 ** n_targets):
+        output = _block(result, axes, row, n_targets)
+        written = False
+        for column in range(2 ** n_targets):
+            # zero elements, e.g. most of those of CNOT or RZZ, are skipped
+            if batched:
+                term = coefficients[:, row, column]
+                if not term.any():
+                    continue
+            else:
+                term = coefficients[row][column]
+                if term == 0:
+                    continue
+            block = _block(view, axes, column, n_targets)
+            # the first term is written over the output block, so the
+            # permutations, e.g. CNOT or SWAP, are copies and the diagonal
+            # gates a single product
+            if not written:
+                if not batched and term == 1:
+                    np.copyto(output, block)
+                else:
+                    np.multiply(term, block, out=output)
+                written = True
+            elif not batched and term == 1:
+                output += block
+            else:
+                if scratch is None:
+                    scratch = np.empty_like(output)
+                np.multiply(term, block, out=scratch)
+                output += scratch
+        if not written:
+            output[...] = 0
+    return out
+
+
+def expand_matrix(
+    matrices: np.ndarray,
+    qubits: Sequence[int],
+    n_qubits: int
+) -> np.ndarray:
+    """Expands matrices acting on some of ``n_qubits`` qubits to matrices
+    acting on all of them.
+
+    Parameters
+    ----------
+    matrices : np.ndarray
+        ``(K, 2**m, 2**m)`` or ``(2**m, 2**m)`` matrices, big-endian over
+        ``qubits``.
+    qubits : Sequence[int]
+        The ``m`` qubits the matrices act on.
+    n_qubits : int
+        Number of qubits of the expanded matrices.
+
+    Returns
+    -------
+    np.ndarray
+        ``(K, 2**n_qubits, 2**n_qubits)`` or ``(2**n_qubits, 2**n_qubits)``
+        matrices, big-endian over the qubits from ``n_qubits - 1`` to 0.
+    """
+    matrices = np.asarray(matrices)
+    if list(qubits) == list(range(n_qubits - 1, -1, -1)):
+        return matrices
+    size = 2 ** n_qubits
+    # the rows of the identity are mapped to the columns of the expanded
+    # matrices
+    rows = np.eye(size, dtype=complex)
+    if matrices.ndim == 3:
+        rows = np.tile(rows, (len(matrices), 1))
+        columns = apply_batched_matrix(
+            rows, np.repeat(matrices, size, axis=0), qubits, n_qubits
+        ).reshape(-1, size, size)
+    else:
+        columns = apply_batched_matrix(rows, matrices, qubits, n_qubits)
+    return np.swapaxes(columns, -1, -2)
+
+
+def _block(view: np.ndarray, axes: Sequence[int], index: int,
+           n_targets: int) -> np.ndarray:
+    """Returns the amplitudes of a view where the targets, big-endian over
+    ``axes``, take the values of the bits of ``index``."""
+    selection = [slice(None)] * view.ndim
+    for position, axis in enumerate(axes):
+        bit = (index >> (n_targets - 1 - position)) & 1
+        selection[axis] = slice(bit, bit + 1)
+    return view[tuple(selection)]
+
+
+def apply_single_qubit_layer(
+    states: np.ndarray,
+    matrices: Sequence[np.ndarray],
+    qubits: Sequence[int],
+    n_qubits: int,
+    block_size: int = 5
+) -> np.ndarray:
+    """Applies a layer of single qubit matrices to a batch of statevectors,
+    one pass over the statevectors per block of adjacent qubits.
+
+    The matrices on each block of up to ``block_size`` consecutive qubits are
+    combined into their Kronecker product, which is applied as a single
+    matrix product over a ``(K * high, 2**block_size, low)`` view. Several
+    matrices on the same qubit are multiplied in order.
+
+    Parameters
+    ----------
+    states : np.ndarray
+        ``(K, 2**n_qubits)`` batch of statevectors.
+    matrices : Sequence[np.ndarray]
+        ``(2, 2)`` matrices of the layer.
+    qubits : Sequence[int]
+        The qubit each matrix acts on.
+    n_qubits : int
+        Number of qubits of each statevector.
+    block_size : int, optional
+        Maximum number of qubits combined in one product, 5 by default.
+
+    Returns
+    -------
+    np.ndarray
+        ``(K, 2**n_qubits)`` batch of updated statevectors.
+    """
+    gates = {}
+    for matrix, qubit in zip(matrices, qubits):
+        gates[qubit] = matrix @ gates[qubit] if qubit in gates else matrix
+
+    gate_qubits = sorted(gates)
+    while gate_qubits:
+        low = gate_qubits[0]
+        block_qubits = [qubit for qubit in gate_qubits
+                        if qubit < low + block_size]
+        gate_qubits = gate_qubits[len(block_qubits):]
+        high = block_qubits[-1] + 1
+
+        block = np.ones((1, 1), dtype=complex)
+        for qubit in range(high - 1, low - 1, -1):
+            block = np.kron(block, gates.get(qubit, _IDENTITY))
+        width = 2 ** (high - low)
+        if low == 0:
+            states = (states.reshape(-1, width) @ block.T).reshape(
+                states.shape
+            )
+        else:
+            view = states.reshape(-1, width, 2 ** low)
+            states = np.matmul(block, view).reshape(states.shape)
+    return states
+
+
+def qubit_view(states: np.ndarray, qubit: int, n_qubits: int) -> np.ndarray:
+    """Returns a ``(K, high, 2, low)`` view of the statevectors where the third
+    axis runs over the value of ``qubit``.
+    """
+    return states.reshape(
+        states.shape[0], 2 ** (n_qubits - qubit - 1), 2, 2 ** qubit
+    )
+
+
+def apply_pauli(
+    states: np.ndarray,
+    pauli: str,
+    qubit: int,
+    n_qubits: int,
+    mask: np.ndarray = None
+) -> None:
+    """Applies a Pauli operator in place, only to the statevectors selected by
+    ``mask`` (all of them if ``mask`` is None).
+    """
+    view = qubit_view(states, qubit, n_qubits)
+    if mask is None:
+        mask = slice(None)
+    elif not mask.any():
+        return
+
+    if pauli == "X":
+        view[mask] = view[mask][:, :, ::-1, :]
+    elif pauli == "Z":
+        view[mask, :, 1, :] *= -1
+    elif pauli == "Y":
+        selected = view[mask]
+        view[mask, :, 0, :] = -1j * selected[:, :, 1, :]
+        view[mask, :, 1, :] = 1j * selected[:, :, 0, :]
+    else:
+        raise ValueError(f"{pauli} is not a Pauli operator!")
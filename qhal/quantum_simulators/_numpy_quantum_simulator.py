@@ -0,0 +1,434 @@
+from abc import abstractmethod
+from collections import OrderedDict
+from typing import List
+
+import numpy as np
+from numpy import uint64
+from numpy.random import RandomState
+
+from . import IQuantumSimulator
+from ._noise import PauliNoiseModel
+from ._observables import Observable, exact_expectation, sampled_expectation
+from ._numpy_gates import apply_matrix, gate_matrix
+from ._qubit_states import QubitStates
+from ..hal import (command_unpacker, measurement_creator, string_to_opcode,
+                   Opcode)
+from ..hal import _opcodes as ops
+from ..hal._commands import _OPCODES_BY_CODE, resolve_qubit_indexes
+from ..hal._utils import angle_from_binary_representation
+
+#: commands acting on a single qubit that ``accept_layer`` keeps in order
+_QUBIT_CODES = [ops.STATE_PREPARATION, ops.QUBIT_MEASURE]
+#: commands that do not act on the qubits
+_QUBITLESS_CODES = np.concatenate((
+    ops.NO_OPERATION_CODES,
+    [ops.PAGE_SET_QUBIT_0, ops.PAGE_SET_QUBIT_1, ops.REQUEST_METADATA]
+))
+#: gates that ``accept_repeated`` fuses into a single unitary
+_GATE_CODES = np.concatenate((ops.SINGLE_GATE_CODES, ops.DUAL_GATE_CODES))
+#: commands of the bodies that ``accept_repeated`` fuses
+_FUSABLE_CODES = np.concatenate((_GATE_CODES, ops.NO_OPERATION_CODES))
+
+
+class NumpyQuantumSimulator(IQuantumSimulator):
+    """Common command handling of the NumPy-based simulators.
+
+    Concrete simulators hold their own state representation and implement
+    the state preparation, gate and measurement hooks.
+
+    Parameters
+    ----------
+    register_size : int
+        Size of the qubit register.
+    seed : int
+        Random number generator seed for both measurements and errors.
+    hal_metadata : HALMetadata, optional
+        Metadata whose native gate error rates define the Pauli noise model.
+        If None, the simulation is noiseless.
+    """
+
+    #: largest number of qubits of a unitary fused by ``accept_repeated``
+    MAX_FUSED_QUBITS = 8
+    #: number of fused unitaries kept by ``accept_repeated``, the least
+    #: recently used being evicted first
+    MAX_FUSED_UNITARIES = 64
+
+    def __init__(self,
+                 register_size: int = 16,
+                 seed: int = None,
+                 hal_metadata=None):
+        self.seed = seed
+        self._random_state = RandomState(seed)
+        self._noise_model = PauliNoiseModel(hal_metadata)
+
+        self._qubit_register_size = register_size
+        self._session_started = False
+        self._qubit_states = QubitStates(register_size)
+        self._offset_registers = [0, 0]  # offsets for qubit indexes 0 and 1
+        # fused unitary and qubits of each repeated body, by body and offsets
+        self._fused_unitaries = OrderedDict()
+
+    def get_offset(self, qubit_index: int):
+        return self._offset_registers[qubit_index]
+
+    @property
+    @abstractmethod
+    def is_allocated(self) -> bool:
+        """Whether the qubit register is currently allocated."""
+
+    @abstractmethod
+    def _init_qureg(self):
+        """Allocates the register in the all-zero state."""
+
+    @abstractmethod
+    def _release_qureg(self):
+        """Releases the register."""
+
+    @abstractmethod
+    def _reset_qubit(self, qubit: int):
+        """Resets a measured qubit to zero."""
+
+    @abstractmethod
+    def _measure(self, qubit: int):
+        """Projectively measures ``qubit`` and returns the outcome(s)."""
+
+    @abstractmethod
+    def _measure_all(self, qubits: list) -> np.ndarray:
+        """Measures ``qubits`` in one step and returns the outcomes, with
+        one column per qubit."""
+
+    @abstractmethod
+    def apply_gate(self, op: str, qubits: tuple, angle: float = None):
+        """Applies a gate, followed by its errors.
+
+        Parameters
+        ----------
+        op : str
+            Name of the opcode.
+        qubits : tuple
+            Absolute indexes the gate matrix is applied to, ``(q0,)`` for
+            single and ``(q1, q0)`` for dual qubit commands.
+        angle : float, optional
+            Angle of gate if parametrised.
+        """
+
+    @abstractmethod
+    def apply_unitary(self, matrix: np.ndarray, qubits: tuple):
+        """Applies an arbitrary unitary, without errors.
+
+        Parameters
+        ----------
+        matrix : np.ndarray
+            ``(2**m, 2**m)`` unitary, big-endian over ``qubits``.
+        qubits : tuple
+            The ``m`` absolute indexes the unitary is applied to.
+        """
+
+    @abstractmethod
+    def _pair_products(self, x_mask: int) -> np.ndarray:
+        """Returns the ``(K, 2**n)`` products ``rho[k, k ^ x_mask]`` of the
+        state(s), see ``exact_expectation``."""
+
+    @abstractmethod
+    def _basis_probabilities(self, bases: dict) -> np.ndarray:
+        """Returns the ``(K, 2**n)`` probabilities of the state(s) measured
+        in the given Pauli bases, see ``sampled_expectation``."""
+
+    def expectation(
+        self,
+        observable: Observable,
+        n_shots: int = None
+    ) -> float:
+        """Evaluates the expectation value of an observable, averaged over
+        the states of the simulator, see ``IQuantumSimulator.expectation``.
+
+        Returns
+        -------
+        float
+            The exact or estimated expectation value.
+        """
+        return float(np.mean(self._expectations(observable, n_shots)))
+
+    def _expectations(
+        self,
+        observable: Observable,
+        n_shots: int = None
+    ) -> np.ndarray:
+        """Returns the ``(K,)`` expectation value of an observable for each
+        state of the simulator, see ``IQuantumSimulator.expectation``."""
+        if not self.is_allocated:
+            raise ValueError("Qubit register is not prepared!")
+        if observable.n_qubits > self._qubit_register_size:
+            raise ValueError(
+                f"Observable acts on qubits beyond the register size "
+                f"({self._qubit_register_size})!"
+            )
+        if n_shots is None:
+            values = exact_expectation(
+                self._pair_products, observable, self._qubit_register_size
+            )
+        else:
+            values = sampled_expectation(
+                self._basis_probabilities, observable, n_shots,
+                self._random_state
+            )
+        return values @ observable.coefficients
+
+    def apply_gates(self, ops: List[str], qubits: List[int],
+                    angles: List[float]):
+        """Applies a layer of single qubit gates, each followed by its
+        errors.
+
+        Simulators may override this to apply the whole layer at once, by
+        default the gates are applied one by one.
+
+        Parameters
+        ----------
+        ops : List[str]
+            Names of the opcodes.
+        qubits : List[int]
+            Absolute index each gate is applied to.
+        angles : List[float]
+            Angle of each gate, None if not parametrised.
+        """
+        for op, qubit, angle in zip(ops, qubits, angles):
+            self.apply_gate(op, (qubit,), angle)
+
+    def accept_layer(
+        self,
+        commands: np.ndarray
+    ) -> List[uint64]:
+        """Applies the single qubit gates of a layer with a single
+        ``apply_gates`` call, then performs its other commands in order.
+
+        The gates are only applied first when the other commands of the
+        layer are two qubit gates, preparations or measurements of other
+        qubits, or do not act on the qubits. Otherwise the commands are
+        performed in order.
+        """
+        fields = self._validate_buffer(commands)
+        opcodes, args_0 = fields[0], fields[1]
+        gates = np.isin(opcodes, ops.SINGLE_GATE_CODES)
+        if not (self._session_started and self.is_allocated and gates.any()):
+            return self.accept_commands(commands)
+
+        qubits_0, qubits_1 = resolve_qubit_indexes(
+            commands, self._offset_registers
+        )
+        dual = np.isin(opcodes, ops.DUAL_GATE_CODES)
+        others = np.isin(opcodes, _QUBIT_CODES) | dual
+        if (~(gates | others) & ~np.isin(opcodes, _QUBITLESS_CODES)).any() \
+                or np.isin(qubits_0[gates], qubits_0[others]).any() \
+                or np.isin(qubits_0[gates], qubits_1[dual]).any():
+            return self.accept_commands(commands)
+
+        qubits = qubits_0[gates].tolist()
+        for qubit in qubits:
+            if self._qubit_states.is_measured(qubit):
+                raise ValueError("Qubit requires re-preparation!")
+
+        gate_ops = [
+            _OPCODES_BY_CODE[code] for code in opcodes[gates].tolist()
+        ]
+        angles = [
+            angle_from_binary_representation(arg)
+            if op.param == "PARAM" else None
+            for op, arg in zip(gate_ops, args_0[gates].tolist())
+        ]
+        self.apply_gates([op.name for op in gate_ops], qubits, angles)
+        commands = np.asarray(commands, dtype=uint64)
+        return self.accept_commands(commands[~gates])
+
+    def accept_repeated(
+        self,
+        commands: np.ndarray,
+        repeats: int
+    ) -> List[uint64]:
+        """Applies a buffer made only of gates ``repeats`` times as one
+        fused unitary raised to the ``repeats`` power, otherwise performs
+        the buffer ``repeats`` times.
+
+        The fused unitaries of the ``MAX_FUSED_UNITARIES`` most recently
+        repeated buffers are cached, per offsets. Gates are only fused when
+        the simulation is noiseless, since errors follow every gate, and
+        when they act on at most ``MAX_FUSED_QUBITS`` prepared qubits.
+        """
+        commands = np.asarray(commands, dtype=uint64)
+        fused = self._fused_unitary(commands) if repeats > 1 else None
+        if fused is None:
+            return super().accept_repeated(commands, repeats)
+        matrix, qubits = fused
+        self.apply_unitary(np.linalg.matrix_power(matrix, repeats), qubits)
+        return []
+
+    def _fused_unitary(self, commands: np.ndarray):
+        """Returns the unitary of a buffer of gates and the qubits it is
+        applied to, None if the buffer cannot be fused."""
+        if not (self._noise_model.is_noiseless and self._session_started and
+                self.is_allocated):
+            return None
+        key = (commands.tobytes(), tuple(self._offset_registers))
+        if key in self._fused_unitaries:
+            self._fused_unitaries.move_to_end(key)
+        else:
+            self._fused_unitaries[key] = self._fuse(commands)
+            if len(self._fused_unitaries) > self.MAX_FUSED_UNITARIES:
+                self._fused_unitaries.popitem(last=False)
+        fused = self._fused_unitaries[key]
+        if fused is None or any(
+            self._qubit_states.is_measured(qubit) for qubit in fused[1]
+        ):
+            return None
+        return fused
+
+    def _fuse(self, commands: np.ndarray):
+        fields = self._validate_buffer(commands)
+        opcodes, _, args_1 = fields[:3]
+        if not np.isin(opcodes, _FUSABLE_CODES).all():
+            return None
+        gates = np.isin(opcodes, _GATE_CODES)
+        dual = np.isin(opcodes, ops.DUAL_GATE_CODES)
+        qubits_0, qubits_1 = resolve_qubit_indexes(
+            commands, self._offset_registers
+        )
+        support = np.union1d(qubits_0[gates], qubits_1[dual])
+        if len(support) > self.MAX_FUSED_QUBITS:
+            return None
+
+        # the columns of the unitary are the images of the basis states,
+        # bit j of which stands for qubit support[j]
+        n_qubits = len(support)
+        images = np.eye(2 ** n_qubits, dtype=complex)
+        local_0 = np.searchsorted(support, qubits_0).tolist()
+        local_1 = np.searchsorted(support, qubits_1).tolist()
+        args = np.where(dual, args_1, fields[1]).tolist()
+        for index in np.flatnonzero(gates).tolist():
+            opcode = _OPCODES_BY_CODE[int(opcodes[index])]
+            angle = angle_from_binary_representation(args[index]) \
+                if opcode.param == "PARAM" else None
+            qubits = (local_1[index], local_0[index]) if dual[index] else \
+                (local_0[index],)
+            images = apply_matrix(
+                images, gate_matrix(opcode.name, angle), qubits, n_qubits
+            )
+        return images.T, tuple(support[::-1].tolist())
+
+    def accept_command(
+        self,
+        command: uint64
+    ) -> uint64:
+
+        op, _, args, qubit_indexes = command_unpacker(command)
+
+        for index in qubit_indexes:
+            assert index <= self._qubit_register_size, \
+                f"Qubit index {index} greater than register size " + \
+                f"({self._qubit_register_size})!"
+
+        return self._execute(string_to_opcode(op), args, qubit_indexes)
+
+    def _execute(
+        self,
+        op_obj: Opcode,
+        args: List[int],
+        qubit_indexes: List[int]
+    ) -> uint64:
+        """Performs the logic of a decoded command."""
+        op = op_obj.name
+        cmd_type = op_obj.cmd_type
+
+        q_index_0 = qubit_indexes[0] + self.get_offset(0)
+        q_index_1 = 0
+        if len(qubit_indexes) > 1:
+            q_index_1 = qubit_indexes[1] + self.get_offset(1)
+
+        if op == "START_SESSION":
+            if self._session_started:
+                raise ValueError("Simulator session already started!")
+            self._session_started = True
+
+        elif not self._session_started:
+            raise ValueError(f"{op} received outside of a session!")
+
+        elif op == "STATE_PREPARATION_ALL":
+            if self.is_allocated:
+                raise ValueError("Qubit register has already been initialised!")
+            self._init_qureg()
+            self._qubit_states.allocate()
+
+        elif op == "STATE_PREPARATION":
+            if not self.is_allocated:
+                self._init_qureg()
+                self._qubit_states.allocate()
+            elif self._qubit_states.is_measured(q_index_0):
+                self._reset_qubit(q_index_0)
+                self._qubit_states.mark_prepared(q_index_0)
+            else:
+                raise ValueError("Qubit already prepared!")
+
+        elif op == "END_SESSION":
+            self._release_qureg()
+            self._session_started = False
+
+        elif op == "QUBIT_MEASURE":
+            if not self.is_allocated:
+                raise ValueError("Qubit register is not prepared!")
+            if self._qubit_states.is_measured(q_index_0):
+                raise ValueError("Qubit already measured!")
+
+            measurement = self._measure(q_index_0)
+            self._qubit_states.mark_measured(q_index_0)
+
+            if self._qubit_states.all_measured:
+                self._qubit_states.release()
+                self._release_qureg()
+
+            return measurement_creator(
+                qubit_indexes[0], self._offset_registers[0], 0, measurement
+            )
+
+        elif op == "QUBIT_MEASURE_ALL":
+            if not self.is_allocated:
+                raise ValueError("Qubit register is not prepared!")
+
+            qubits = self._qubit_states.unmeasured()
+            measurements = self._measure_all(qubits)
+            self._qubit_states.mark_all_measured()
+            self._qubit_states.release()
+            self._release_qureg()
+
+            # relative index and offset as for QUBIT_MEASURE; qubits below
+            # the page of qubit 0 keep their absolute index
+            qubits = np.array(qubits, dtype=uint64)
+            offsets = np.where(
+                qubits >= self._offset_registers[0], self._offset_registers[0], 0
+            ).astype(uint64)
+            return measurement_creator(
+                qubits - offsets, offsets, 0, measurements
+            )
+
+        elif op.split("_")[0] == "PAGE":
+            self._offset_registers[int(op.split("_")[3])] = qubit_indexes[0]
+
+        elif op == "ID":
+            pass
+
+        elif op_obj.code in ops.CONTROL_FLOW_CODES:
+            raise ValueError(f"{op} must be sent in a buffer with its block!")
+
+        elif op_obj.param in ("PARAM", "CONST"):
+            if self._qubit_states.is_measured(q_index_0):
+                raise ValueError("Qubit requires re-preparation!")
+
+            angle = None
+            if op_obj.param == "PARAM":
+                angle = angle_from_binary_representation(args[-1])
+
+            if self.is_allocated:
+                if cmd_type == "SINGLE":
+                    self.apply_gate(op, (q_index_0,), angle)
+                else:
+                    self.apply_gate(op, (q_index_1, q_index_0), angle)
+
+        else:
+            raise TypeError(f"{op} is not a recognised opcode!")
@@ -0,0 +1,221 @@
+from typing import Callable, Dict, List, NamedTuple
+
+import numpy as np
+from numpy.random import RandomState
+
+from ._numpy_gates import CONSTANT_GATE_MATRICES, apply_single_qubit_layer
+from ._sampling import sample_batch
+
+#: rotation of each Pauli basis onto the Z basis, before sampling
+BASIS_ROTATIONS = {
+    "X": CONSTANT_GATE_MATRICES["H"],
+    "Y": CONSTANT_GATE_MATRICES["H"] @ CONSTANT_GATE_MATRICES["INVS"],
+}
+
+
+def parity(values: np.ndarray) -> np.ndarray:
+    """Returns the parity of the number of set bits of non-negative 64-bit
+    integers."""
+    values = np.array(values, dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        values ^= values >> shift
+    return values & 1
+
+
+class QubitWiseGroup(NamedTuple):
+    """Terms of an observable that commute qubit-wise, so that they are
+    estimated from the same samples."""
+    #: indexes of the terms in the observable
+    terms: np.ndarray
+    #: Pauli basis ("X", "Y" or "Z") each qubit is measured in
+    bases: Dict[int, str]
+
+
+class Observable:
+    """Weighted sum of Pauli strings.
+
+    Each term is stored as the bitmasks of the qubits on which it has an X
+    or a Z component, a Y being both, so that ``P |k> = i**n_y *
+    (-1)**parity(k & z) |k ^ x>`` is evaluated with bitwise operations on
+    the amplitude indexes.
+
+    Parameters
+    ----------
+    terms : Dict[str, float]
+        Coefficient of each Pauli string, written as space separated Pauli
+        operators followed by their qubit index, e.g. ``"X0 Z3"``. The empty
+        string is the identity.
+    """
+
+    def __init__(self, terms: Dict[str, float]):
+        self.terms = dict(terms)
+        self.coefficients = np.array(list(self.terms.values()), dtype=float)
+        self.x_masks = np.zeros(len(self.terms), dtype=np.int64)
+        self.z_masks = np.zeros(len(self.terms), dtype=np.int64)
+        self._paulis: List[Dict[int, str]] = []
+        for index, string in enumerate(self.terms):
+            paulis = {}
+            for operator in string.split():
+                pauli, qubit = operator[0], int(operator[1:])
+                if pauli not in "XYZ" or qubit in paulis:
+                    raise ValueError(f"Invalid Pauli string {string}!")
+                paulis[qubit] = pauli
+                if pauli in "XY":
+                    self.x_masks[index] |= 1 << qubit
+                if pauli in "YZ":
+                    self.z_masks[index] |= 1 << qubit
+            self._paulis.append(paulis)
+        n_y = np.array(
+            [list(paulis.values()).count("Y") for paulis in self._paulis],
+            dtype=np.int64
+        )
+        #: ``i**n_y`` of each term
+        self.phases = 1j ** n_y
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    @property
+    def n_qubits(self) -> int:
+        """Number of qubits up to the highest one acted on."""
+        return int(np.bitwise_or.reduce(
+            self.x_masks | self.z_masks, initial=0
+        )).bit_length()
+
+    def groups(self) -> List[QubitWiseGroup]:
+        """Partitions the terms into qubit-wise commuting groups, greedily in
+        order of decreasing weight."""
+        order = sorted(range(len(self)),
+                       key=lambda term: -len(self._paulis[term]))
+        groups = []
+        for term in order:
+            paulis = self._paulis[term]
+            for terms, bases in groups:
+                if all(bases.get(qubit, pauli) == pauli
+                       for qubit, pauli in paulis.items()):
+                    terms.append(term)
+                    bases.update(paulis)
+                    break
+            else:
+                groups.append(([term], dict(paulis)))
+        return [QubitWiseGroup(np.array(sorted(terms)), bases)
+                for terms, bases in groups]
+
+
+def exact_expectation(
+    pair_products: Callable[[int], np.ndarray],
+    observable: Observable,
+    n_qubits: int
+) -> np.ndarray:
+    """Evaluates the expectation value of an observable exactly.
+
+    ``<P> = i**n_y * sum_k rho[k, k ^ x] (-1)**parity(k & z)``: the products
+    ``rho[k, k ^ x]`` are computed once per X mask. For each Z mask they are
+    summed over the other qubits in a single reduction, and the signs are
+    only applied to the remaining ``2**|z|`` sums.
+
+    Parameters
+    ----------
+    pair_products : Callable[[int], np.ndarray]
+        Returns the ``(K, 2**n_qubits)`` products ``rho[k, k ^ x]`` for an X
+        mask, i.e. ``psi[k] * conj(psi[k ^ x])`` for statevectors.
+    observable : Observable
+        The observable.
+    n_qubits : int
+        Number of qubits of the states.
+
+    Returns
+    -------
+    np.ndarray
+        ``(K, n_terms)`` expectation value of every term.
+    """
+    values = None
+    for x_mask in np.unique(observable.x_masks).tolist():
+        products = pair_products(x_mask)
+        if values is None:
+            values = np.zeros((len(products), len(observable)))
+        # axis 1 + n_qubits - 1 - q is qubit q
+        tensor = products.reshape((len(products),) + (2,) * n_qubits)
+        for term in np.flatnonzero(observable.x_masks == x_mask).tolist():
+            z_mask = int(observable.z_masks[term])
+            z_qubits = [q for q in range(n_qubits) if (z_mask >> q) & 1]
+            summed = tuple(n_qubits - q for q in range(n_qubits)
+                           if not (z_mask >> q) & 1)
+            sums = tensor.sum(axis=summed).reshape(len(products), -1)
+            # the remaining axes are the Z qubits, from the highest one
+            signs = 1 - 2 * parity(np.arange(2 ** len(z_qubits)))
+            values[:, term] = (
+                (sums @ signs) * observable.phases[term]
+            ).real
+    if values is None:
+        raise ValueError("Observable has no terms!")
+    return values
+
+
+def sampled_expectation(
+    basis_probabilities: Callable[[Dict[int, str]], np.ndarray],
+    observable: Observable,
+    n_shots: int,
+    random_state: RandomState
+) -> np.ndarray:
+    """Estimates the expectation value of an observable from ``n_shots``
+    samples per qubit-wise commuting group of terms, drawn by a
+    ``ShotSampler``.
+
+    Parameters
+    ----------
+    basis_probabilities : Callable[[Dict[int, str]], np.ndarray]
+        Returns the ``(K, 2**n)`` probabilities of the basis states after
+        rotating each qubit from the given Pauli basis onto the Z basis,
+        e.g. with ``BASIS_ROTATIONS``.
+    observable : Observable
+        The observable.
+    n_shots : int
+        Number of samples per group.
+    random_state : RandomState
+        Random number generator of the samples.
+
+    Returns
+    -------
+    np.ndarray
+        ``(K, n_terms)`` estimated expectation value of every term.
+    """
+    values = None
+    supports = observable.x_masks | observable.z_masks
+    for group in observable.groups():
+        probabilities = basis_probabilities(group.bases)
+        if values is None:
+            values = np.zeros((len(probabilities), len(observable)))
+        samples = sample_batch(probabilities, n_shots, random_state)
+        signs = 1 - 2 * parity(
+            samples[:, np.newaxis, :] & supports[group.terms, np.newaxis]
+        )
+        values[:, group.terms] = signs.mean(axis=-1)
+    return values
+
+
+def statevector_pair_products(states: np.ndarray, x_mask: int) -> np.ndarray:
+    """``pair_products`` of a ``(K, 2**n)`` batch of statevectors."""
+    if x_mask == 0:
+        return np.abs(states) ** 2
+    n_qubits = states.shape[1].bit_length() - 1
+    # k -> k ^ x_mask reverses the axes of the qubits of the mask
+    flipped = np.flip(
+        states.reshape((len(states),) + (2,) * n_qubits),
+        [n_qubits - q for q in range(n_qubits) if (x_mask >> q) & 1]
+    ).reshape(states.shape)
+    return states * np.conj(flipped)
+
+
+def statevector_basis_probabilities(
+    states: np.ndarray,
+    bases: Dict[int, str],
+    n_qubits: int
+) -> np.ndarray:
+    """``basis_probabilities`` of a ``(K, 2**n)`` batch of statevectors."""
+    rotated = [(BASIS_ROTATIONS[basis], qubit)
+               for qubit, basis in bases.items() if basis != "Z"]
+    if rotated:
+        matrices, qubits = zip(*rotated)
+        states = apply_single_qubit_layer(states, matrices, qubits, n_qubits)
+    return np.abs(states) ** 2
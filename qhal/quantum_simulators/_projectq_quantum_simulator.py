@@ -1,4 +1,5 @@
 import atexit
+from typing import List
 
 import numpy as np
 from numpy import uint64
@@ -12,7 +13,16 @@ from projectq.ops import (All, C, CNOT, DaggeredGate, H, Measure, R,
 from projectq.ops._basics import BasicGate, BasicRotationGate
 
 from . import IQuantumSimulator
-from ..hal import command_unpacker, string_to_opcode
+from ._observables import (Observable, exact_expectation,
+                           sampled_expectation,
+                           statevector_basis_probabilities,
+                           statevector_pair_products)
+from ._qubit_states import QubitStates
+from ._sampling import ShotSampler
+from ..hal import (command_unpacker, measurement_creator, string_to_opcode,
+                   Opcode)
+from ..hal._opcodes import CONTROL_FLOW_CODES
+from ..hal._utils import angle_from_binary_representation
 
 
 class SxGate(BasicGate):
@@ -99,13 +109,17 @@ class ProjectqQuantumSimulator(IQuantumSimulator):
         circuit errors.
     backend
         ProjectQ backend, could use CircuitDrawer for debugging purposes.
+    profiler : Profiler, optional
+        Records per-opcode and per-phase timings of the commands.
     """
 
     def __init__(self,
                  register_size: int = 16,
                  seed: int = None,
-                 backend=Simulator):
+                 backend=Simulator,
+                 profiler=None):
         self._engine = None
+        self.profiler = profiler
         self.backend = backend
         self.seed = seed
 
@@ -114,7 +128,7 @@ class ProjectqQuantumSimulator(IQuantumSimulator):
         self._random_state = RandomState(seed)
 
         self._qubit_register = None
-        self._measured_qubits = []
+        self._qubit_states = QubitStates(register_size)
         self._offset_registers = [0, 0]  # offsets for qubit indexes 0 and 1
 
         # defaulted to 16 because the bitcode status return
@@ -184,6 +198,78 @@ class ProjectqQuantumSimulator(IQuantumSimulator):
     def get_offset(self, qubit_index: int):
         return self._offset_registers[qubit_index]
 
+    def get_statevector(self, copy: bool = False) -> np.ndarray:
+        """Returns the amplitudes of the qubit register, see
+        ``IQuantumSimulator.get_statevector``.
+
+        The wavefunction is copied out of the ProjectQ simulator and
+        reordered by qubit index, so a new array is returned whatever
+        ``copy``.
+
+        Parameters
+        ----------
+        copy : bool, optional
+            Unused, the amplitudes are always copied.
+
+        Returns
+        -------
+        np.ndarray
+            ``(2**register_size,)`` array of amplitudes.
+        """
+        if self._qubit_register is None:
+            raise ValueError("Qubit register is not prepared!")
+        if not hasattr(self._engine.backend, "cheat"):
+            raise ValueError("Backend does not expose its wavefunction!")
+        self._engine.flush()
+        order, amplitudes = self._engine.backend.cheat()
+        amplitudes = np.asarray(amplitudes)
+        positions = [order[qubit.id] for qubit in self._qubit_register]
+        if positions == list(range(len(positions))) and \
+                len(amplitudes) == 2 ** len(positions):
+            return amplitudes
+        indexes = np.arange(2 ** len(positions), dtype=np.int64)
+        backend_indexes = np.zeros_like(indexes)
+        for qubit, position in enumerate(positions):
+            backend_indexes |= ((indexes >> qubit) & 1) << position
+        return amplitudes[backend_indexes]
+
+    def expectation(self, observable: Observable, n_shots: int = None) -> float:
+        """Evaluates the expectation value of an observable on the current
+        state, without measuring it.
+
+        Parameters
+        ----------
+        observable : Observable
+            Weighted sum of Pauli strings over absolute qubit indexes.
+        n_shots : int, optional
+            Number of samples per qubit-wise commuting group of terms. If
+            None, the expectation value is exact.
+
+        Returns
+        -------
+        float
+            The exact or estimated expectation value.
+        """
+        if observable.n_qubits > self._qubit_register_size:
+            raise ValueError(
+                f"Observable acts on qubits beyond the register size "
+                f"({self._qubit_register_size})!"
+            )
+        states = self.get_statevector()[np.newaxis]
+        if n_shots is None:
+            values = exact_expectation(
+                lambda x_mask: statevector_pair_products(states, x_mask),
+                observable, self._qubit_register_size
+            )
+        else:
+            values = sampled_expectation(
+                lambda bases: statevector_basis_probabilities(
+                    states, bases, self._qubit_register_size
+                ),
+                observable, n_shots, self._random_state
+            )
+        return float(values[0] @ observable.coefficients)
+
     def apply_gate(self,
                    gate: BasicGate,
                    qubit_index_0: int,
@@ -203,6 +289,8 @@ class ProjectqQuantumSimulator(IQuantumSimulator):
             Angle of gate if parametrised.
         """
         if self._qubit_register is not None:
+            if self.profiler is not None:
+                self.profiler.lap("dispatch")
 
             if qubit_index_1 is None:  # single qubit gate
                 if parameter_0 is not None:
@@ -221,8 +309,12 @@ class ProjectqQuantumSimulator(IQuantumSimulator):
                         self._qubit_register[qubit_index_1],
                         self._qubit_register[qubit_index_0]
                     )
+            if self.profiler is not None:
+                self.profiler.lap("gate_construction")
 
             self._engine.flush()
+            if self.profiler is not None:
+                self.profiler.lap("engine_flush")
 
     def _init_engine(self):
         if self._engine is not None:
@@ -237,28 +329,101 @@ class ProjectqQuantumSimulator(IQuantumSimulator):
             self._qubit_register = self._engine.allocate_qureg(
                 self._qubit_register_size
             )
-            self._measured_qubits = []
+            self._qubit_states.allocate()
         else:
             raise ValueError("Qubit register has already been initialised!")
 
+    def _measure_all(self) -> np.ndarray:
+        """Measures every qubit that has not been measured yet in one step,
+        sampling the outcome from the final amplitudes and collapsing the
+        wavefunction onto it.
+
+        Returns
+        -------
+        np.ndarray
+            Array of measurement words, one per newly measured qubit, with
+            the qubit index relative to the PAGE_SET_QUBIT_0 offset in the
+            QUBIT INDEX field and that offset in the OFFSET field, as for
+            QUBIT_MEASURE.
+        """
+        if self._qubit_register is None:
+            raise ValueError("Qubit register is not prepared!")
+
+        qubits = self._qubit_states.unmeasured()
+        qureg = [self._qubit_register[q] for q in qubits]
+
+        if hasattr(self._engine.backend, "cheat"):
+            self._engine.flush()
+            order, amplitudes = self._engine.backend.cheat()
+            index = int(ShotSampler(
+                np.asarray(amplitudes), self._random_state
+            ).sample(1)[0])
+            values = [(index >> order[qubit.id]) & 1 for qubit in qureg]
+            self._engine.backend.collapse_wavefunction(qureg, values)
+        else:
+            All(Measure) | qureg
+            self._engine.flush()
+            values = [int(qubit) for qubit in qureg]
+
+        self._qubit_states.mark_all_measured()
+        self._qubit_states.release()
+        self._qubit_register = None
+
+        # relative index and offset as for QUBIT_MEASURE; qubits below the
+        # page of qubit 0 keep their absolute index
+        qubits = np.array(qubits, dtype=uint64)
+        offsets = np.where(
+            qubits >= self._offset_registers[0], self._offset_registers[0], 0
+        ).astype(uint64)
+        return measurement_creator(
+            qubits - offsets, offsets, 0, np.array(values, dtype=uint64)
+        )
+
     def accept_command(
         self,
         command: uint64
     ) -> uint64:
+        if self.profiler is None:
+            return self._accept_command(command)
 
-        op, cmd_type, args, qubit_indexes = command_unpacker(command)
-        op_obj = string_to_opcode(op)
+        self.profiler.begin()
+        try:
+            return self._accept_command(command)
+        finally:
+            self.profiler.end(command)
 
-        q_index_0 = qubit_indexes[0] + self.get_offset(0)
-        q_index_1 = 0
-        if len(qubit_indexes) > 1:
-            q_index_1 = qubit_indexes[1] + self.get_offset(1)
+    def _accept_command(
+        self,
+        command: uint64
+    ) -> uint64:
+
+        op, _, args, qubit_indexes = command_unpacker(command)
+        op_obj = string_to_opcode(op)
+        if self.profiler is not None:
+            self.profiler.lap("decode")
 
         for index in qubit_indexes:
             assert index <= self._qubit_register_size, \
                 f"Qubit index {index} greater than register size " + \
                 f"({self._qubit_register_size})!"
 
+        return self._execute(op_obj, args, qubit_indexes)
+
+    def _execute(
+        self,
+        op_obj: Opcode,
+        args: List[int],
+        qubit_indexes: List[int]
+    ) -> uint64:
+        """Performs the logic of a decoded command."""
+        op = op_obj.name
+        cmd_type = op_obj.cmd_type
+
+        q_index_0 = qubit_indexes[0] + self.get_offset(0)
+        q_index_1 = 0
+        if len(qubit_indexes) > 1:
+            q_index_1 = qubit_indexes[1] + self.get_offset(1)
+
         if op == "START_SESSION":
             self._init_engine()
 
@@ -268,10 +433,10 @@ class ProjectqQuantumSimulator(IQuantumSimulator):
         elif op == "STATE_PREPARATION":
             if self._qubit_register is None:
                 self._init_qureg()
-            elif q_index_0 in self._measured_qubits:
+            elif self._qubit_states.is_measured(q_index_0):
                 if int(self._qubit_register[q_index_0]):
                     X | self._qubit_register[q_index_0]
-                self._measured_qubits.remove(q_index_0)
+                self._qubit_states.mark_prepared(q_index_0)
             else:
                 raise ValueError("Qubit already prepared!")
 
@@ -280,17 +445,22 @@ class ProjectqQuantumSimulator(IQuantumSimulator):
 
         elif op == "QUBIT_MEASURE":
 
-            if q_index_0 in self._measured_qubits:
+            if self._qubit_states.is_measured(q_index_0):
                 raise ValueError("Qubit already measured!")
+            if self.profiler is not None:
+                self.profiler.lap("dispatch")
 
             # This measures a single qubit at the time.
             Measure | self._qubit_register[q_index_0]
             self._engine.flush()
 
             measurement = int(self._qubit_register[q_index_0])
-            self._measured_qubits.append(q_index_0)
+            if self.profiler is not None:
+                self.profiler.lap("measurement")
+            self._qubit_states.mark_measured(q_index_0)
 
-            if len(self._qubit_register) == len(self._measured_qubits):
+            if self._qubit_states.all_measured:
+                self._qubit_states.release()
                 self._qubit_register = None
 
             # QUBIT INDEX [63-52] | OFFSET [51-12] | STATUS [11-7] | PADDING [6-1] | VALUE [0]
@@ -301,17 +471,28 @@ class ProjectqQuantumSimulator(IQuantumSimulator):
                 | measurement
             )
 
+        elif op == "QUBIT_MEASURE_ALL":
+            if self.profiler is not None:
+                self.profiler.lap("dispatch")
+            measurements = self._measure_all()
+            if self.profiler is not None:
+                self.profiler.lap("measurement")
+            return measurements
+
         elif op.split("_")[0] == "PAGE":
             self._offset_registers[int(op.split("_")[3])] = qubit_indexes[0]
 
         elif op == "ID":
             pass
 
+        elif op_obj.code in CONTROL_FLOW_CODES:
+            raise ValueError(f"{op} must be sent in a buffer with its block!")
+
         elif op_obj.param == "PARAM":
-            if q_index_0 in self._measured_qubits:
+            if self._qubit_states.is_measured(q_index_0):
                 raise ValueError("Qubit requires re-preparation!")
 
-            angle = args[-1] * (2 * np.pi) / 65536
+            angle = angle_from_binary_representation(args[-1])
             gate = self._parameterised_gate_dict[op]
             if cmd_type == "SINGLE":
                 self.apply_gate(gate, q_index_0, parameter_0=angle)
@@ -324,7 +505,7 @@ class ProjectqQuantumSimulator(IQuantumSimulator):
                 )
 
         elif op_obj.param == "CONST":
-            if q_index_0 in self._measured_qubits:
+            if self._qubit_states.is_measured(q_index_0):
                 raise ValueError("Qubit requires re-preparation!")
 
             gate = self._constant_gate_dict[op]
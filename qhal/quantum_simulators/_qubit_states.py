@@ -0,0 +1,128 @@
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from ..hal import _opcodes as ops
+from ..hal._commands import command_array_unpacker, resolve_qubit_indexes
+
+
+class QubitStates:
+    """Lifecycle (allocated, prepared, measured) of the qubits of a register,
+    held as integer bitsets where bit ``q`` stands for qubit ``q``.
+
+    A qubit is prepared when it is allocated and not measured. Releasing the
+    register keeps the measured bits, so that gates on measured qubits keep
+    failing until they are prepared again.
+
+    Parameters
+    ----------
+    size : int
+        Number of qubits of the register.
+    """
+
+    __slots__ = ("size", "allocated", "measured", "_full")
+
+    def __init__(self, size: int):
+        self.size = size
+        self._full = (1 << size) - 1
+        self.allocated = 0
+        self.measured = 0
+
+    def allocate(self):
+        """Allocates every qubit in the prepared state."""
+        self.allocated = self._full
+        self.measured = 0
+
+    def release(self):
+        self.allocated = 0
+
+    def is_measured(self, qubit: int) -> bool:
+        return bool((self.measured >> qubit) & 1)
+
+    def mark_measured(self, qubit: int):
+        self.measured |= 1 << qubit
+
+    def mark_all_measured(self):
+        self.measured = self._full
+
+    def mark_prepared(self, qubit: int):
+        self.measured &= ~(1 << qubit)
+
+    @property
+    def all_measured(self) -> bool:
+        return self.measured == self._full
+
+    def unmeasured(self) -> List[int]:
+        """Returns the indexes of the qubits not measured yet."""
+        return np.flatnonzero(~self.to_arrays()["measured"]).tolist()
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """Returns the lifecycle as ``(size,)`` boolean arrays."""
+        def unpack(bitset: int) -> np.ndarray:
+            packed = np.frombuffer(
+                bitset.to_bytes((self.size + 7) // 8, "little"), dtype=np.uint8
+            )
+            return np.unpackbits(
+                packed, count=self.size, bitorder="little"
+            ).astype(bool)
+
+        allocated = unpack(self.allocated)
+        measured = unpack(self.measured)
+        return {
+            "allocated": allocated,
+            "prepared": allocated & ~measured,
+            "measured": measured,
+        }
+
+
+def validate_command_buffer(
+    commands: np.ndarray,
+    register_size: int,
+    offsets: Sequence[int] = (0, 0)
+) -> Tuple[np.ndarray, ...]:
+    """Checks a whole buffer of commands in one vectorised pass before it is
+    executed: every opcode must exist and every absolute qubit index must fit
+    the register.
+
+    Parameters
+    ----------
+    commands : np.ndarray
+        Array of 64-bit HAL commands.
+    register_size : int
+        Size of the qubit register.
+    offsets : Sequence[int], optional
+        Base indexes of qubit 0 and 1 before the first command.
+
+    Returns
+    -------
+    Tuple[np.ndarray, ...]
+        The ``command_array_unpacker`` fields of the buffer.
+
+    Raises
+    ------
+    ValueError
+        If a command is invalid, reporting the index of the first one.
+    """
+    fields = command_array_unpacker(commands)
+    opcodes = fields[0]
+
+    known = np.isin(opcodes, ops.KNOWN_CODES)
+    if not known.all():
+        index = int(np.argmin(known))
+        raise ValueError(
+            f"Command {index}: opcode {opcodes[index]} not found!"
+        )
+
+    dual = np.isin(opcodes, ops.DUAL_GATE_CODES)
+    single = np.isin(opcodes, ops.SINGLE_GATE_CODES) | \
+        np.isin(opcodes, [ops.STATE_PREPARATION, ops.QUBIT_MEASURE])
+    absolute_0, absolute_1 = resolve_qubit_indexes(commands, offsets)
+    out_of_range = ((single | dual) & (absolute_0 >= register_size)) | \
+        (dual & (absolute_1 >= register_size))
+    if out_of_range.any():
+        index = int(np.argmax(out_of_range))
+        raise ValueError(
+            f"Command {index}: qubit index greater than register size "
+            f"({register_size})!"
+        )
+    return fields
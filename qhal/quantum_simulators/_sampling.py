@@ -0,0 +1,162 @@
+from typing import Iterator, Union
+
+import numpy as np
+from numpy import uint64
+from numpy.random import RandomState
+
+from ..hal import measurement_creator
+
+#: outputs of ``ShotSampler``
+SHOT_OUTPUTS = ("indexes", "packed", "words")
+
+
+class ShotSampler:
+    """Draws shots from the computational basis distribution of a state.
+
+    Each chunk of shots is drawn as multinomial counts of the basis states,
+    expanded with ``np.repeat`` and shuffled into independent shots: the
+    time is linear in the number of basis states plus the number of shots,
+    without a binary search of the cumulative probabilities per shot. At
+    most ``chunk_size`` shots are drawn at once, so the memory used by
+    ``chunks`` and ``counts`` does not grow with the number of shots.
+    QUBIT_MEASURE_ALL in every simulator, ``sweep_program`` and
+    ``sampled_expectation`` draw their samples through it.
+
+    Parameters
+    ----------
+    distribution : np.ndarray
+        ``(2**n,)`` probabilities, or complex amplitudes, where qubit ``q``
+        is bit ``q`` of the index, e.g. from ``get_probabilities`` or
+        ``get_statevector``. They are normalised by the sampler.
+    seed : Union[int, RandomState], optional
+        Random number generator seed, or a generator shared with other
+        components, e.g. the one of a simulator.
+    chunk_size : int, optional
+        Largest number of shots drawn at once.
+    """
+
+    def __init__(
+        self,
+        distribution: np.ndarray,
+        seed: Union[int, RandomState] = None,
+        chunk_size: int = 1 << 20
+    ):
+        distribution = np.asarray(distribution)
+        size = len(distribution) if distribution.ndim == 1 else 0
+        if size == 0 or size & (size - 1):
+            raise ValueError("Expected a vector of 2**n probabilities!")
+        probabilities = np.abs(distribution) ** 2 \
+            if np.iscomplexobj(distribution) else distribution.astype(float)
+        total = np.sum(probabilities)
+        if np.any(probabilities < 0) or not np.isfinite(total) or total <= 0:
+            raise ValueError("Probabilities must be non-negative and finite!")
+        self.probabilities = probabilities / total
+        self.n_qubits = size.bit_length() - 1
+        self.chunk_size = chunk_size
+        self._random_state = seed if isinstance(seed, RandomState) \
+            else RandomState(seed)
+        self._indexes = np.arange(size, dtype=np.int64)
+
+    def counts(self, n_shots: int) -> np.ndarray:
+        """Returns the ``(2**n,)`` number of shots in each basis state."""
+        return self._random_state.multinomial(n_shots, self.probabilities)
+
+    def chunks(
+        self,
+        n_shots: int,
+        output: str = "indexes"
+    ) -> Iterator[np.ndarray]:
+        """Draws shots in chunks of at most ``chunk_size``.
+
+        Parameters
+        ----------
+        n_shots : int
+            Number of shots.
+        output : str, optional
+            One of ``SHOT_OUTPUTS``, see ``sample``.
+
+        Yields
+        ------
+        np.ndarray
+            The next shots, in the ``output`` format.
+        """
+        if output not in SHOT_OUTPUTS:
+            raise ValueError(f"Output {output} not in {SHOT_OUTPUTS}!")
+        remaining = n_shots
+        while remaining > 0:
+            size = min(remaining, self.chunk_size)
+            indexes = np.repeat(self._indexes, self.counts(size))
+            self._random_state.shuffle(indexes)
+            yield self._format(indexes, output)
+            remaining -= size
+
+    def sample(self, n_shots: int, output: str = "indexes") -> np.ndarray:
+        """Draws shots.
+
+        Parameters
+        ----------
+        n_shots : int
+            Number of shots.
+        output : str, optional
+            One of ``SHOT_OUTPUTS``:
+
+            - ``"indexes"``: ``(n_shots,)`` basis states, i.e. bitstrings
+              packed into integers where bit ``q`` is the outcome of qubit
+              ``q``, the default.
+            - ``"packed"``: ``(n_shots, ceil(n / 8))`` bytes of the
+              bitstrings, little-endian.
+            - ``"words"``: ``(n_shots, n)`` measurement words in the
+              ``measurement_creator`` format, as returned by QUBIT_MEASURE_ALL.
+
+        Returns
+        -------
+        np.ndarray
+            The shots.
+        """
+        chunks = list(self.chunks(n_shots, output))
+        if not chunks:
+            return self._format(self._indexes[:0], output)
+        return np.concatenate(chunks)
+
+    def _format(self, indexes: np.ndarray, output: str) -> np.ndarray:
+        if output == "indexes":
+            return indexes
+        if output == "packed":
+            # the low bytes of the little-endian indexes
+            n_bytes = max(1, (self.n_qubits + 7) // 8)
+            return np.ascontiguousarray(
+                indexes.astype("<u8").view(np.uint8).reshape(-1, 8)[
+                    :, :n_bytes
+                ]
+            )
+        qubits = np.arange(self.n_qubits, dtype=uint64)
+        values = (indexes[:, np.newaxis].astype(uint64) >> qubits) & uint64(1)
+        return measurement_creator(qubits, 0, 0, values)
+
+
+def sample_batch(
+    distributions: np.ndarray,
+    n_shots: int,
+    random_state: RandomState
+) -> np.ndarray:
+    """Draws basis states from each distribution of a batch, with
+    ``ShotSampler`` instances sharing a random number generator.
+
+    Parameters
+    ----------
+    distributions : np.ndarray
+        ``(K, 2**n)`` probabilities or complex amplitudes.
+    n_shots : int
+        Number of shots per distribution.
+    random_state : RandomState
+        Random number generator of the shots.
+
+    Returns
+    -------
+    np.ndarray
+        ``(K, n_shots)`` basis state indexes.
+    """
+    return np.array([
+        ShotSampler(distribution, random_state).sample(n_shots)
+        for distribution in distributions
+    ], dtype=np.int64).reshape(len(distributions), n_shots)
@@ -0,0 +1,230 @@
+from typing import Iterator, List, Tuple
+
+import numpy as np
+from numpy.random import RandomState
+
+from ._numpy_gates import (CONSTANT_GATE_MATRICES,
+                           PARAMETERISED_GATE_BUILDERS, apply_batched_matrix,
+                           binary_gate_matrices, expand_matrix, gate_matrix)
+from ._sampling import sample_batch
+from ..hal import ProgramTemplate
+from ..hal._commands import (_OPCODES_BY_CODE, command_array_unpacker,
+                             resolve_qubit_indexes)
+from ..hal._utils import angle_from_binary_representation
+
+#: commands without effect on the swept statevectors
+_IGNORED = ("NOP", "ID", "START_SESSION", "END_SESSION", "PAGE_SET_QUBIT_0",
+            "PAGE_SET_QUBIT_1", "STATE_PREPARATION_ALL")
+_MEASUREMENTS = ("QUBIT_MEASURE", "QUBIT_MEASURE_ALL")
+
+#: bytes of the statevectors evolved together: larger batches are split
+#: into chunks that stay in the processor caches between gates
+_CHUNK_BYTES = 2 ** 22
+
+#: number of consecutive qubits whose gates are multiplied together and
+#: applied in one pass over the statevectors
+_BLOCK_SIZE = 4
+
+#: outputs of ``sweep_program``
+OUTPUTS = ("amplitudes", "probabilities", "samples")
+
+
+def _compile(template: ProgramTemplate) -> List[Tuple]:
+    """Returns the gates of a template as ``(matrix, op, word, qubits)``
+    steps, where ``matrix`` is None for the swept gates, whose matrices are
+    built from the argument of ``template.words[word]``."""
+    commands = template.program.commands
+    opcodes, args_0, args_1, _, _ = command_array_unpacker(commands)
+    qubits_0, qubits_1 = resolve_qubit_indexes(commands)
+    words = {index: word for word, index in enumerate(template.words.tolist())}
+
+    steps = []
+    measured = None
+    for index, code in enumerate(opcodes.tolist()):
+        opcode = _OPCODES_BY_CODE.get(code)
+        name = getattr(opcode, "name", code)
+        if name in _IGNORED:
+            continue
+        if name in _MEASUREMENTS:
+            measured = index
+            continue
+        if name not in CONSTANT_GATE_MATRICES and \
+                name not in PARAMETERISED_GATE_BUILDERS:
+            raise ValueError(
+                f"Command {index}: {name} is not supported in a sweep!"
+            )
+        if measured is not None:
+            raise ValueError(
+                f"Command {index}: gate after the measurement of command "
+                f"{measured}!"
+            )
+
+        if opcode.cmd_type == "DUAL":
+            qubits = (int(qubits_1[index]), int(qubits_0[index]))
+            arg = int(args_1[index])
+        else:
+            qubits = (int(qubits_0[index]),)
+            arg = int(args_0[index])
+        if index in words:
+            steps.append((None, name, words[index], qubits))
+        else:
+            angle = angle_from_binary_representation(arg) \
+                if opcode.param == "PARAM" else None
+            steps.append((gate_matrix(name, angle), name, None, qubits))
+    return steps
+
+
+def sweep_program(
+    template: ProgramTemplate,
+    values: np.ndarray,
+    register_size: int,
+    output: str = "amplitudes",
+    n_shots: int = 1,
+    seed: int = None,
+    binary: bool = False
+) -> np.ndarray:
+    """Simulates a parametrised program for a batch of parameter values at
+    once, without noise.
+
+    The ``B`` statevectors are evolved together as a ``(B, 2**n)`` array
+    with ``apply_batched_matrix``: a fixed gate shares its matrix between
+    the parameter points, while the ``B`` matrices of a swept gate are
+    built from ``angle_table`` lookups. The gates within each block of
+    ``_BLOCK_SIZE`` qubits are multiplied together before being applied,
+    and large batches are evolved by chunks of ``_CHUNK_BYTES``.
+    Measurement commands must follow every gate: the output is taken from
+    the final statevectors.
+
+    Parameters
+    ----------
+    template : ProgramTemplate
+        The program and its parameters, a ``HALProgram`` or an array of
+        commands is wrapped into a template sweeping every parametrised
+        gate.
+    values : np.ndarray
+        ``(B, n_parameters)`` values of the parameters.
+    register_size : int
+        Size of the qubit register.
+    output : str, optional
+        One of ``OUTPUTS``: the ``(B, 2**n)`` amplitudes (default) or
+        probabilities, or ``(B, n_shots)`` sampled basis states, where
+        bit ``q`` is the outcome of qubit ``q``.
+    n_shots : int, optional
+        Number of samples per parameter point.
+    seed : int, optional
+        Random number generator seed for the samples.
+    binary : bool, optional
+        Whether the values are 16-bit representations rather than angles in
+        radians, False by default.
+
+    Returns
+    -------
+    np.ndarray
+        The amplitudes, probabilities or samples of every parameter point.
+    """
+    if output not in OUTPUTS:
+        raise ValueError(f"Output {output} not in {OUTPUTS}!")
+    if not isinstance(template, ProgramTemplate):
+        template = ProgramTemplate(template)
+    values = np.asarray(values)
+    if values.ndim != 2 or values.shape[1] != template.n_parameters:
+        raise ValueError(
+            f"Expected (B, {template.n_parameters}) parameter values, got "
+            f"{values.shape}!"
+        )
+    arguments = template._arguments(values, binary)
+    steps = _compile(template)
+    for _, _, _, qubits in steps:
+        if max(qubits) >= register_size:
+            raise ValueError(
+                f"Qubit index greater than register size ({register_size})!"
+            )
+
+    # the points are evolved by chunks whose statevectors fit in the caches
+    chunk = max(1, _CHUNK_BYTES // (16 * 2 ** register_size))
+    random_state = RandomState(seed)
+    return np.concatenate([
+        _output(
+            _evolve(steps, arguments[start:start + chunk], register_size),
+            output, n_shots, random_state
+        )
+        for start in range(0, max(len(values), 1), chunk)
+    ])
+
+
+def _fused(
+    steps: List[Tuple],
+    arguments: np.ndarray,
+    register_size: int
+) -> Iterator[Tuple[np.ndarray, Tuple[int, ...]]]:
+    """Yields the ``(matrices, qubits)`` to apply for the steps, where the
+    gates within each block of ``_BLOCK_SIZE`` consecutive qubits are
+    multiplied together.
+
+    The gates of a block commute with those of the other blocks: they are
+    held until a gate acts across blocks, or until the end of the program.
+    """
+    pending = {}
+    for matrix, op, word, qubits in steps:
+        if matrix is None:
+            matrix = binary_gate_matrices(op, arguments[:, word])
+        blocks = {qubit // _BLOCK_SIZE for qubit in qubits}
+        if len(blocks) == 1:
+            pending.setdefault(blocks.pop(), []).append((matrix, qubits))
+            continue
+        for block in sorted(blocks & pending.keys()):
+            yield _product(pending.pop(block))
+        yield matrix, qubits
+    for block in sorted(pending):
+        yield _product(pending[block])
+
+
+def _product(
+    gates: List[Tuple[np.ndarray, Tuple[int, ...]]]
+) -> Tuple[np.ndarray, Tuple[int, ...]]:
+    """Returns the product of gates as a matrix on the consecutive qubits
+    between their lowest and highest ones."""
+    if len(gates) == 1:
+        return gates[0]
+    targets = {qubit for _, qubits in gates for qubit in qubits}
+    low, high = min(targets), max(targets)
+    product = np.eye(2 ** (high - low + 1), dtype=complex)
+    for matrix, qubits in gates:
+        product = expand_matrix(
+            matrix, [qubit - low for qubit in qubits], high - low + 1
+        ) @ product
+    return product, tuple(range(high, low - 1, -1))
+
+
+def _evolve(
+    steps: List[Tuple],
+    arguments: np.ndarray,
+    register_size: int
+) -> np.ndarray:
+    """Returns the final statevectors of the parameter points with the
+    given gate arguments."""
+    states = np.zeros((len(arguments), 2 ** register_size), dtype=complex)
+    states[:, 0] = 1
+    # the gates write to the spare buffer, which then holds the statevectors
+    spare = np.empty_like(states)
+    for matrices, qubits in _fused(steps, arguments, register_size):
+        states, spare = apply_batched_matrix(
+            states, matrices, qubits, register_size, spare
+        ), states
+    return states
+
+
+def _output(
+    states: np.ndarray,
+    output: str,
+    n_shots: int,
+    random_state: RandomState
+) -> np.ndarray:
+    """Returns the amplitudes, probabilities or samples of statevectors."""
+    if output == "amplitudes":
+        return states
+    probabilities = np.abs(states) ** 2
+    if output == "probabilities":
+        return probabilities
+
+    return sample_batch(probabilities, n_shots, random_state)
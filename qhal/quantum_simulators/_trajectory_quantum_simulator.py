@@ -0,0 +1,213 @@
+import numpy as np
+from numpy import uint64
+
+from ._numpy_gates import (apply_batched_matrix, apply_matrix, apply_pauli,
+                           apply_single_qubit_layer, gate_matrix, qubit_view)
+from ._numpy_quantum_simulator import NumpyQuantumSimulator
+from ._observables import (Observable, statevector_basis_probabilities,
+                           statevector_pair_products)
+from ._sampling import sample_batch
+
+
+class TrajectoryQuantumSimulator(NumpyQuantumSimulator):
+    """NumPy implementation of the IQuantumSimulator interface that evolves
+    ``n_trajectories`` noisy statevectors together as one
+    ``(n_trajectories, 2**register_size)`` array.
+
+    Every gate is applied to all the trajectories with a single tensor
+    contraction, while the Pauli errors drawn from the noise model are
+    inserted with masked updates on the trajectories that suffer them.
+    QUBIT_MEASURE returns an ``(n_trajectories,)`` array of measurement
+    words in the ``measurement_creator`` format, one per shot. The
+    trajectories are updated in place, so the views returned by
+    ``get_statevector`` and ``get_statevectors`` follow the later commands
+    until the register is released.
+
+    Parameters
+    ----------
+    register_size : int
+        Size of the qubit register.
+    n_trajectories : int
+        Number of trajectories (shots) simulated together.
+    seed : int
+        Random number generator seed for both measurements and errors.
+    hal_metadata : HALMetadata, optional
+        Metadata whose native gate error rates define the Pauli noise model.
+        If None, the simulation is noiseless.
+    """
+
+    def __init__(self,
+                 register_size: int = 16,
+                 n_trajectories: int = 1,
+                 seed: int = None,
+                 hal_metadata=None):
+        super().__init__(register_size, seed, hal_metadata)
+        self._n_trajectories = n_trajectories
+        self._states = None
+
+    @property
+    def n_trajectories(self) -> int:
+        return self._n_trajectories
+
+    @property
+    def is_allocated(self) -> bool:
+        return self._states is not None
+
+    def _init_qureg(self):
+        self._states = np.zeros(
+            (self._n_trajectories, 2 ** self._qubit_register_size),
+            dtype=complex
+        )
+        self._states[:, 0] = 1
+
+    def _release_qureg(self):
+        self._states = None
+
+    def _prob_one(self, qubit: int) -> np.ndarray:
+        view = qubit_view(self._states, qubit, self._qubit_register_size)
+        return np.sum(np.abs(view[:, :, 1, :]) ** 2, axis=(1, 2))
+
+    def _reset_qubit(self, qubit: int):
+        # each trajectory holds a collapsed qubit: flip the ones in 1
+        apply_pauli(
+            self._states, "X", qubit, self._qubit_register_size,
+            self._prob_one(qubit) > 0.5
+        )
+
+    def _apply_errors(self, op: str, qubits: tuple):
+        """Inserts depolarising errors after a gate, one independent draw per
+        trajectory and qubit."""
+        error_rate = self._noise_model.error_rate(op, qubits)
+        if error_rate == 0:
+            return
+        for qubit in qubits:
+            draws = self._random_state.rand(self._n_trajectories)
+            for i, pauli in enumerate("XYZ"):
+                mask = (draws >= i * error_rate / 3) & \
+                    (draws < (i + 1) * error_rate / 3)
+                apply_pauli(
+                    self._states, pauli, qubit,
+                    self._qubit_register_size, mask
+                )
+
+    def apply_gate(self, op: str, qubits: tuple, angle: float = None):
+        self._states[...] = apply_batched_matrix(
+            self._states,
+            gate_matrix(op, angle),
+            qubits,
+            self._qubit_register_size
+        )
+        self._apply_errors(op, qubits)
+
+    def apply_unitary(self, matrix: np.ndarray, qubits: tuple):
+        self._states[...] = apply_matrix(
+            self._states, matrix, qubits, self._qubit_register_size
+        )
+
+    def apply_gates(self, ops: list, qubits: list, angles: list):
+        """Applies a layer of single qubit gates with
+        ``apply_single_qubit_layer``, then their errors. Errors are only
+        deferred to the end of the layer when every gate acts on its own
+        qubit, where they commute with the other gates."""
+        if len(set(qubits)) < len(qubits) and \
+                not self._noise_model.is_noiseless:
+            super().apply_gates(ops, qubits, angles)
+            return
+        self._states[...] = apply_single_qubit_layer(
+            self._states,
+            [gate_matrix(op, angle) for op, angle in zip(ops, angles)],
+            qubits,
+            self._qubit_register_size
+        )
+        if not self._noise_model.is_noiseless:
+            for op, qubit in zip(ops, qubits):
+                self._apply_errors(op, (qubit,))
+
+    def _pair_products(self, x_mask: int) -> np.ndarray:
+        return statevector_pair_products(self._states, x_mask)
+
+    def _basis_probabilities(self, bases: dict) -> np.ndarray:
+        return statevector_basis_probabilities(
+            self._states, bases, self._qubit_register_size
+        )
+
+    def trajectory_expectations(
+        self,
+        observable: Observable,
+        n_shots: int = None
+    ) -> np.ndarray:
+        """Evaluates the expectation value of an observable on each
+        trajectory, without measuring them.
+
+        Parameters
+        ----------
+        observable : Observable
+            Weighted sum of Pauli strings over absolute qubit indexes.
+        n_shots : int, optional
+            Number of samples per qubit-wise commuting group of terms, and
+            per trajectory. If None, the expectation values are exact.
+
+        Returns
+        -------
+        np.ndarray
+            ``(n_trajectories,)`` expectation values, whose mean is returned
+            by ``expectation``.
+        """
+        return self._expectations(observable, n_shots)
+
+    def get_statevector(self, copy: bool = False) -> np.ndarray:
+        """Returns the amplitudes of the first trajectory, see
+        ``IQuantumSimulator.get_statevector``.
+
+        Returns
+        -------
+        np.ndarray
+            ``(2**register_size,)`` array of amplitudes.
+        """
+        return self.get_statevectors(copy)[0]
+
+    def get_statevectors(self, copy: bool = False) -> np.ndarray:
+        """Returns the amplitudes of every trajectory, a read-only view
+        unless ``copy`` is True, see ``IQuantumSimulator.get_statevector``.
+
+        Parameters
+        ----------
+        copy : bool, optional
+            Whether to return a writeable copy of the amplitudes rather than
+            a view of them, False by default.
+
+        Returns
+        -------
+        np.ndarray
+            ``(n_trajectories, 2**register_size)`` array of amplitudes.
+        """
+        if not self.is_allocated:
+            raise ValueError("Qubit register is not prepared!")
+        if copy:
+            return self._states.copy()
+        view = self._states.view()
+        view.flags.writeable = False
+        return view
+
+    def _measure(self, qubit: int) -> np.ndarray:
+        prob_one = self._prob_one(qubit)
+        outcomes = self._random_state.rand(self._n_trajectories) < prob_one
+
+        view = qubit_view(self._states, qubit, self._qubit_register_size)
+        view[outcomes, :, 0, :] = 0
+        view[~outcomes, :, 1, :] = 0
+        norms = np.sqrt(np.where(outcomes, prob_one, 1 - prob_one))
+        self._states /= norms[:, np.newaxis]
+        return outcomes.astype(uint64)
+
+    def _measure_all(self, qubits: list) -> np.ndarray:
+        """Samples one basis state per trajectory from its final amplitudes.
+
+        Returns
+        -------
+        np.ndarray
+            ``(n_trajectories, len(qubits))`` array of outcomes.
+        """
+        indexes = sample_batch(self._states, 1, self._random_state)[:, 0]
+        return (indexes[:, np.newaxis].astype(uint64) >>
+                np.array(qubits, dtype=uint64)) & uint64(1)
@@ -0,0 +1,56 @@
+import unittest
+
+from benchmarks.suite import compare, run
+
+
+class BenchmarkSuiteTest(unittest.TestCase):
+    """Tests for the benchmark suite run and comparison modes.
+    """
+
+    def test_run(self):
+        """A reduced run reports every workload."""
+
+        output = run(
+            words=100, device_sizes=[16], qubit_counts=[2], depth=2, shots=2,
+            layer_qubit_counts=[3], sweep_qubit_counts=[3]
+        )
+
+        self.assertEqual(
+            set(output["results"]),
+            {"encode[100]", "decode[100]", "metadata[16q]", "circuit[2q]",
+             "layers[3q]", "sweep[3q]"}
+        )
+        self.assertIn("shots_per_s", output["results"]["circuit[2q]"])
+        self.assertIn("shots_time_s", output["results"]["circuit[2q]"])
+        self.assertIn("commands_per_s", output["results"]["circuit[2q]"])
+        # tracemalloc cannot see the ProjectQ statevector
+        self.assertNotIn("peak_memory_mb", output["results"]["circuit[2q]"])
+        self.assertIn("speedup", output["results"]["layers[3q]"])
+        self.assertIn("speedup", output["results"]["sweep[3q]"])
+
+    def test_compare(self):
+        """Throughput drops and memory increases beyond the threshold are
+        flagged as regressions."""
+
+        baseline = {"results": {
+            "encode[10]": {
+                "time_s": 1.0, "commands_per_s": 100.0, "peak_memory_mb": 1.0
+            }
+        }}
+        current = {"results": {
+            "encode[10]": {
+                "time_s": 2.0, "commands_per_s": 95.0, "peak_memory_mb": 1.5
+            },
+            "decode[10]": {"commands_per_s": 1.0}
+        }}
+
+        regressions = compare(baseline, current, threshold=0.1)
+        self.assertEqual(len(regressions), 1)
+        self.assertIn("peak_memory_mb", regressions[0])
+
+        regressions = compare(baseline, current, threshold=0.01)
+        self.assertEqual(len(regressions), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+import unittest
+
+import numpy as np
+
+from qhal.hal import HALProgram, measurement_unpacker
+from qhal.quantum_simulators import (DensityMatrixQuantumSimulator,
+                                     ProjectqQuantumSimulator,
+                                     TrajectoryQuantumSimulator,
+                                     resolve_control_flow, run_program)
+
+
+def _loop_program(repeats: int) -> HALProgram:
+    program = HALProgram().start_session().prepare_all()
+    program.gate("H", 0).gate("FOR_START", 0, repeats)
+    program.gate("RX", 1, 1234).dual_gate("CNOT", 2, 0)
+    program.gate("T", 2).gate("FOR_END", 0)
+    return program
+
+
+class TestControlFlow(unittest.TestCase):
+    """Tests for the control flow interpreter.
+    """
+
+    def test_resolve_control_flow(self):
+
+        program = HALProgram().gate("FOR_START", 0, 2).gate("H", 0)
+        program.measure(0).gate("WHILE", 0, 1).gate("X", 0).measure(0)
+        program.gate("FOR_END", 0).gate("FOR_END", 0)
+
+        np.testing.assert_array_equal(
+            resolve_control_flow(program), [7, -1, -1, 6, -1, -1, 3, 0]
+        )
+
+        with self.assertRaisesRegex(ValueError, "closes no block"):
+            resolve_control_flow(HALProgram().gate("FOR_END", 0))
+        with self.assertRaisesRegex(ValueError, "not closed"):
+            resolve_control_flow(HALProgram().gate("IF", 0, 1))
+        with self.assertRaisesRegex(ValueError, "measures no qubit"):
+            resolve_control_flow(
+                HALProgram().gate("WHILE", 0, 1).gate("X", 0)
+                .gate("FOR_END", 0)
+            )
+
+    def test_fused_loop(self):
+        """A loop of gates is applied as one fused unitary, with the state of
+        the unrolled loop."""
+
+        unrolled = HALProgram().start_session().prepare_all().gate("H", 0)
+        for _ in range(5):
+            unrolled.gate("RX", 1, 1234).dual_gate("CNOT", 2, 0).gate("T", 2)
+
+        for simulator_class, state in (
+            (TrajectoryQuantumSimulator, lambda sim: sim.get_statevector()),
+            (DensityMatrixQuantumSimulator,
+             lambda sim: sim.get_density_matrix()),
+        ):
+            looped = simulator_class(register_size=3)
+            expected = simulator_class(register_size=3)
+            looped.accept_commands(_loop_program(5))
+            expected.accept_commands(unrolled)
+
+            np.testing.assert_allclose(
+                state(looped), state(expected), atol=1e-12
+            )
+            self.assertEqual(len(looped._fused_unitaries), 1)
+
+            # the cache keeps the most recently repeated bodies only
+            looped.MAX_FUSED_UNITARIES = 2
+            for angle in (1, 2, 3, 2):
+                looped.accept_repeated(
+                    HALProgram().gate("RX", 0, angle).commands, 2
+                )
+            self.assertEqual(len(looped._fused_unitaries), 2)
+            self.assertEqual(
+                [key[0] for key in looped._fused_unitaries],
+                [HALProgram().gate("RX", 0, angle).commands.tobytes()
+                 for angle in (3, 2)]
+            )
+
+        # ProjectQ performs the body every iteration
+        looped = ProjectqQuantumSimulator(register_size=3, seed=1)
+        expected = ProjectqQuantumSimulator(register_size=3, seed=1)
+        looped.accept_commands(_loop_program(5))
+        expected.accept_commands(unrolled)
+        np.testing.assert_allclose(
+            looped.get_statevector(), expected.get_statevector(), atol=1e-12
+        )
+        looped.cleanup()
+        expected.cleanup()
+
+    def test_branching(self):
+        """IF and WHILE branch on the latest measured value."""
+
+        # qubit 0 is measured in 1, then flipped to 0 by the IF block
+        program = HALProgram().start_session().prepare_all()
+        program.gate("X", 0).measure(0)
+        program.gate("IF", 0, 1).prepare(0).measure(0).gate("FOR_END", 0)
+        program.gate("IF", 0, 1).prepare(0).gate("X", 0).measure(0)
+        program.gate("FOR_END", 0)
+
+        for simulator in (TrajectoryQuantumSimulator(register_size=1),
+                          ProjectqQuantumSimulator(register_size=1)):
+            results = simulator.accept_commands(program)
+            values = [measurement_unpacker(int(np.ravel(result)[0]))[-1]
+                      for result in results]
+            self.assertEqual(values, [1, 0])
+
+        # repeat until success: H then measure until a 1 is read
+        program = HALProgram().start_session().prepare_all()
+        program.gate("H", 0).measure(0)
+        program.gate("WHILE", 0, 0).prepare(0).gate("H", 0).measure(0)
+        program.gate("FOR_END", 0)
+
+        results = run_program(
+            DensityMatrixQuantumSimulator(register_size=1, seed=7), program
+        )
+        values = [measurement_unpacker(result)[-1] for result in results]
+        self.assertEqual(values[-1], 1)
+        self.assertTrue(all(value == 0 for value in values[:-1]))
+
+    def test_control_flow_failures(self):
+
+        simulator = TrajectoryQuantumSimulator(register_size=1)
+        with self.assertRaisesRegex(ValueError, "no measurement"):
+            simulator.accept_commands(
+                HALProgram().start_session().prepare_all()
+                .gate("IF", 0, 1).gate("FOR_END", 0)
+            )
+
+        # trajectories disagree on the outcome of H
+        simulator = TrajectoryQuantumSimulator(
+            register_size=1, n_trajectories=64, seed=3
+        )
+        with self.assertRaisesRegex(ValueError, "differ between"):
+            simulator.accept_commands(
+                HALProgram().start_session().prepare_all().gate("H", 0)
+                .measure(0).gate("IF", 0, 1).gate("FOR_END", 0)
+            )
+
+        simulator = TrajectoryQuantumSimulator(register_size=1)
+        simulator.accept_commands(HALProgram().start_session())
+        with self.assertRaisesRegex(ValueError, "in a buffer"):
+            simulator.accept_command(HALProgram().gate("FOR_START", 0, 2)[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+import unittest
+
+import numpy as np
+
+from qhal.hal import command_creator, measurement_unpacker, HALMetadata
+from qhal.quantum_simulators import (DensityMatrixQuantumSimulator,
+                                     TrajectoryQuantumSimulator)
+
+
+class TestDensityMatrixQuantumSimulator(unittest.TestCase):
+    """Tests for the exact density matrix simulator.
+    """
+
+    metadata = HALMetadata(
+        num_qubits=2,
+        native_gates={
+            "H": (100, np.array([0.05, 0.1])),
+            "CNOT": (1000, np.array([[0, 0.02], [0.2, 0]]))
+        },
+        connectivity=np.array([[1, 1], [1, 1]])
+    )
+
+    circuit = [
+        ["START_SESSION", 0, 0],
+        ["STATE_PREPARATION_ALL", 0, 0],
+        ['H', 0, 0],
+        ['RY', 9000, 1],
+        ['CNOT', 0, 1, 0, 0],
+    ]
+
+    def test_noiseless_probabilities(self):
+        """Without noise the diagonal matches the squared amplitudes of the
+        statevector simulation."""
+
+        density_matrix = DensityMatrixQuantumSimulator(register_size=2, seed=1)
+        trajectories = TrajectoryQuantumSimulator(register_size=2, seed=1)
+
+        for commands in self.circuit:
+            density_matrix.accept_command(command_creator(*commands))
+            trajectories.accept_command(command_creator(*commands))
+
+        np.testing.assert_allclose(
+            density_matrix.get_probabilities(),
+            trajectories.get_probabilities(),
+            atol=1e-12
+        )
+        np.testing.assert_allclose(
+            density_matrix.get_probabilities([1]),
+            density_matrix.get_probabilities()[[0, 2]] +
+            density_matrix.get_probabilities()[[1, 3]],
+        )
+
+    def test_noisy_probabilities_match_trajectories(self):
+        """Kraus channels reproduce the trajectory averages."""
+
+        density_matrix = DensityMatrixQuantumSimulator(
+            register_size=2, seed=1, hal_metadata=self.metadata
+        )
+        trajectories = TrajectoryQuantumSimulator(
+            register_size=2, n_trajectories=20000, seed=1,
+            hal_metadata=self.metadata
+        )
+
+        for commands in self.circuit:
+            density_matrix.accept_command(command_creator(*commands))
+            trajectories.accept_command(command_creator(*commands))
+
+        np.testing.assert_allclose(
+            density_matrix.get_probabilities(),
+            np.mean(np.abs(trajectories._states) ** 2, axis=0),
+            atol=0.01
+        )
+
+        expected_prob_one = density_matrix.get_probabilities([0])[1]
+        result = density_matrix.accept_command(
+            command_creator("QUBIT_MEASURE", 0, 0)
+        )
+        self.assertEqual(measurement_unpacker(result)[0], 0)
+        self.assertAlmostEqual(
+            density_matrix.measurement_probabilities[0], expected_prob_one
+        )
+        # the post-measurement state is collapsed on the sampled value
+        self.assertAlmostEqual(
+            density_matrix.get_probabilities([0])[result & 1], 1
+        )
+
+    def test_reprepare(self):
+        """A measured qubit is re-prepared in |0> whatever its outcome."""
+
+        for seed in range(40):
+            density_matrix = DensityMatrixQuantumSimulator(
+                register_size=2, seed=seed
+            )
+            for commands in [["START_SESSION"], ["STATE_PREPARATION_ALL"],
+                             ["RY", 20000, 0], ["QUBIT_MEASURE", 0, 0],
+                             ["STATE_PREPARATION", 0, 0]]:
+                density_matrix.accept_command(command_creator(*commands))
+            self.assertAlmostEqual(
+                density_matrix.get_probabilities([0])[0], 1
+            )
+
+    def test_measure_unprepared(self):
+
+        density_matrix = DensityMatrixQuantumSimulator(register_size=2)
+        density_matrix.accept_command(command_creator("START_SESSION"))
+        with self.assertRaisesRegex(ValueError, "not prepared"):
+            density_matrix.accept_command(
+                command_creator("QUBIT_MEASURE", 0, 0)
+            )
+
+    def test_register_size_limit(self):
+
+        with self.assertRaises(ValueError):
+            DensityMatrixQuantumSimulator(register_size=13)
+
+
+if __name__ == "__main__":
+    unittest.main()
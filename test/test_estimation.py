@@ -0,0 +1,63 @@
+import unittest
+
+import numpy as np
+
+from qhal.compiler import estimate_program
+from qhal.hal import command_creator, HALMetadata
+
+
+class EstimationTest(unittest.TestCase):
+    """Tests for the depth and runtime estimates of HAL programs.
+    """
+
+    def test_critical_path(self):
+
+        hal_metadata = HALMetadata(
+            num_qubits=3,
+            max_depth=3,
+            native_gates={
+                "RX": (100, np.zeros(3)),
+                "RZ": (10, np.zeros(3)),
+                "CNOT": (1000, np.zeros((3, 3))),
+            },
+            connectivity=np.ones((3, 3))
+        )
+        commands = np.array([
+            command_creator(*command) for command in [
+                ["START_SESSION", 0, 0],
+                ["STATE_PREPARATION_ALL", 0, 0],
+                ['RX', 5, 0],
+                ['RZ', 1, 0],
+                ['RX', 1, 2],
+                ['CNOT', 0, 1, 0, 0],
+                ['RZ', 3, 2],
+                ["PAGE_SET_QUBIT_1", 0, 1],
+                ['CNOT', 0, 2, 0, 0],
+                ['H', 0, 0],
+                ['QUBIT_MEASURE', 0, 0],
+            ]
+        ], dtype=np.uint64)
+
+        estimate = estimate_program(commands, hal_metadata)
+
+        # RX, RZ on qubit 0 -> CNOT(0, 1) -> CNOT(1, 2)
+        self.assertEqual(estimate.depth, 4)
+        self.assertEqual(estimate.duration, 2110)
+        np.testing.assert_array_equal(estimate.busy_time, [1110, 2000, 1110])
+        self.assertEqual(
+            estimate.gate_counts, {"H": 1, "RX": 2, "RZ": 2, "CNOT": 2}
+        )
+        self.assertEqual(estimate.non_native_gates, ("H",))
+        self.assertTrue(estimate.exceeds_max_depth)
+
+    def test_out_of_range(self):
+
+        with self.assertRaises(ValueError):
+            estimate_program(
+                np.array([command_creator('H', 0, 3)], dtype=np.uint64),
+                HALMetadata(num_qubits=2, connectivity=np.ones((2, 2)))
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
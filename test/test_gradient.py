@@ -0,0 +1,83 @@
+import unittest
+
+import numpy as np
+
+from qhal.hal import HALProgram, ProgramTemplate
+from qhal.quantum_simulators import (Observable, TrajectoryQuantumSimulator,
+                                     parameter_shift_gradient)
+
+OBSERVABLE = Observable({"Z0": 1.0, "X1 X2": 0.5, "Y0 Z2": -0.75})
+
+
+def _program() -> HALProgram:
+    program = HALProgram().start_session().prepare_all()
+    program.gate("H", 0).gate("RY", 1, 0).gate("RX", 2, 0)
+    program.dual_gate("CNOT", 1, 0).dual_gate("RZZ", 2, 1, 0)
+    program.gate("RZ", 0, 0).dual_gate("RXX", 0, 2, 0).gate("T", 1)
+    return program.measure_all().end_session()
+
+
+def _expectation(commands) -> float:
+    simulator = TrajectoryQuantumSimulator(register_size=3)
+    simulator.accept_commands(commands[:-2])
+    return simulator.expectation(OBSERVABLE)
+
+
+class TestGradient(unittest.TestCase):
+    """Tests for the parameter-shift gradients.
+    """
+
+    def test_gradient(self):
+        """The gradient matches the shifted programs run one at a time."""
+
+        template = ProgramTemplate(_program())
+        values = np.random.RandomState(0).rand(template.n_parameters) * 6
+        result = parameter_shift_gradient(template, values, OBSERVABLE, 3)
+
+        shifted = [_expectation(commands)
+                   for commands in template.shifted_bindings(values)]
+        np.testing.assert_allclose(
+            result.gradient, (np.array(shifted[::2]) -
+                              np.array(shifted[1::2])) / 2,
+            atol=1e-12
+        )
+        self.assertAlmostEqual(result.value,
+                               _expectation(template.bind(values)))
+
+        # central finite differences, on the grid of 16-bit angles
+        step = 2 * np.pi / 2 ** 16 * 4
+        for parameter in range(template.n_parameters):
+            shift = np.eye(template.n_parameters)[parameter] * step
+            difference = _expectation(template.bind(values + shift)) - \
+                _expectation(template.bind(values - shift))
+            self.assertAlmostEqual(result.gradient[parameter],
+                                   difference / (2 * step), places=3)
+
+    def test_shared_parameters(self):
+
+        program = _program()
+        shared = ProgramTemplate(program, parameters=[0, 1, 0, 1, 0])
+        separate = ProgramTemplate(program)
+        values = np.array([1.2, -0.4])
+        gradient = parameter_shift_gradient(
+            separate, values[[0, 1, 0, 1, 0]], OBSERVABLE, 3
+        ).gradient
+        np.testing.assert_allclose(
+            parameter_shift_gradient(shared, values, OBSERVABLE, 3).gradient,
+            [gradient[::2].sum(), gradient[1::2].sum()]
+        )
+
+    def test_failures(self):
+
+        with self.assertRaisesRegex(ValueError, "no parameter-shift rule"):
+            parameter_shift_gradient(
+                HALProgram().gate("PHASE", 0, 100), [0.5], OBSERVABLE, 3
+            )
+        with self.assertRaisesRegex(ValueError, "parameter values"):
+            parameter_shift_gradient(_program(), [0.5], OBSERVABLE, 3)
+        with self.assertRaisesRegex(ValueError, "beyond the register"):
+            parameter_shift_gradient(_program(), np.zeros(5), OBSERVABLE, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import subprocess
+import sys
+import unittest
+
+#: seconds allowed for ``import qhal.hal`` in a fresh interpreter, about
+#: five times its cost without the simulators
+IMPORT_BUDGET = 0.5
+
+_SCRIPT = """
+import sys
+import time
+start = time.perf_counter()
+import qhal.hal
+elapsed = time.perf_counter() - start
+print(elapsed, any(module.startswith(("projectq", "qhal.quantum_simulators"))
+                   for module in sys.modules))
+"""
+
+
+class ImportTimeTest(unittest.TestCase):
+    """Tests that the simulators are only imported when used.
+    """
+
+    def test_hal_import_time(self):
+
+        output = subprocess.run(
+            [sys.executable, "-c", _SCRIPT],
+            capture_output=True, text=True, check=True
+        ).stdout.split()
+
+        self.assertEqual(output[1], "False")
+        self.assertLess(float(output[0]), IMPORT_BUDGET)
+
+    def test_lazy_attributes(self):
+
+        import qhal
+        from qhal.quantum_simulators import (ProjectqQuantumSimulator,
+                                             TrajectoryQuantumSimulator)
+
+        self.assertIs(qhal.ProjectqQuantumSimulator, ProjectqQuantumSimulator)
+        self.assertIs(qhal.TrajectoryQuantumSimulator,
+                      TrajectoryQuantumSimulator)
+        self.assertIn("DensityMatrixQuantumSimulator", dir(qhal))
+        with self.assertRaises(AttributeError):
+            qhal.FooSimulator
+
+
+if __name__ == "__main__":
+    unittest.main()
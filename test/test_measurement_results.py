@@ -0,0 +1,137 @@
+import unittest
+
+import numpy as np
+from projectq.backends import Simulator
+
+from qhal.hal import (command_creator, measurement_creator, HALMetadata,
+                      HardwareAbstractionLayer, MeasurementResults)
+from qhal.quantum_simulators import (ProjectqQuantumSimulator,
+                                     TrajectoryQuantumSimulator)
+
+
+class MeasurementResultsTest(unittest.TestCase):
+    """Tests for the collection of measurement results into shots.
+    """
+
+    def test_statistics(self):
+
+        results = MeasurementResults(n_qubits=10)
+        shots = [(1, 0, 1), (1, 1, 0), (1, 0, 1), (0, 0, 0)]
+        for shot in shots:
+            for qubit, value in enumerate(shot):
+                results.add(measurement_creator(qubit, 0, 0, value))
+            # qubit 9 measured through a page offset
+            results.add(measurement_creator(1, 8, 0, shot[0]))
+            results.end_shot()
+
+        self.assertEqual(len(results), 4)
+        self.assertEqual(results.packed.shape, (4, 2))
+        self.assertEqual(
+            results.counts([0, 1, 2]), {"101": 2, "011": 1, "000": 1}
+        )
+        np.testing.assert_array_equal(
+            results.histogram([0, 2]), [1, 1, 0, 2]
+        )
+        np.testing.assert_allclose(results.marginal([1]), [0.75, 0.25])
+        np.testing.assert_array_equal(results.bitstrings[:, 9], [1, 1, 1, 0])
+        self.assertAlmostEqual(results.expectation_z([0]), -0.5)
+        self.assertAlmostEqual(results.expectation_z([0, 9]), 1)
+        np.testing.assert_allclose(
+            results.expectation_z(np.eye(10, dtype=bool)[[0, 1, 2]]),
+            [-0.5, 0.5, 0]
+        )
+
+    def test_wide_devices(self):
+        """Counts work beyond 63 qubits, dense histograms are bounded."""
+
+        results = MeasurementResults(n_qubits=100)
+        for qubit in (0, 99, 99):
+            results.add(measurement_creator(qubit, 0, 0, 1))
+            results.end_shot()
+
+        self.assertEqual(
+            results.counts(),
+            {"0" * 99 + "1": 1, "1" + "0" * 99: 2}
+        )
+        self.assertEqual(results.counts([99, 0]), {"01": 2, "10": 1})
+        with self.assertRaisesRegex(ValueError, "use counts"):
+            results.histogram()
+        with self.assertRaisesRegex(ValueError, "63 qubits"):
+            results._outcome_indexes(range(64))
+
+    def test_attached_to_hal(self):
+        """The HAL gathers the results of every session as one shot."""
+
+        results = MeasurementResults(n_qubits=2)
+        hal = HardwareAbstractionLayer(
+            ProjectqQuantumSimulator(register_size=2, seed=1, backend=Simulator),
+            HALMetadata(),
+            measurement_results=results
+        )
+
+        circuit = [
+            ["START_SESSION", 0, 0],
+            ["STATE_PREPARATION_ALL", 0, 0],
+            ['H', 0, 0],
+            ['CNOT', 0, 1, 0, 0],
+            ['QUBIT_MEASURE', 0, 0],
+            ['QUBIT_MEASURE', 0, 1],
+            ["END_SESSION", 0, 0],
+        ]
+        for _ in range(20):
+            for commands in circuit:
+                hal.accept_command(command_creator(*commands))
+
+        self.assertEqual(len(results), 20)
+        self.assertEqual(set(results.counts()) - {"00", "11"}, set())
+        self.assertEqual(results.expectation_z([0, 1]), 1)
+
+    def test_batched_shots(self):
+        """Arrays of words from a trajectory simulator are stored as one shot
+        per entry."""
+
+        results = MeasurementResults(n_qubits=1)
+        hal = HardwareAbstractionLayer(
+            TrajectoryQuantumSimulator(register_size=1, n_trajectories=50),
+            HALMetadata(),
+            measurement_results=results
+        )
+
+        circuit = [
+            ["START_SESSION", 0, 0],
+            ["STATE_PREPARATION_ALL", 0, 0],
+            ['X', 0, 0],
+            ['QUBIT_MEASURE', 0, 0],
+            ["END_SESSION", 0, 0],
+        ]
+        for commands in circuit:
+            hal.accept_command(command_creator(*commands))
+
+        self.assertEqual(results.counts(), {"1": 50})
+
+    def test_register_measurement(self):
+        """QUBIT_MEASURE_ALL results fill a whole shot at once."""
+
+        results = MeasurementResults(n_qubits=3)
+        hal = HardwareAbstractionLayer(
+            TrajectoryQuantumSimulator(register_size=3, n_trajectories=8),
+            HALMetadata(),
+            measurement_results=results
+        )
+
+        circuit = [
+            ["START_SESSION", 0, 0],
+            ["STATE_PREPARATION_ALL", 0, 0],
+            ['X', 0, 2],
+            ['QUBIT_MEASURE', 0, 0],
+            ['QUBIT_MEASURE_ALL', 0, 0],
+            ["END_SESSION", 0, 0],
+        ]
+        for commands in circuit:
+            hal.accept_command(command_creator(*commands))
+
+        self.assertEqual(results.counts(), {"100": 8})
+
+
+if __name__ == "__main__":
+    unittest.main()
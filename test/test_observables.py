@@ -0,0 +1,105 @@
+import unittest
+from functools import reduce
+
+import numpy as np
+
+from qhal.hal import HALProgram
+from qhal.quantum_simulators import (DensityMatrixQuantumSimulator, Observable,
+                                     ProjectqQuantumSimulator,
+                                     TrajectoryQuantumSimulator)
+from qhal.quantum_simulators._numpy_gates import PAULI_MATRICES
+
+TERMS = {"Z0": 0.5, "Z0 Z1": -1.0, "X0 X2": 0.25, "Y1 Y2": 2.0,
+         "X0 Y1 Z2": 0.75, "": 0.1, "X2": -0.5}
+
+
+def _program() -> HALProgram:
+    program = HALProgram().start_session().prepare_all()
+    program.gate("H", 0).gate("RY", 1, 9000).gate("RX", 2, 21000)
+    program.dual_gate("CNOT", 1, 0).dual_gate("RZZ", 2, 1, 5000)
+    return program.gate("T", 2).gate("PIXY", 0, 300)
+
+
+def _dense(terms: dict, n_qubits: int) -> np.ndarray:
+    """Matrix of an observable, qubit q being bit q of the indexes."""
+    total = 0
+    for string, coefficient in terms.items():
+        paulis = {int(operator[1:]): operator[0]
+                  for operator in string.split()}
+        factors = [PAULI_MATRICES[paulis[qubit]] if qubit in paulis
+                   else np.eye(2) for qubit in reversed(range(n_qubits))]
+        total = total + coefficient * reduce(np.kron, factors)
+    return total
+
+
+class TestObservables(unittest.TestCase):
+    """Tests for the Pauli observable expectation values.
+    """
+
+    def test_groups(self):
+
+        observable = Observable(TERMS)
+        self.assertEqual(observable.n_qubits, 3)
+        groups = observable.groups()
+        self.assertEqual(
+            sorted(term for group in groups for term in group.terms),
+            list(range(len(TERMS)))
+        )
+        strings = list(TERMS)
+        for group in groups:
+            for term in group.terms:
+                for operator in strings[term].split():
+                    self.assertEqual(group.bases[int(operator[1:])],
+                                     operator[0])
+        # Z0 and Z0 Z1 share the Z basis
+        self.assertLess(len(groups), len(TERMS))
+
+        with self.assertRaisesRegex(ValueError, "Invalid Pauli string"):
+            Observable({"X0 Z0": 1.0})
+
+    def test_exact_expectation(self):
+
+        observable = Observable(TERMS)
+        simulator = TrajectoryQuantumSimulator(register_size=3,
+                                               n_trajectories=2)
+        simulator.accept_commands(_program())
+        state = simulator.get_statevector()
+        expected = np.real(np.vdot(state, _dense(TERMS, 3) @ state))
+        self.assertAlmostEqual(simulator.expectation(observable), expected)
+        np.testing.assert_allclose(
+            simulator.trajectory_expectations(observable),
+            [expected, expected]
+        )
+
+        simulator = DensityMatrixQuantumSimulator(register_size=3)
+        simulator.accept_commands(_program())
+        self.assertAlmostEqual(simulator.expectation(observable), expected)
+
+        simulator = ProjectqQuantumSimulator(register_size=3, seed=1)
+        simulator.accept_commands(_program())
+        self.assertAlmostEqual(simulator.expectation(observable), expected)
+        simulator.cleanup()
+
+    def test_sampled_expectation(self):
+
+        observable = Observable(TERMS)
+        simulator = TrajectoryQuantumSimulator(register_size=3, seed=4)
+        simulator.accept_commands(_program())
+        exact = simulator.expectation(observable)
+        # the standard deviation is below sum(|c|) / sqrt(n_shots) < 0.04
+        sampled = simulator.expectation(observable, n_shots=20000)
+        self.assertAlmostEqual(sampled, exact, delta=0.1)
+
+        simulator = DensityMatrixQuantumSimulator(register_size=3, seed=4)
+        simulator.accept_commands(_program())
+        self.assertAlmostEqual(
+            simulator.expectation(observable, n_shots=20000), exact,
+            delta=0.1
+        )
+
+        with self.assertRaisesRegex(ValueError, "beyond the register"):
+            simulator.expectation(Observable({"Z3": 1.0}))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,184 @@
+import unittest
+
+import numpy as np
+
+from qhal.compiler import MAX_QUBIT_INDEX, page_program, unpage_program
+from qhal.hal import command_creator, command_unpacker
+from qhal.quantum_simulators import IQuantumSimulator
+
+
+class RecordingSimulator(IQuantumSimulator):
+    """Records the absolute qubits of the gates it performs, on a register
+    too large to simulate."""
+
+    def __init__(self):
+        self._qubit_register_size = MAX_QUBIT_INDEX + 1
+        self._offset_registers = [0, 0]
+        self.qubits = []
+
+    def accept_command(self, command: np.uint64) -> np.uint64:
+        return self.accept_commands([command])
+
+    def _execute(self, opcode, args, qubit_indexes):
+        if opcode.name.startswith("PAGE_SET_QUBIT"):
+            self._offset_registers[int(opcode.name[-1])] = qubit_indexes[0]
+        else:
+            self.qubits.append(self._offset_registers[0] + qubit_indexes[0])
+
+
+class PagingTest(unittest.TestCase):
+    """Tests for the PAGE_SET_QUBIT encoding of HAL programs.
+    """
+
+    def _random_program(self, n_commands, seed):
+        rng = np.random.default_rng(seed)
+        names = ["H", "X", "RZ", "CNOT", "QUBIT_MEASURE", "SWAP"]
+        commands, qubits_0, qubits_1 = [], [], []
+        for name in rng.choice(names, n_commands):
+            qubit_0, qubit_1 = rng.choice(MAX_QUBIT_INDEX + 1, 2,
+                                          replace=False)
+            if name in ("CNOT", "SWAP"):
+                commands.append(command_creator(name, 0, 0, 0, 0))
+            else:
+                commands.append(command_creator(name, int(qubit_0), 0))
+            qubits_0.append(qubit_0)
+            qubits_1.append(qubit_1)
+        commands = [command_creator("START_SESSION", 0, 0)] + commands + \
+            [command_creator("END_SESSION", 0, 0)]
+        return (np.array(commands, dtype=np.uint64),
+                np.array([0] + qubits_0 + [0]),
+                np.array([0] + qubits_1 + [0]))
+
+    def test_fewest_pages(self):
+
+        commands = np.array([
+            command_creator(name, 0, 0) for name in
+            ["START_SESSION", "H", "X", "H", "X", "H", "END_SESSION"]
+        ], dtype=np.uint64)
+        qubits = np.array([0, 1000, 1030, 1000, 1030, 2000, 0])
+
+        paged = page_program(commands, qubits, reorder=False)
+
+        self.assertEqual(
+            [command_unpacker(int(command)) for command in paged],
+            [
+                ("START_SESSION", "SINGLE", [0], [0]),
+                ("H", "SINGLE", [0], [1000]),
+                ("PAGE_SET_QUBIT_0", "SINGLE", [0], [1000]),
+                ("X", "SINGLE", [0], [30]),
+                ("H", "SINGLE", [0], [0]),
+                ("X", "SINGLE", [0], [30]),
+                ("H", "SINGLE", [0], [1000]),
+                ("END_SESSION", "SINGLE", [0], [0]),
+            ]
+        )
+
+    def test_reorder(self):
+
+        commands = np.array([
+            command_creator(name, 0, 0) for name in
+            ["H", "H", "H", "H", "CNOT", "H", "H"]
+        ], dtype=np.uint64)
+        qubits_0 = np.array([1, 2000, 2, 2001, 2002, 3, 2003])
+        qubits_1 = np.array([0, 0, 0, 0, 1500, 0, 0])
+
+        paged = page_program(commands, qubits_0, qubits_1)
+
+        self.assertEqual(
+            [command_unpacker(int(command))[0] for command in paged],
+            ["H", "H", "PAGE_SET_QUBIT_0", "H", "H", "PAGE_SET_QUBIT_1",
+             "CNOT", "H", "PAGE_SET_QUBIT_0", "H"]
+        )
+        decoded, decoded_0, decoded_1 = unpage_program(paged)
+        self.assertEqual(decoded_0.tolist(),
+                         [1, 2, 2000, 2001, 2002, 2003, 3])
+        self.assertEqual(decoded_1[4], 1500)
+
+    def test_barriers(self):
+        """Measurements and preparations are not reordered, the gates
+        between them are."""
+
+        commands = np.array([
+            command_creator(name, 0, 0) for name in
+            ["H", "QUBIT_MEASURE", "H", "STATE_PREPARATION", "H", "H"]
+        ], dtype=np.uint64)
+        qubits_0 = np.array([2000, 1, 2001, 2, 2002, 3])
+
+        paged = page_program(commands, qubits_0)
+
+        decoded, decoded_0, _ = unpage_program(paged)
+        self.assertEqual(
+            [command_unpacker(int(command))[0] for command in decoded],
+            ["H", "QUBIT_MEASURE", "H", "STATE_PREPARATION", "H", "H"]
+        )
+        self.assertEqual(decoded_0.tolist(), [2000, 1, 2001, 2, 3, 2002])
+
+    def test_round_trip(self):
+
+        commands, qubits_0, qubits_1 = self._random_program(5000, seed=3)
+        dual = np.array([
+            command_unpacker(int(command))[1] == "DUAL"
+            for command in commands
+        ])
+
+        for reorder in (False, True):
+            paged = page_program(commands, qubits_0, qubits_1,
+                                 reorder=reorder)
+            decoded, decoded_0, decoded_1 = unpage_program(paged)
+
+            # same commands on each qubit, in the same order
+            def per_qubit(commands, qubits_0, qubits_1):
+                sequences = {}
+                for command, qubit_0, qubit_1 in zip(
+                        commands.tolist(), qubits_0.tolist(),
+                        qubits_1.tolist()):
+                    name, kind, args, _ = command_unpacker(command)
+                    if name in ("START_SESSION", "END_SESSION"):
+                        continue
+                    key = (name, tuple(args))
+                    for qubit in ((qubit_0, qubit_1) if kind == "DUAL"
+                                  else (qubit_0,)):
+                        sequences.setdefault(qubit, []).append(key)
+                return sequences
+
+            self.assertEqual(
+                per_qubit(decoded, decoded_0, decoded_1),
+                per_qubit(commands, qubits_0,
+                          np.where(dual, qubits_1, 0))
+            )
+            self.assertLess(len(paged) - len(commands), len(commands) // 2)
+
+    def test_loop(self):
+        """The offsets are set again at the top of a loop body, which runs
+        after the end of the previous pass."""
+
+        commands = np.array([
+            command_creator("FOR_START", 2, 0),
+            command_creator("H", 0, 0),
+            command_creator("H", 0, 0),
+            command_creator("H", 0, 0),
+            command_creator("FOR_END", 0, 0),
+            command_creator("X", 0, 0),
+        ], dtype=np.uint64)
+        qubits = np.array([0, 5, 1500, 5, 0, 1500])
+
+        paged = page_program(commands, qubits, reorder=False)
+
+        self.assertEqual(
+            [command_unpacker(int(command))[0] for command in paged],
+            ["FOR_START", "PAGE_SET_QUBIT_0", "H", "PAGE_SET_QUBIT_0", "H",
+             "PAGE_SET_QUBIT_0", "H", "FOR_END", "PAGE_SET_QUBIT_0", "X"]
+        )
+        simulator = RecordingSimulator()
+        simulator.accept_commands(paged)
+        self.assertEqual(simulator.qubits, [5, 1500, 5] * 2 + [1500])
+
+    def test_index_too_large(self):
+
+        commands = np.array([command_creator("H", 0, 0)], dtype=np.uint64)
+        with self.assertRaises(ValueError):
+            page_program(commands, [MAX_QUBIT_INDEX + 1])
+
+
+if __name__ == "__main__":
+    unittest.main()
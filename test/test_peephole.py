@@ -0,0 +1,123 @@
+import unittest
+
+import numpy as np
+
+from qhal.compiler import optimize_program
+from qhal.hal import command_creator, command_unpacker
+from qhal.quantum_simulators import TrajectoryQuantumSimulator
+
+
+class PeepholeTest(unittest.TestCase):
+    """Tests for the peephole optimisation of HAL programs.
+    """
+
+    def test_simplifications(self):
+
+        commands = np.array([
+            command_creator(*command) for command in [
+                ["START_SESSION", 0, 0],
+                ["STATE_PREPARATION_ALL", 0, 0],
+                ['X', 0, 0],
+                ['H', 0, 0],
+                ["PAGE_SET_QUBIT_0", 0, 1],
+                ['T', 0, 0],
+                ["PAGE_SET_QUBIT_0", 0, 0],
+                ['H', 0, 0],
+                ['INVT', 0, 1],
+                ['PAULI_X', 0, 0],
+                ['RZ', 40000, 1],
+                ['RZ', 30000, 1],
+                ['CNOT', 0, 0, 0, 1],
+                ['H', 0, 2],
+                ['CNOT', 0, 0, 0, 1],
+                ['S', 0, 2],
+                ['QUBIT_MEASURE', 0, 2],
+                ['INVS', 0, 2],
+                ["PAGE_SET_QUBIT_0", 0, 0],
+                ['QUBIT_MEASURE', 0, 0],
+            ]
+        ], dtype=np.uint64)
+
+        optimized = optimize_program(commands)
+
+        self.assertEqual(
+            [command_unpacker(int(command)) for command in optimized.commands],
+            [
+                ("START_SESSION", "SINGLE", [0], [0]),
+                ("STATE_PREPARATION_ALL", "SINGLE", [0], [0]),
+                ("RZ", "SINGLE", [70000 % 2 ** 16], [1]),
+                ("H", "SINGLE", [0], [2]),
+                ("S", "SINGLE", [0], [2]),
+                ("QUBIT_MEASURE", "SINGLE", [0], [2]),
+                ("INVS", "SINGLE", [0], [2]),
+                ("QUBIT_MEASURE", "SINGLE", [0], [0]),
+            ]
+        )
+        self.assertEqual(optimized.n_removed, 12)
+        self.assertAlmostEqual(optimized.reduction, 0.6)
+
+    def test_control_flow(self):
+        """Offsets set in a loop are kept for its next iterations."""
+
+        commands = np.array([
+            command_creator(*command) for command in [
+                ["START_SESSION", 0, 0],
+                ["STATE_PREPARATION_ALL", 0, 0],
+                ["FOR_START", 2, 0],
+                ["PAGE_SET_QUBIT_0", 0, 0],
+                ['RY', 1000, 0],
+                ["PAGE_SET_QUBIT_0", 0, 1],
+                ['RY', 3000, 0],
+                ["PAGE_SET_QUBIT_1", 0, 1],
+                ["FOR_END", 0, 0],
+                ["PAGE_SET_QUBIT_1", 0, 0],
+                ['CNOT', 0, 0, 0, 0],
+            ]
+        ], dtype=np.uint64)
+
+        optimized = optimize_program(commands)
+
+        self.assertEqual(optimized.n_removed, 0)
+        states = []
+        for program in (commands, optimized.commands):
+            simulator = TrajectoryQuantumSimulator(register_size=2)
+            simulator.accept_commands(program)
+            states.append(simulator.get_statevector())
+        self.assertAlmostEqual(abs(np.vdot(*states)), 1)
+
+    def test_same_state(self):
+
+        n_qubits = 3
+        random_state = np.random.RandomState(3)
+        gates = ["X", "H", "T", "INVT", "S", "INVS", "RZ", "RX", "CNOT"]
+        commands = [
+            command_creator("START_SESSION", 0, 0),
+            command_creator("STATE_PREPARATION_ALL", 0, 0),
+        ]
+        for _ in range(300):
+            gate = gates[random_state.randint(len(gates))]
+            angle = int(random_state.choice([0, 2 ** 14, 3 * 2 ** 14, 5]))
+            if gate == "CNOT":
+                qubit_0, qubit_1 = random_state.choice(n_qubits, 2, False)
+                commands.append(command_creator(
+                    gate, 0, int(qubit_0), 0, int(qubit_1)
+                ))
+            else:
+                commands.append(command_creator(
+                    gate, angle, int(random_state.randint(n_qubits))
+                ))
+        commands = np.array(commands, dtype=np.uint64)
+
+        optimized = optimize_program(commands)
+        self.assertGreater(optimized.n_removed, 0)
+
+        states = []
+        for program in (commands, optimized.commands):
+            simulator = TrajectoryQuantumSimulator(register_size=n_qubits)
+            simulator.accept_commands(program)
+            states.append(simulator.get_statevector())
+        self.assertAlmostEqual(abs(np.vdot(*states)), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import json
+import unittest
+
+from projectq.backends import Simulator
+
+from qhal.hal import (command_creator, HALMetadata, HardwareAbstractionLayer,
+                      Profiler)
+from qhal.quantum_simulators import ProjectqQuantumSimulator
+
+
+class ProfilerTest(unittest.TestCase):
+    """Tests for the per-opcode and per-phase instrumentation.
+    """
+
+    def run_circuit(self, profiler: Profiler):
+        hal = HardwareAbstractionLayer(
+            ProjectqQuantumSimulator(
+                register_size=2, seed=234, backend=Simulator
+            ),
+            HALMetadata(),
+            profiler=profiler
+        )
+        circuit = [
+            ["START_SESSION", 0, 0],
+            ["STATE_PREPARATION_ALL", 0, 0],
+            ['H', 0, 0],
+            ['H', 0, 1],
+            ['RZ', 100, 1],
+            ['CNOT', 0, 0, 0, 1],
+            ['QUBIT_MEASURE', 0, 0],
+            ['QUBIT_MEASURE', 0, 1],
+            ["END_SESSION", 0, 0],
+        ]
+        for commands in circuit:
+            hal.accept_command(command_creator(*commands))
+
+    def test_counts_and_phases(self):
+
+        profiler = Profiler(record_trace=True)
+        self.run_circuit(profiler)
+        data = profiler.to_dict()
+
+        self.assertEqual(data["commands"]["H"]["count"], 2)
+        self.assertEqual(data["commands"]["QUBIT_MEASURE"]["count"], 2)
+        self.assertEqual(data["commands"]["CNOT"]["count"], 1)
+        self.assertLessEqual(
+            data["commands"]["H"]["p50_s"], data["commands"]["H"]["p99_s"]
+        )
+        for phase in ("decode", "dispatch", "gate_construction",
+                      "engine_flush", "measurement"):
+            self.assertIn(phase, data["phases"])
+        # the HAL and the simulator both decode each command
+        self.assertEqual(data["phases"]["decode"]["count"], 18)
+        self.assertEqual(data["phases"]["engine_flush"]["count"], 4)
+
+        prometheus = profiler.to_prometheus()
+        self.assertIn(
+            'qhal_command_latency_seconds_count{opcode="H"} 2', prometheus
+        )
+
+        trace = json.loads(profiler.to_chrome_trace())
+        commands = [
+            event for event in trace["traceEvents"]
+            if event["cat"] == "command"
+        ]
+        self.assertEqual(len(commands), 9)
+
+    def test_trace_requires_recording(self):
+
+        profiler = Profiler()
+        self.run_circuit(profiler)
+        with self.assertRaises(ValueError):
+            profiler.to_chrome_trace()
+
+
+if __name__ == "__main__":
+    unittest.main()
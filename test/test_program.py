@@ -0,0 +1,206 @@
+import unittest
+
+import numpy as np
+
+from qhal.hal import (command_creator, HALMetadata, HALProgram,
+                      HardwareAbstractionLayer, ProgramTemplate)
+from qhal.hal._utils import angle_binary_representation
+from qhal.quantum_simulators import TrajectoryQuantumSimulator
+
+
+class HALProgramTest(unittest.TestCase):
+    """Tests for the growable buffer of HAL commands.
+    """
+
+    def test_typed_appends(self):
+
+        program = HALProgram(capacity=2)
+        program.start_session().prepare_all().page(1, 3)
+        program.gate("H", 0).gate("RZ", 2, 1000)
+        program.dual_gate("CNOT", 1, 0).dual_gate("RXX", 0, 2, 500)
+        program.prepare(4).measure(4).measure_all()
+        program.request_metadata(5, 7).end_session()
+
+        self.assertGreaterEqual(program.capacity, len(program))
+        self.assertEqual(list(program), [
+            command_creator(*command) for command in [
+                ["START_SESSION"],
+                ["STATE_PREPARATION_ALL"],
+                ["PAGE_SET_QUBIT_1", 0, 3],
+                ["H", 0, 0],
+                ["RZ", 1000, 2],
+                ["CNOT", 0, 1, 0, 0],
+                ["RXX", 0, 0, 500, 2],
+                ["STATE_PREPARATION", 0, 4],
+                ["QUBIT_MEASURE", 0, 4],
+                ["QUBIT_MEASURE_ALL"],
+                ["REQUEST_METADATA", 5, 0, 7, 0],
+                ["END_SESSION"],
+            ]
+        ])
+
+        with self.assertRaises(ValueError):
+            program.gate("CNOT", 0)
+        with self.assertRaises(ValueError):
+            program.gate("H", 1024)
+        with self.assertRaises(ValueError):
+            program.dual_gate("FOO", 0, 1)
+
+    def test_append_columns(self):
+
+        program = HALProgram()
+        program.append_columns(["H", "RX", "SWAP", "PSWAP"],
+                               qubits_0=[0, 1, 2, 3], args_0=[0, 9, 0, 0],
+                               qubits_1=[0, 0, 4, 5], args_1=[0, 0, 0, 77])
+        program.append_columns(command_creator("T") >> 52,
+                               qubits_0=np.arange(3))
+
+        self.assertEqual(list(program), [
+            command_creator("H", 0, 0),
+            command_creator("RX", 9, 1),
+            command_creator("SWAP", 0, 2, 0, 4),
+            command_creator("PSWAP", 0, 3, 77, 5),
+            command_creator("T", 0, 0),
+            command_creator("T", 0, 1),
+            command_creator("T", 0, 2),
+        ])
+        with self.assertRaises(ValueError):
+            program.append_columns("H", args_0=[2 ** 16])
+        with self.assertRaises(ValueError):
+            program.append_columns(["H", "FOO"])
+
+    def test_views(self):
+
+        program = HALProgram()
+        program.append_columns("X", qubits_0=np.arange(10))
+
+        # slices and np.asarray share the buffer
+        self.assertTrue(np.shares_memory(np.asarray(program),
+                                         program.commands))
+        view = program[2:5]
+        self.assertEqual(len(view), 3)
+        self.assertTrue(np.shares_memory(view.commands, program.commands))
+        view[0] = command_creator("H", 0, 2)
+        self.assertEqual(program[2], command_creator("H", 0, 2))
+
+        # appending to a slice copies it
+        view.gate("Y", 0)
+        self.assertEqual(program[5], command_creator("X", 0, 5))
+        self.assertFalse(np.shares_memory(view.commands, program.commands))
+
+        self.assertEqual(len(program + view), 14)
+        self.assertEqual(list(program * 3), list(program) * 3)
+        self.assertEqual(2 * view, view + view)
+        program += view
+        self.assertEqual(len(program), 14)
+
+    def test_accept_program(self):
+        """Programs are passed as buffers to the HAL and the simulators."""
+
+        program = HALProgram()
+        program.start_session().prepare_all()
+        program.gate("X", 0).dual_gate("CNOT", 1, 0)
+        program.measure(0).measure(1).end_session()
+
+        simulator = TrajectoryQuantumSimulator(register_size=2)
+        results = simulator.accept_commands(program)
+        self.assertEqual([int(result[0]) & 1 for result in results], [1, 1])
+
+        hal = HardwareAbstractionLayer(
+            TrajectoryQuantumSimulator(register_size=2),
+            HALMetadata(num_qubits=2, connectivity=np.ones((2, 2)))
+        )
+        results = hal.accept_commands(program)
+        self.assertEqual([int(result[0]) & 1 for result in results], [1, 1])
+
+
+class ProgramTemplateTest(unittest.TestCase):
+    """Tests for the rebinding of parametrised programs.
+    """
+
+    def _program(self) -> HALProgram:
+        program = HALProgram().start_session().prepare_all()
+        program.gate("RX", 0, 100).dual_gate("CNOT", 1, 0)
+        program.dual_gate("RZZ", 0, 1, 200).gate("RY", 1, 300)
+        return program.measure_all().end_session()
+
+    def test_bind(self):
+
+        template = ProgramTemplate(self._program())
+        np.testing.assert_array_equal(template.words, [2, 4, 5])
+        self.assertEqual(template.n_parameters, 3)
+
+        program = template.bind([7, 8, 9], binary=True)
+        self.assertIs(program, template.program)
+        expected = self._program()
+        expected[2] = command_creator("RX", 7, 0)
+        expected[4] = command_creator("RZZ", 0, 0, 8, 1)
+        expected[5] = command_creator("RY", 9, 1)
+        self.assertEqual(program, expected)
+
+        angles = np.array([[np.pi, np.pi / 2, 0.1], [0, 1, 2]])
+        batch = template.bind(angles)
+        self.assertEqual(batch.shape, (2, 8))
+        for row, values in zip(batch, angles):
+            np.testing.assert_array_equal(
+                row, template.bind(values).commands
+            )
+        self.assertEqual(
+            int(batch[0, 2]),
+            command_creator("RX", angle_binary_representation(np.pi), 0)
+        )
+
+        # only gates are parametrised by default
+        program = HALProgram().gate("RX", 0, 100).request_metadata(0, 5)
+        program.gate("FOR_START", 0, 2).gate("RY", 0, 300).gate("FOR_END", 0)
+        np.testing.assert_array_equal(
+            ProgramTemplate(program).words, [0, 3]
+        )
+
+        # words sharing a parameter
+        template = ProgramTemplate(self._program(), [2, 5], [0, 0])
+        program = template.bind([1000], binary=True)
+        self.assertEqual(program[2], command_creator("RX", 1000, 0))
+        self.assertEqual(program[5], command_creator("RY", 1000, 1))
+
+        with self.assertRaisesRegex(ValueError, "Expected 1 parameters"):
+            template.bind([1, 2])
+        with self.assertRaisesRegex(ValueError, "Argument greater"):
+            template.bind([1 << 16], binary=True)
+        with self.assertRaisesRegex(ValueError, "One parameter index"):
+            ProgramTemplate(self._program(), [2, 5], [0])
+
+    def test_shifted_bindings(self):
+
+        template = ProgramTemplate(self._program(), [2, 5], [0, 0])
+        batch = template.shifted_bindings([1000], binary=True)
+        self.assertEqual(batch.shape, (4, 8))
+        self.assertEqual(batch[0, 2], command_creator("RX", 17384, 0))
+        self.assertEqual(batch[1, 2], command_creator("RX", 50152, 0))
+        self.assertEqual(batch[1, 5], command_creator("RY", 1000, 1))
+        self.assertEqual(batch[2, 5], command_creator("RY", 17384, 1))
+        np.testing.assert_array_equal(
+            batch[3, :5], template.bind([1000], binary=True)[:5]
+        )
+
+        with self.assertRaisesRegex(ValueError, "single binding"):
+            template.shifted_bindings([[0], [1]])
+
+    def test_accept_batch(self):
+
+        template = ProgramTemplate(
+            HALProgram().start_session().prepare_all().gate("RX", 0)
+            .measure(0).end_session()
+        )
+        hal = HardwareAbstractionLayer(
+            TrajectoryQuantumSimulator(register_size=1),
+            HALMetadata(num_qubits=1, connectivity=np.ones((1, 1)))
+        )
+        results = hal.accept_batch(template.bind([[0], [np.pi], [0]]))
+        self.assertEqual(
+            [int(result[0][0]) & 1 for result in results], [0, 1, 0]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,7 +3,11 @@ import unittest
 import numpy as np
 from projectq.backends import Simulator
 
-from qhal.quantum_simulators import ProjectqQuantumSimulator
+from qhal.quantum_simulators import (ZERO_COPY_BACKENDS,
+                                     DensityMatrixQuantumSimulator,
+                                     ProjectqQuantumSimulator,
+                                     TrajectoryQuantumSimulator)
+from qhal.quantum_simulators._qubit_states import QubitStates
 from qhal.hal import command_creator, measurement_unpacker
 
 # ProjectQ can only address a small number of qubits. We
@@ -57,7 +61,7 @@ class TestQuantumSimulators(unittest.TestCase):
             projQ_backend.accept_command(hal_cmd)
 
         # extract wavefunction at the end of the circuit (before measuring)
-        psi_projq = np.array(projQ_backend._engine.backend.cheat()[1])
+        psi_projq = projQ_backend.get_statevector()
 
         self.assertEqual(
             list(psi_projq), [(-0.3535292059549881+0.00413527953536358j),
@@ -291,6 +295,197 @@ class TestQuantumSimulators(unittest.TestCase):
 
         projQ_backend.accept_command(command_creator("END_SESSION", 0, 0))
 
+    def test_measure_all(self):
+        """Tests that QUBIT_MEASURE_ALL returns one word per qubit not measured
+        yet, and releases the register."""
+
+        projQ_backend = ProjectqQuantumSimulator(
+            register_size=3,
+            seed=234,
+            backend=Simulator
+        )
+
+        circuit = [
+            ["START_SESSION", 0, 0],
+            ["STATE_PREPARATION_ALL", 0, 0],
+            ['X', 0, 0],
+            ['H', 0, 1],
+            ['CNOT', 0, 2, 0, 1],
+            ['QUBIT_MEASURE', 0, 0],
+        ]
+
+        for commands in circuit:
+            hal_cmd = command_creator(*commands)
+            projQ_backend.accept_command(hal_cmd)
+
+        results = projQ_backend.accept_command(
+            command_creator("QUBIT_MEASURE_ALL", 0, 0)
+        )
+        decoded = [measurement_unpacker(int(res)) for res in results]
+
+        self.assertEqual([res[0] for res in decoded], [1, 2])
+        self.assertEqual(decoded[0][3], decoded[1][3])
+
+        # the register is released and can be prepared again
+        projQ_backend.accept_command(
+            command_creator("STATE_PREPARATION_ALL", 0, 0)
+        )
+        results = projQ_backend.accept_command(
+            command_creator("QUBIT_MEASURE_ALL", 0, 0)
+        )
+        self.assertEqual([int(res) & 1 for res in results], [0, 0, 0])
+
+        # once paged, the words carry the relative index and the offset, as
+        # the QUBIT_MEASURE word does
+        for commands in [
+            ["STATE_PREPARATION_ALL", 0, 0],
+            ["PAGE_SET_QUBIT_0", 0, 1],
+        ]:
+            projQ_backend.accept_command(command_creator(*commands))
+        result = projQ_backend.accept_command(
+            command_creator("QUBIT_MEASURE", 0, 1)
+        )
+        self.assertEqual(measurement_unpacker(result), (1, 1, 0, 0))
+        results = projQ_backend.accept_command(
+            command_creator("QUBIT_MEASURE_ALL", 0, 0)
+        )
+        decoded = [measurement_unpacker(int(res)) for res in results]
+        self.assertEqual([res[:2] for res in decoded], [(0, 0), (0, 1)])
+
+        projQ_backend.accept_command(command_creator("END_SESSION", 0, 0))
+
+    def test_accept_commands(self):
+        """Tests that a buffer of commands gives the same results as the
+        commands one by one, and is validated before anything executes."""
+
+        circuit = np.array([
+            command_creator(*commands) for commands in [
+                ["START_SESSION", 0, 0],
+                ["STATE_PREPARATION_ALL", 0, 0],
+                ['X', 0, 0],
+                ["PAGE_SET_QUBIT_0", 0, 1],
+                ['H', 0, 0],
+                ["PAGE_SET_QUBIT_0", 0, 0],
+                ['CNOT', 0, 2, 0, 1],
+                ['QUBIT_MEASURE', 0, 0],
+                ['QUBIT_MEASURE_ALL', 0, 0],
+                ["END_SESSION", 0, 0],
+            ]
+        ], dtype=np.uint64)
+
+        def make_backend():
+            return ProjectqQuantumSimulator(
+                register_size=3, seed=234, backend=Simulator
+            )
+
+        backend = make_backend()
+        expected = [
+            backend.accept_command(int(command)) for command in circuit
+        ]
+        expected = [result for result in expected if result is not None]
+
+        results = make_backend().accept_commands(circuit)
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[0], expected[0])
+        np.testing.assert_array_equal(results[1], expected[1])
+
+        # qubit 3 is out of range once paged: nothing is executed
+        backend = make_backend()
+        with self.assertRaisesRegex(ValueError, "Command 4"):
+            backend.accept_commands(np.array([
+                command_creator("START_SESSION", 0, 0),
+                command_creator("STATE_PREPARATION_ALL", 0, 0),
+                command_creator("PAGE_SET_QUBIT_0", 0, 2),
+                command_creator("H", 0, 0),
+                command_creator("H", 0, 1),
+            ], dtype=np.uint64))
+        backend.accept_command(command_creator("START_SESSION", 0, 0))
+
+    def test_qubit_states(self):
+
+        states = QubitStates(10)
+        states.allocate()
+        states.mark_measured(2)
+        states.mark_measured(9)
+        states.mark_prepared(2)
+
+        self.assertTrue(states.is_measured(9))
+        self.assertFalse(states.all_measured)
+        self.assertEqual(states.unmeasured(), list(range(9)))
+
+        arrays = states.to_arrays()
+        np.testing.assert_array_equal(arrays["allocated"], [True] * 10)
+        np.testing.assert_array_equal(
+            arrays["prepared"], [True] * 9 + [False]
+        )
+
+        states.mark_all_measured()
+        states.release()
+        self.assertTrue(states.all_measured)
+        self.assertFalse(states.to_arrays()["allocated"].any())
+
+    def test_state_access(self):
+        """Zero-copy backends return read-only views of their state."""
+
+        commands = [command_creator(*command) for command in [
+            ["START_SESSION"], ["STATE_PREPARATION_ALL"], ["H", 0, 0],
+            ["CNOT", 0, 1, 0, 0]
+        ]]
+        expected = np.array([1, 0, 0, 1]) / np.sqrt(2)
+
+        trajectories = TrajectoryQuantumSimulator(register_size=2)
+        trajectories.accept_commands(commands)
+        state = trajectories.get_statevector()
+        np.testing.assert_allclose(state, expected)
+        self.assertTrue(np.shares_memory(state, trajectories._states))
+        with self.assertRaises(ValueError):
+            state[0] = 0
+        copied = trajectories.get_statevector(copy=True)
+        copied[0] = 0
+        self.assertFalse(np.shares_memory(copied, trajectories._states))
+        np.testing.assert_allclose(trajectories.get_probabilities(),
+                                   np.abs(expected) ** 2)
+        # the view follows the later gates
+        trajectories.accept_commands([command_creator("X", 0, 0)])
+        np.testing.assert_allclose(state, [0, 1, 1, 0] / np.sqrt(2))
+        np.testing.assert_allclose(copied, [0, 0, 0, 1] / np.sqrt(2))
+
+        trajectories = TrajectoryQuantumSimulator(register_size=2,
+                                                  n_trajectories=3)
+        trajectories.accept_commands(commands)
+        self.assertEqual(trajectories.get_statevector().shape, (4,))
+        states = trajectories.get_statevectors()
+        self.assertEqual(states.shape, (3, 4))
+        trajectories.accept_commands([command_creator("H", 0, 1)])
+        np.testing.assert_allclose(
+            states, trajectories.get_statevectors(copy=True)
+        )
+        np.testing.assert_allclose(trajectories.get_probabilities(),
+                                   np.abs(states[0]) ** 2)
+
+        density_matrix = DensityMatrixQuantumSimulator(register_size=2)
+        density_matrix.accept_commands(commands)
+        probabilities = density_matrix.get_probabilities()
+        np.testing.assert_allclose(probabilities, np.abs(expected) ** 2)
+        self.assertTrue(np.shares_memory(probabilities, density_matrix._rho))
+        self.assertFalse(probabilities.flags.writeable)
+        np.testing.assert_allclose(density_matrix.get_density_matrix(),
+                                   np.outer(expected, expected))
+        with self.assertRaises(NotImplementedError):
+            density_matrix.get_statevector()
+
+        projectq = ProjectqQuantumSimulator(register_size=2, seed=1)
+        projectq.accept_commands(commands)
+        np.testing.assert_allclose(projectq.get_statevector(), expected,
+                                   atol=1e-12)
+        np.testing.assert_allclose(projectq.get_probabilities(),
+                                   np.abs(expected) ** 2, atol=1e-12)
+        projectq.cleanup()
+
+        self.assertEqual(ZERO_COPY_BACKENDS["ProjectqQuantumSimulator"], ())
+        with self.assertRaisesRegex(ValueError, "not prepared"):
+            TrajectoryQuantumSimulator(register_size=2).get_statevector()
+
 
 if __name__ == "__main__":
     unittest.main()
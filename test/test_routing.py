@@ -0,0 +1,178 @@
+import unittest
+
+import numpy as np
+
+from qhal.compiler import distance_table, route_program, unpage_program
+from qhal.hal import command_creator, command_unpacker, HALMetadata
+from qhal.quantum_simulators import TrajectoryQuantumSimulator
+
+
+def final_state(commands, n_qubits):
+    simulator = TrajectoryQuantumSimulator(register_size=n_qubits)
+    simulator.accept_commands(commands)
+    return simulator.get_statevector()
+
+
+def line_metadata(n_qubits, errors=None):
+    connectivity = np.eye(n_qubits, dtype=int) + \
+        np.eye(n_qubits, k=1, dtype=int)
+    if errors is None:
+        errors = np.zeros((n_qubits, n_qubits))
+    return HALMetadata(
+        num_qubits=n_qubits,
+        native_gates={"CNOT": (100, errors)},
+        connectivity=connectivity
+    )
+
+
+class RoutingTest(unittest.TestCase):
+    """Tests for the SWAP insertion on devices of limited connectivity.
+    """
+
+    def test_error_weighted_paths(self):
+
+        # ring of 4 qubits where the 0-1-2 side is noisier than 0-3-2
+        connectivity = np.zeros((4, 4), dtype=int)
+        errors = np.zeros((4, 4))
+        for (i, j), error in zip([(0, 1), (1, 2), (2, 3), (0, 3)],
+                                 [0.1, 0.1, 0.01, 0.01]):
+            connectivity[i, j] = 1
+            errors[i, j] = error
+        hal_metadata = HALMetadata(
+            num_qubits=4,
+            native_gates={"CNOT": (100, errors)},
+            connectivity=connectivity
+        )
+
+        table = distance_table(hal_metadata)
+        self.assertIs(table, distance_table(hal_metadata))
+        self.assertEqual(table.predecessors[2, 0], 3)
+        self.assertAlmostEqual(
+            table.distances[0, 2], -2 * np.log(0.99), places=4
+        )
+
+        routed = route_program(
+            np.array([command_creator("CNOT", 0, 0, 0, 2)], dtype=np.uint64),
+            hal_metadata
+        )
+        self.assertEqual(
+            [command_unpacker(int(command))[3] for command in routed.commands],
+            [[0, 3], [3, 2]]
+        )
+        np.testing.assert_array_equal(routed.final_layout, [3, 1, 2, 0])
+
+    def test_routed_state(self):
+        """The routed program prepares the same state, up to the final
+        layout."""
+
+        n_qubits = 5
+        random_state = np.random.RandomState(0)
+        commands = [
+            command_creator("START_SESSION", 0, 0),
+            command_creator("STATE_PREPARATION_ALL", 0, 0),
+            command_creator("PAGE_SET_QUBIT_0", 0, 1),
+        ]
+        for _ in range(30):
+            if random_state.rand() < 0.5:
+                commands.append(command_creator(
+                    "RY", int(random_state.randint(2 ** 16)),
+                    int(random_state.randint(n_qubits - 1))
+                ))
+            else:
+                # qubit 0 is paged by one
+                qubit_0, qubit_1 = random_state.choice(n_qubits, 2, False)
+                if qubit_0 == 0:
+                    qubit_0, qubit_1 = qubit_1, qubit_0
+                commands.append(command_creator(
+                    "CNOT", 0, int(qubit_0 - 1), 0, int(qubit_1)
+                ))
+        commands = np.array(commands, dtype=np.uint64)
+
+        routed = route_program(commands, line_metadata(n_qubits))
+
+        self.assertGreater(routed.n_swaps, 0)
+        for command in routed.commands:
+            op, _, _, qubits = command_unpacker(int(command))
+            self.assertNotEqual(op, "PAGE_SET_QUBIT_0")
+            if op in ("CNOT", "SWAP"):
+                self.assertEqual(abs(qubits[0] - qubits[1]), 1)
+
+        states = []
+        for program in (commands, routed.commands):
+            simulator = TrajectoryQuantumSimulator(register_size=n_qubits)
+            simulator.accept_commands(program)
+            states.append(simulator.get_statevector())
+
+        indexes = np.arange(2 ** n_qubits)
+        physical_indexes = np.zeros_like(indexes)
+        for logical, physical in enumerate(routed.final_layout):
+            physical_indexes |= ((indexes >> logical) & 1) << physical
+        np.testing.assert_allclose(states[0], states[1][physical_indexes])
+
+    def test_loop(self):
+        """The SWAPs of a loop body are undone before its end, so that every
+        pass starts with the same layout."""
+
+        commands = np.array([
+            command_creator("START_SESSION", 0, 0),
+            command_creator("STATE_PREPARATION_ALL", 0, 0),
+            command_creator("H", 0, 0),
+            command_creator("H", 0, 1),
+            command_creator("FOR_START", 2, 0),
+            command_creator("CNOT", 0, 0, 0, 2),
+            command_creator("RZ", 12345, 1),
+            command_creator("FOR_END", 0, 0),
+        ], dtype=np.uint64)
+
+        routed = route_program(commands, line_metadata(3))
+
+        self.assertEqual(routed.n_swaps, 2)
+        np.testing.assert_array_equal(routed.final_layout, [0, 1, 2])
+        self.assertEqual(
+            [command_unpacker(int(command))[0]
+             for command in routed.commands[4:]],
+            ["FOR_START", "SWAP", "CNOT", "RZ", "SWAP", "FOR_END"]
+        )
+        np.testing.assert_allclose(
+            final_state(routed.commands, 3), final_state(commands, 3),
+            atol=1e-12
+        )
+
+    def test_wide_device(self):
+        """Physical indexes beyond the first page are re-paged."""
+
+        commands = np.array([
+            command_creator("PAGE_SET_QUBIT_0", 0, 1000),
+            command_creator("PAGE_SET_QUBIT_1", 0, 1000),
+            command_creator("CNOT", 0, 99, 0, 98),
+            command_creator("CNOT", 0, 99, 0, 97),
+        ], dtype=np.uint64)
+
+        routed = route_program(commands, line_metadata(1100))
+
+        self.assertEqual(routed.n_swaps, 1)
+        commands, qubits_0, qubits_1 = unpage_program(routed.commands)
+        self.assertEqual(
+            [command_unpacker(int(command))[0] for command in commands],
+            ["CNOT", "SWAP", "CNOT"]
+        )
+        np.testing.assert_array_equal(qubits_0, [1099, 1099, 1098])
+        np.testing.assert_array_equal(qubits_1, [1098, 1098, 1097])
+
+    def test_disconnected(self):
+
+        hal_metadata = HALMetadata(
+            num_qubits=2,
+            native_gates={},
+            connectivity=np.eye(2)
+        )
+        with self.assertRaisesRegex(ValueError, "not connected"):
+            route_program(
+                np.array([command_creator("CNOT", 0, 0, 0, 1)],
+                         dtype=np.uint64),
+                hal_metadata
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import unittest
+
+import numpy as np
+
+from qhal.hal import measurement_unpacker
+from qhal.quantum_simulators import ShotSampler
+from qhal.quantum_simulators._sampling import sample_batch
+
+
+class TestShotSampler(unittest.TestCase):
+    """Tests for the sampling of shots from probability vectors.
+    """
+
+    def test_distribution(self):
+
+        probabilities = np.array([0.5, 0, 0.125, 0.375])
+        sampler = ShotSampler(probabilities, seed=3, chunk_size=7000)
+        shots = sampler.sample(40000)
+        self.assertEqual(shots.shape, (40000,))
+        # the standard deviation of each frequency is below 0.0025
+        np.testing.assert_allclose(
+            np.bincount(shots, minlength=4) / 40000, probabilities, atol=0.01
+        )
+        self.assertEqual(sampler.counts(1000).sum(), 1000)
+        self.assertEqual(
+            [len(chunk) for chunk in sampler.chunks(15000)], [7000, 7000, 1000]
+        )
+
+        np.testing.assert_array_equal(
+            ShotSampler(probabilities, seed=3, chunk_size=7000).sample(40000),
+            shots
+        )
+        amplitudes = np.sqrt(probabilities) * np.exp(1j * np.arange(4))
+        np.testing.assert_allclose(ShotSampler(amplitudes).probabilities,
+                                   probabilities)
+
+    def test_outputs(self):
+
+        sampler = ShotSampler(np.ones(2 ** 10), seed=1)
+        indexes = ShotSampler(np.ones(2 ** 10), seed=1).sample(100)
+
+        packed = sampler.sample(100, "packed")
+        self.assertEqual(packed.shape, (100, 2))
+        np.testing.assert_array_equal(
+            packed[:, 0] + (packed[:, 1].astype(int) << 8), indexes
+        )
+
+        words = ShotSampler(np.ones(2 ** 10), seed=1).sample(100, "words")
+        self.assertEqual(words.shape, (100, 10))
+        qubits, offsets, statuses, values = measurement_unpacker(words)
+        np.testing.assert_array_equal(qubits, np.tile(np.arange(10), (100, 1)))
+        self.assertFalse(offsets.any() or statuses.any())
+        np.testing.assert_array_equal(
+            values.astype(int) @ (1 << np.arange(10)), indexes
+        )
+        self.assertEqual(sampler.sample(0, "words").shape, (0, 10))
+
+    def test_shared_random_state(self):
+
+        random_state = np.random.RandomState(1)
+        shared = ShotSampler(np.ones(2 ** 10), random_state)
+        np.testing.assert_array_equal(
+            shared.sample(100), ShotSampler(np.ones(2 ** 10), 1).sample(100)
+        )
+        # the draws advance the shared generator
+        own = ShotSampler(np.ones(2 ** 10), 1)
+        own.sample(100)
+        self.assertEqual(random_state.rand(), own._random_state.rand())
+
+    def test_sample_batch(self):
+
+        distributions = np.eye(4)[[2, 0, 3]]
+        np.testing.assert_array_equal(
+            sample_batch(distributions, 5, np.random.RandomState(0)),
+            np.repeat([[2], [0], [3]], 5, axis=1)
+        )
+        self.assertEqual(
+            sample_batch(distributions[:0], 5, np.random.RandomState(0)).shape,
+            (0, 5)
+        )
+
+    def test_failures(self):
+
+        with self.assertRaisesRegex(ValueError, "2\\*\\*n"):
+            ShotSampler(np.ones(3))
+        with self.assertRaisesRegex(ValueError, "non-negative"):
+            ShotSampler(np.array([1, -1]))
+        with self.assertRaisesRegex(ValueError, "not in"):
+            ShotSampler(np.ones(2)).sample(1, "bits")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+import unittest
+
+import numpy as np
+
+from qhal.compiler import schedule_program
+from qhal.hal import command_creator, command_unpacker
+from qhal.quantum_simulators import TrajectoryQuantumSimulator
+
+
+def final_state(commands, n_qubits):
+    simulator = TrajectoryQuantumSimulator(register_size=n_qubits)
+    simulator.accept_commands(commands)
+    return simulator.get_statevector()
+
+
+class SchedulingTest(unittest.TestCase):
+    """Tests for the grouping of HAL programs into layers.
+    """
+
+    def test_layers(self):
+
+        commands = np.array([
+            command_creator(*command) for command in [
+                ["START_SESSION", 0, 0],
+                ["STATE_PREPARATION_ALL", 0, 0],
+                ['H', 0, 0],
+                ['CNOT', 0, 1, 0, 0],
+                ['T', 0, 0],
+                ['RZ', 100, 0],
+                ['X', 0, 2],
+                ['H', 0, 0],
+                ['X', 0, 1],
+                ["PAGE_SET_QUBIT_0", 0, 1],
+                ['H', 0, 1],
+                ["QUBIT_MEASURE_ALL", 0, 0],
+                ["END_SESSION", 0, 0],
+            ]
+        ], dtype=np.uint64)
+
+        schedule = schedule_program(commands, reorder=False)
+        self.assertEqual(schedule.n_layers, 7)
+        self.assertIsNone(schedule.boundaries)
+        # T and RZ commute with the control of the CNOT, X with its target
+        self.assertEqual(schedule.layers.tolist(),
+                         [0, 1, 2, 3, 3, 3, 2, 4, 2, -1, 3, 5, 6])
+
+        schedule = schedule_program(commands, alap=True, reorder=False)
+        self.assertEqual(schedule.layers.tolist(),
+                         [0, 1, 2, 3, 3, 3, 3, 4, 4, -1, 4, 5, 6])
+
+        # qubit 2 no longer needs a page once reordered
+        schedule = schedule_program(commands)
+        self.assertEqual(schedule.boundaries.tolist(),
+                         [0, 1, 2, 5, 9, 10, 11, 12])
+        self.assertEqual(
+            [command_unpacker(int(command)) for command in schedule.layer(3)],
+            [
+                ("CNOT", "DUAL", [0, 0], [1, 0]),
+                ("T", "SINGLE", [0], [0]),
+                ("RZ", "SINGLE", [100], [0]),
+                ("H", "SINGLE", [0], [2]),
+            ]
+        )
+
+    def test_same_state(self):
+        """Reordered programs prepare the same state, whatever the order of
+        the commands within a layer."""
+
+        n_qubits = 4
+        random_state = np.random.RandomState(5)
+        gates = ["X", "H", "T", "S", "RZ", "RX", "SQRT_X", "CNOT", "RZZ",
+                 "RXX", "SWAP"]
+        commands = [
+            command_creator("START_SESSION", 0, 0),
+            command_creator("STATE_PREPARATION_ALL", 0, 0),
+        ]
+        for _ in range(200):
+            gate = gates[random_state.randint(len(gates))]
+            angle = int(random_state.randint(2 ** 16))
+            if gate in ("CNOT", "RZZ", "RXX", "SWAP"):
+                qubit_0, qubit_1 = random_state.choice(n_qubits, 2, False)
+                commands.append(command_creator(
+                    gate, 0, int(qubit_0), angle, int(qubit_1)
+                ))
+            else:
+                commands.append(command_creator(
+                    gate, angle, int(random_state.randint(n_qubits))
+                ))
+        commands = np.array(commands, dtype=np.uint64)
+        expected = final_state(commands, n_qubits)
+
+        for alap in (False, True):
+            schedule = schedule_program(commands, alap=alap)
+            self.assertLess(schedule.n_layers, len(commands))
+            shuffled = np.concatenate([
+                random_state.permutation(schedule.layer(layer))
+                for layer in range(schedule.n_layers)
+            ])
+            for program in (schedule.commands, shuffled):
+                self.assertAlmostEqual(
+                    abs(np.vdot(expected, final_state(program, n_qubits))), 1
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+import unittest
+
+import numpy as np
+
+from qhal.hal import HALProgram, ProgramTemplate
+from qhal.quantum_simulators import TrajectoryQuantumSimulator, sweep_program
+from qhal.quantum_simulators._numpy_gates import (apply_batched_matrix,
+                                                  apply_matrix)
+
+
+def _program() -> HALProgram:
+    program = HALProgram().start_session().prepare_all()
+    program.gate("H", 0).gate("RY", 1, 0).gate("RX", 1, 0)
+    program.dual_gate("CNOT", 1, 0).dual_gate("RZZ", 2, 1, 0)
+    program.gate("T", 2).page(0, 1).gate("PHASE", 1, 0)
+    return program.measure_all().end_session()
+
+
+class TestSweep(unittest.TestCase):
+    """Tests for the batched parameter sweeps.
+    """
+
+    def test_apply_batched_matrix(self):
+
+        random_state = np.random.RandomState(0)
+        states = random_state.randn(3, 2 ** 6) + \
+            1j * random_state.randn(3, 2 ** 6)
+        for qubits in [(0,), (5,), (1, 4), (4, 1), (0, 5), (2, 0),
+                       (5, 4), (3, 2, 1, 0), (5, 4, 3)]:
+            dim = 2 ** len(qubits)
+            matrices = random_state.randn(3, dim, dim) + \
+                1j * random_state.randn(3, dim, dim)
+            expected = np.concatenate([
+                apply_matrix(state[np.newaxis], matrix, qubits, 6)
+                for state, matrix in zip(states, matrices)
+            ])
+            np.testing.assert_allclose(
+                apply_batched_matrix(states, matrices, qubits, 6), expected,
+                atol=1e-12
+            )
+            np.testing.assert_allclose(
+                apply_batched_matrix(states, matrices[0], qubits, 6),
+                apply_matrix(states, matrices[0], qubits, 6), atol=1e-12
+            )
+
+    def test_sweep_program(self):
+        """Every parameter point has the statevector of its bound program."""
+
+        template = ProgramTemplate(_program())
+        values = np.random.RandomState(1).rand(5, template.n_parameters) * 6
+        amplitudes = sweep_program(template, values, 3)
+
+        for point, state in zip(values, amplitudes):
+            simulator = TrajectoryQuantumSimulator(register_size=3)
+            simulator.accept_commands(template.bind(point)[:-2])
+            np.testing.assert_allclose(state, simulator.get_statevector(),
+                                       atol=1e-12)
+
+        np.testing.assert_allclose(
+            sweep_program(template, values, 3, "probabilities"),
+            np.abs(amplitudes) ** 2
+        )
+        samples = sweep_program(
+            _program(), values, 3, "samples", n_shots=100, seed=2
+        )
+        self.assertEqual(samples.shape, (5, 100))
+        probabilities = np.abs(amplitudes) ** 2
+        for point, point_samples in enumerate(samples):
+            self.assertTrue(np.all(probabilities[point, point_samples] > 0))
+        np.testing.assert_array_equal(
+            samples,
+            sweep_program(template, values, 3, "samples", n_shots=100, seed=2)
+        )
+
+    def test_fused_chunks(self):
+        """Gates within and across blocks of qubits, on a register whose
+        parameter points are evolved in several chunks."""
+
+        random_state = np.random.RandomState(3)
+        program = HALProgram().start_session().prepare_all()
+        for _ in range(40):
+            qubit_0, qubit_1 = random_state.choice(14, 2, False).tolist()
+            gate = random_state.randint(4)
+            if gate == 0:
+                program.gate("H", qubit_0)
+            elif gate == 1:
+                program.gate("RY", qubit_0, 1)
+            elif gate == 2:
+                program.dual_gate("CNOT", qubit_0, qubit_1)
+            else:
+                program.dual_gate("RZZ", qubit_0, qubit_1, 1)
+        template = ProgramTemplate(program)
+        values = random_state.rand(20, template.n_parameters) * 6
+        amplitudes = sweep_program(template, values, 14)
+
+        for point in (0, 19):
+            simulator = TrajectoryQuantumSimulator(register_size=14)
+            simulator.accept_commands(template.bind(values[point]))
+            np.testing.assert_allclose(
+                amplitudes[point], simulator.get_statevector(), atol=1e-12
+            )
+
+    def test_sweep_failures(self):
+
+        template = ProgramTemplate(_program())
+        with self.assertRaisesRegex(ValueError, "parameter values"):
+            sweep_program(template, np.zeros(4), 3)
+        with self.assertRaisesRegex(ValueError, "not in"):
+            sweep_program(template, np.zeros((1, 4)), 3, "shots")
+        with self.assertRaisesRegex(ValueError, "register size"):
+            sweep_program(template, np.zeros((1, 4)), 2)
+        with self.assertRaisesRegex(ValueError, "after the measurement"):
+            sweep_program(
+                HALProgram().measure(0).gate("H", 0), np.zeros((1, 0)), 1
+            )
+        with self.assertRaisesRegex(ValueError, "not supported"):
+            sweep_program(
+                HALProgram().gate("H", 0).prepare(0), np.zeros((1, 0)), 1
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
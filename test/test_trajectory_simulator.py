@@ -0,0 +1,247 @@
+import unittest
+
+import numpy as np
+
+from qhal.hal import command_creator, measurement_unpacker, HALMetadata
+from qhal.quantum_simulators import TrajectoryQuantumSimulator
+
+
+class TestTrajectoryQuantumSimulator(unittest.TestCase):
+    """Tests for the batched trajectory simulator.
+    """
+
+    def test_circuit_equivalence(self):
+        """Noiseless trajectories reproduce the ProjectQ wavefunction of
+        test_quantum_simulators.test_circuit_equivalence."""
+
+        simulator = TrajectoryQuantumSimulator(
+            register_size=3, n_trajectories=4, seed=234
+        )
+
+        circuit = [
+            ["START_SESSION", 0, 0],
+            ["STATE_PREPARATION_ALL", 0, 0],
+            ['X', 0, 0],
+            ['H', 0, 2],
+            ["T", 0, 0],
+            ["SX", 0, 1],
+            ["T", 0, 2],
+            ["S", 0, 2],
+            ["SWAP", 0, 1, 0, 2],
+            ["T", 0, 2],
+            ["INVS", 0, 2],
+            ['RZ', 672, 1],
+            ['SQRT_X', 0, 0],
+            ['PSWAP', 200, 0, 0, 1],
+            ["CNOT", 0, 0, 0, 2],
+            ["H", 0, 2],
+            ["PIXY", 458, 1],
+        ]
+
+        for commands in circuit:
+            simulator.accept_command(command_creator(*commands))
+
+        expected = np.array(
+            [(-0.3535292059549881+0.00413527953536358j),
+             (0.2682885699548113+0.23026342139298261j),
+             (-0.026887840403694796+0.35252949385608207j),
+             (0.25290698307982507-0.2470588146767102j),
+             (0.3535292059549881-0.00413527953536358j),
+             (-0.2682885699548113-0.23026342139298261j),
+             (0.026887840403694796-0.35252949385608207j),
+             (-0.25290698307982507+0.2470588146767102j)]
+        )
+        for state in simulator._states:
+            np.testing.assert_allclose(state, expected, atol=1e-12)
+
+    def test_per_shot_measurements(self):
+        """Measurements return one word per trajectory, in the
+        measurement_creator format."""
+
+        n_trajectories = 1000
+        simulator = TrajectoryQuantumSimulator(
+            register_size=2, n_trajectories=n_trajectories, seed=7
+        )
+
+        circuit = [
+            ["START_SESSION", 0, 0],
+            ["STATE_PREPARATION_ALL", 0, 0],
+            ['H', 0, 0],
+            ['CNOT', 0, 1, 0, 0],
+        ]
+        for commands in circuit:
+            simulator.accept_command(command_creator(*commands))
+
+        res_0 = simulator.accept_command(command_creator("QUBIT_MEASURE", 0, 0))
+        res_1 = simulator.accept_command(command_creator("QUBIT_MEASURE", 0, 1))
+
+        self.assertEqual(res_0.shape, (n_trajectories,))
+        self.assertEqual(measurement_unpacker(int(res_1[0]))[0], 1)
+
+        values_0 = res_0 & 1
+        values_1 = res_1 & 1
+        # Bell state: perfectly correlated and roughly balanced
+        np.testing.assert_array_equal(values_0, values_1)
+        self.assertTrue(400 < values_0.sum() < 600)
+
+        with self.assertRaises(ValueError):
+            simulator.accept_command(command_creator("QUBIT_MEASURE", 0, 0))
+
+        simulator.accept_command(command_creator("END_SESSION", 0, 0))
+
+    def test_pauli_errors(self):
+        """Error rates from the metadata insert Pauli errors in a fraction of
+        the trajectories only."""
+
+        n_trajectories = 3000
+        metadata = HALMetadata(
+            num_qubits=1,
+            native_gates={"X": (100, np.array([0.3]))},
+            connectivity=np.array([[1]])
+        )
+        simulator = TrajectoryQuantumSimulator(
+            register_size=1,
+            n_trajectories=n_trajectories,
+            seed=11,
+            hal_metadata=metadata
+        )
+
+        circuit = [
+            ["START_SESSION", 0, 0],
+            ["STATE_PREPARATION_ALL", 0, 0],
+            ['X', 0, 0],
+        ]
+        for commands in circuit:
+            simulator.accept_command(command_creator(*commands))
+
+        values = simulator.accept_command(
+            command_creator("QUBIT_MEASURE", 0, 0)
+        ) & 1
+
+        # X and Y errors flip the qubit back: 2/3 of the error rate
+        self.assertAlmostEqual(1 - values.mean(), 0.2, delta=0.03)
+
+        # re-preparation resets every trajectory to |0>
+        simulator.accept_command(command_creator("STATE_PREPARATION", 0, 0))
+        values = simulator.accept_command(
+            command_creator("QUBIT_MEASURE", 0, 0)
+        ) & 1
+        self.assertEqual(values.sum(), 0)
+
+    def test_measure_all(self):
+        """QUBIT_MEASURE_ALL samples every trajectory at once and returns an
+        (n_trajectories, n_qubits) array of words."""
+
+        simulator = TrajectoryQuantumSimulator(
+            register_size=3, n_trajectories=500, seed=3
+        )
+
+        circuit = [
+            ["START_SESSION", 0, 0],
+            ["STATE_PREPARATION_ALL", 0, 0],
+            ['X', 0, 0],
+            ['H', 0, 1],
+            ['CNOT', 0, 2, 0, 1],
+        ]
+        for commands in circuit:
+            simulator.accept_command(command_creator(*commands))
+
+        results = simulator.accept_command(
+            command_creator("QUBIT_MEASURE_ALL", 0, 0)
+        )
+
+        self.assertEqual(results.shape, (500, 3))
+        np.testing.assert_array_equal(results[0] >> 52, [0, 1, 2])
+        values = results & 1
+        np.testing.assert_array_equal(values[:, 0], 1)
+        np.testing.assert_array_equal(values[:, 1], values[:, 2])
+        self.assertTrue(150 < values[:, 1].sum() < 350)
+
+        # once paged, the words carry the relative index and the offset, as
+        # the QUBIT_MEASURE words do
+        for commands in [
+            ["STATE_PREPARATION_ALL", 0, 0],
+            ["PAGE_SET_QUBIT_0", 0, 1],
+        ]:
+            simulator.accept_command(command_creator(*commands))
+        results = simulator.accept_command(
+            command_creator("QUBIT_MEASURE", 0, 1)
+        )
+        self.assertEqual(measurement_unpacker(int(results[0])), (1, 1, 0, 0))
+        results = simulator.accept_command(
+            command_creator("QUBIT_MEASURE_ALL", 0, 0)
+        )
+        decoded = [measurement_unpacker(int(res)) for res in results[0]]
+        self.assertEqual([res[:2] for res in decoded], [(0, 0), (0, 1)])
+
+    def test_accept_layer(self):
+        """Layers of single qubit gates applied at once give the same states
+        as the gates applied one by one, with and without noise."""
+
+        n_qubits = 7
+        random_state = np.random.RandomState(2)
+        gates = ["H", "X", "T", "S", "SX", "RX", "RY", "RZ", "PIXY"]
+        metadata = HALMetadata(
+            num_qubits=n_qubits,
+            native_gates={"H": (10, np.full(n_qubits, 0.2))},
+            connectivity=np.ones((n_qubits, n_qubits))
+        )
+        layers = []
+        for _ in range(6):
+            qubits = random_state.choice(n_qubits, 5, replace=False)
+            layers.append(np.array([
+                command_creator(
+                    str(random_state.choice(gates)),
+                    int(random_state.randint(2 ** 16)), int(qubit)
+                ) for qubit in qubits
+            ], dtype=np.uint64))
+            layers.append(np.array([
+                command_creator("CNOT", 0, int(qubits[0]), 0, int(qubits[1]))
+            ], dtype=np.uint64))
+        # several gates on a qubit and a page in the same layer
+        layers.append(np.array([
+            command_creator(*command) for command in [
+                ["RZ", 100, 3], ["PAGE_SET_QUBIT_0", 0, 2], ["T", 0, 1],
+                ["RZ", 200, 1]
+            ]
+        ], dtype=np.uint64))
+
+        for hal_metadata in (None, metadata):
+            states = []
+            for by_layer in (False, True):
+                simulator = TrajectoryQuantumSimulator(
+                    register_size=n_qubits, n_trajectories=20, seed=4,
+                    hal_metadata=hal_metadata
+                )
+                simulator.accept_commands(np.array([
+                    command_creator("START_SESSION", 0, 0),
+                    command_creator("STATE_PREPARATION_ALL", 0, 0),
+                ], dtype=np.uint64))
+                for layer in layers:
+                    if by_layer:
+                        simulator.accept_layer(layer)
+                    else:
+                        simulator.accept_commands(layer)
+                self.assertEqual(simulator.get_offset(0), 2)
+                states.append(simulator._states)
+            np.testing.assert_allclose(states[0], states[1], atol=1e-12)
+
+        # a measurement and a preparation of a gate qubit keep their order
+        simulator = TrajectoryQuantumSimulator(register_size=2, seed=1)
+        simulator.accept_commands(np.array([
+            command_creator("START_SESSION", 0, 0),
+            command_creator("STATE_PREPARATION_ALL", 0, 0),
+        ], dtype=np.uint64))
+        simulator.accept_layer(np.array([
+            command_creator(*command) for command in [
+                ["H", 0, 0], ["QUBIT_MEASURE", 0, 0],
+                ["STATE_PREPARATION", 0, 0], ["X", 0, 0]
+            ]
+        ], dtype=np.uint64))
+        np.testing.assert_allclose(
+            np.abs(simulator.get_statevector()), [0, 1, 0, 0], atol=1e-12
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+import unittest
+
+import numpy as np
+
+from qhal.compiler import transpile_program, unpage_program
+from qhal.hal import (command_creator, command_unpacker, string_to_opcode,
+                      HALMetadata)
+from qhal.hal._commands import _OPCODES
+from qhal.quantum_simulators import TrajectoryQuantumSimulator
+
+
+def native_metadata(n_qubits, gates):
+    return HALMetadata(
+        num_qubits=n_qubits,
+        native_gates={gate: (10, np.zeros(n_qubits)) for gate in gates},
+        connectivity=np.ones((n_qubits, n_qubits))
+    )
+
+
+def final_state(commands, n_qubits):
+    simulator = TrajectoryQuantumSimulator(register_size=n_qubits)
+    simulator.accept_commands(commands)
+    return simulator.get_statevector()
+
+
+class TranspilerTest(unittest.TestCase):
+    """Tests for the lowering of HAL programs to native gate sets.
+    """
+
+    def test_every_gate(self):
+        """Random programs over every gate prepare the same state once
+        transpiled, up to a global phase."""
+
+        n_qubits = 3
+        random_state = np.random.RandomState(7)
+        gates = [
+            opcode.name for opcode in _OPCODES
+            if opcode.name not in ("REQUEST_METADATA", "NOP", "ID") and
+            (opcode.code >= 10 and opcode.code < 50 or
+             opcode.cmd_type == "DUAL")
+        ]
+        commands = [
+            command_creator("START_SESSION", 0, 0),
+            command_creator("STATE_PREPARATION_ALL", 0, 0),
+            command_creator("PAGE_SET_QUBIT_1", 0, 1),
+        ]
+        for _ in range(100):
+            gate = gates[random_state.randint(len(gates))]
+            arg_0, arg_1 = random_state.randint(2 ** 16, size=2).tolist()
+            if string_to_opcode(gate).cmd_type == "DUAL":
+                qubit_0, qubit_1 = random_state.choice(n_qubits, 2, False)
+                if qubit_1 == 0:
+                    qubit_0, qubit_1 = qubit_1, qubit_0
+                commands.append(command_creator(
+                    gate, arg_0, int(qubit_0), arg_1, int(qubit_1) - 1
+                ))
+            else:
+                commands.append(command_creator(
+                    gate, arg_0, int(random_state.randint(n_qubits))
+                ))
+        commands = np.array(commands, dtype=np.uint64)
+        expected = final_state(commands, n_qubits)
+
+        for native_gates in (["RZ", "SQRT_X", "CNOT"],
+                             ["RZ", "RY", "RZZ"],
+                             ["RX", "RY", "RXX"],
+                             ["RZ", "H", "S", "T", "CNOT"],
+                             ["PHASE", "SQRT_X", "RZZ", "SWAP"]):
+            transpiled = transpile_program(
+                commands, native_metadata(n_qubits, native_gates)
+            )
+            used = {command_unpacker(int(command))[0]
+                    for command in transpiled}
+            self.assertEqual(
+                used - set(native_gates),
+                {"START_SESSION", "STATE_PREPARATION_ALL"}
+            )
+            self.assertAlmostEqual(
+                abs(np.vdot(expected, final_state(transpiled, n_qubits))), 1
+            )
+
+    def test_merged_rotations(self):
+
+        commands = np.array([
+            command_creator("T", 0, 0),
+            command_creator("T", 0, 0),
+            command_creator("RZ", 2 ** 15, 1),
+            command_creator("RZ", 2 ** 15, 1),
+            command_creator("H", 0, 0),
+        ], dtype=np.uint64)
+
+        transpiled = transpile_program(
+            commands, native_metadata(2, ["RZ", "H", "CNOT"])
+        )
+
+        self.assertEqual(
+            [command_unpacker(int(command)) for command in transpiled],
+            [("RZ", "SINGLE", [2 ** 14], [0]), ("H", "SINGLE", [0], [0])]
+        )
+
+    def test_wide_device(self):
+        """Absolute indexes beyond the first page are re-paged."""
+
+        commands = np.array([
+            command_creator("PAGE_SET_QUBIT_0", 0, 1000),
+            command_creator("PAGE_SET_QUBIT_1", 0, 1000),
+            command_creator("H", 0, 99),
+            command_creator("CNOT", 0, 99, 0, 98),
+        ], dtype=np.uint64)
+
+        transpiled = transpile_program(
+            commands, native_metadata(1100, ["RZ", "H", "CNOT"])
+        )
+
+        commands, qubits_0, qubits_1 = unpage_program(transpiled)
+        self.assertEqual(
+            [command_unpacker(int(command))[0] for command in commands],
+            ["H", "CNOT"]
+        )
+        np.testing.assert_array_equal(qubits_0, [1099, 1099])
+        self.assertEqual(qubits_1[1], 1098)
+
+    def test_no_decomposition(self):
+
+        with self.assertRaisesRegex(ValueError, "CNOT cannot be decomposed"):
+            transpile_program(
+                np.array([command_creator("CNOT", 0, 0, 0, 1)],
+                         dtype=np.uint64),
+                native_metadata(2, ["RZ", "RX"])
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,8 @@
 import numpy as np
 import unittest
 
-from qhal.hal._utils import angle_binary_representation
+from qhal.hal._utils import (angle_binary_representation,
+                             angle_from_binary_representation, angle_table)
 
 
 class UtilsTest(unittest.TestCase):
@@ -37,6 +38,40 @@ class UtilsTest(unittest.TestCase):
         for expected, calculated in test_cases.items():
             self.assertEqual(expected, calculated)
 
+    def test_vectorised_angle_conversion(self):
+        """Arrays of angles convert both ways, wrapping to [0, 2 pi)."""
+
+        angles = np.array([0, np.pi / 4, -np.pi / 4, 2 * np.pi,
+                           2 * np.pi - 1e-9, 5 * np.pi])
+        binary = angle_binary_representation(angles)
+        np.testing.assert_array_equal(binary, [0, 8192, 57344, 0, 0, 32768])
+        self.assertEqual(angle_binary_representation(2 * np.pi - 1e-9), 0)
+
+        np.testing.assert_allclose(
+            angle_from_binary_representation(binary),
+            [0, np.pi / 4, 7 * np.pi / 4, 0, 0, np.pi]
+        )
+        self.assertEqual(angle_from_binary_representation(16384), np.pi / 2)
+
+        values = np.arange(2 ** 16)
+        np.testing.assert_array_equal(
+            angle_binary_representation(
+                angle_from_binary_representation(values)
+            ),
+            values
+        )
+
+    def test_angle_table(self):
+
+        table = angle_table()
+        self.assertIs(table, angle_table())
+        self.assertEqual(table.angles.shape, (2 ** 16,))
+        np.testing.assert_allclose(table.cos[[0, 16384, 32768]], [1, 0, -1],
+                                   atol=1e-15)
+        np.testing.assert_allclose(table.half_sin[32768], 1)
+        with self.assertRaises(ValueError):
+            table.sin[0] = 2
+
 
 if __name__ == "__main__":
     unittest.main()
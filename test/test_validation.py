@@ -0,0 +1,112 @@
+import unittest
+
+import numpy as np
+
+from qhal.compiler import Violation, check_program, validate_program
+from qhal.hal import command_creator
+
+
+def program(*commands):
+    return np.array(
+        [command_creator(*command) for command in commands], dtype=np.uint64
+    )
+
+
+class ValidationTest(unittest.TestCase):
+    """Tests for the static validation of HAL programs.
+    """
+
+    def test_valid_program(self):
+
+        shot = [
+            ["STATE_PREPARATION_ALL", 0, 0],
+            ['H', 0, 0],
+            ['CNOT', 0, 1, 0, 0],
+            ["PAGE_SET_QUBIT_0", 0, 1],
+            ['QUBIT_MEASURE', 0, 0],
+            ["PAGE_SET_QUBIT_0", 0, 0],
+            ['QUBIT_MEASURE', 0, 0],
+        ]
+        # measuring every qubit releases the register for the next shot
+        commands = program(
+            ["START_SESSION", 0, 0], *shot, *shot, ["END_SESSION", 0, 0]
+        )
+
+        self.assertEqual(validate_program(commands, 2), [])
+        check_program(commands, 2)
+
+    def test_every_violation_reported(self):
+
+        commands = program(
+            ['H', 0, 0],
+            ["START_SESSION", 0, 0],
+            ["STATE_PREPARATION_ALL", 0, 0],
+            ['QUBIT_MEASURE', 0, 0],
+            ['X', 0, 0],
+            ['QUBIT_MEASURE', 0, 0],
+            ["STATE_PREPARATION", 0, 1],
+            ["PAGE_SET_QUBIT_1", 0, 2],
+            ['CNOT', 0, 1, 0, 1],
+            ["STATE_PREPARATION_ALL", 0, 0],
+            ["QUBIT_MEASURE_ALL", 0, 0],
+            ['Y', 0, 1],
+            ["START_SESSION", 0, 0],
+        )
+
+        self.assertEqual(validate_program(commands, 3), [
+            Violation(0, "H received outside of a session!"),
+            Violation(4, "Qubit requires re-preparation!"),
+            Violation(5, "Qubit already measured!"),
+            Violation(6, "Qubit already prepared!"),
+            Violation(8, "Qubit index greater than register size (3)!"),
+            Violation(9, "Qubit register has already been initialised!"),
+            Violation(11, "Qubit requires re-preparation!"),
+            Violation(12, "Simulator session already started!"),
+        ])
+        with self.assertRaisesRegex(ValueError, "8 invalid command"):
+            check_program(commands, 3)
+
+    def test_many_shots(self):
+        """Each auto-release depends on the previous ones: they are found in
+        one pass over a long program."""
+
+        shot = [
+            ["STATE_PREPARATION", 0, 0],
+            ['H', 0, 0],
+            ['QUBIT_MEASURE', 0, 0],
+            ['QUBIT_MEASURE', 0, 0],
+            ['QUBIT_MEASURE', 0, 1],
+        ]
+        commands = program(
+            ["START_SESSION", 0, 0], *shot * 1000, ['H', 0, 0],
+            ["END_SESSION", 0, 0]
+        )
+
+        self.assertEqual(validate_program(commands, 2), [
+            Violation(5 * shot + 4, "Qubit already measured!")
+            for shot in range(1000)
+        ] + [Violation(5001, "Qubit requires re-preparation!")])
+
+    def test_unprepared_register(self):
+
+        commands = program(
+            ["START_SESSION", 0, 0],
+            ['H', 0, 0],
+            ["QUBIT_MEASURE_ALL", 0, 0],
+            ["STATE_PREPARATION", 0, 1],
+            ['H', 0, 0],
+            ["END_SESSION", 0, 0],
+            ["END_SESSION", 0, 0],
+        )
+        commands = np.append(commands, np.uint64(4095 << 52))
+
+        self.assertEqual(validate_program(commands, 2), [
+            Violation(1, "Qubit register is not prepared!"),
+            Violation(2, "Qubit register is not prepared!"),
+            Violation(6, "END_SESSION received outside of a session!"),
+            Violation(7, "Opcode 4095 not found!"),
+        ])
+
+
+if __name__ == "__main__":
+    unittest.main()